@@ -1,6 +1,11 @@
+import operator
+from collections import OrderedDict, namedtuple
+
 import numpy as np
 
 import pyADiff
+import pyADiff.profiling as pyADiff_profiling
+import pyADiff.tangent as pyADiff_tangent
 from pyADiff.exceptions import NotDifferentiableExeption
 from pyADiff.math_functions import *
 
@@ -8,50 +13,536 @@ from pyADiff.math_functions import *
 class ADRecord(object):
     """ADRecord.
 
-    Stores all operations of a computation in a list, preserving their order.
-    
+    Stores all operations of a computation on a flat tape, preserving their order.
+
+    Every recorded variable is a node of the tape and identified by its integer index.
+    The tape is stored as a structure of growable numpy arrays:
+    the operation `_op`, the value `_val` and the constant operand `_const` of node `i` are stored at index `i`,
+    its dependencies are the entries ``_ptr[i]:_ptr[i+1]`` of the argument indices `_idx` and the partial derivatives `_par`.
+    The adjoints (derivatives) of all nodes are stored in `_adj`.
+
+    The arrays are of dtype `float` as long as all values, partial derivatives and adjoints are floats.
+    If an ADType is recorded (e.g. for nested differentiation), the arrays are converted to dtype `object`.
+
+    Every comparison of recorded variables is stored as a guard.
+    Because the operations are stored, the record can be replayed at new input values without rerunning the computation, as long as all guards evaluate as recorded.
+
+    Parameters
+    ----------
+    capacity : int
+        Initial number of nodes and dependencies the tape can hold before it is grown.
+
     See also
     --------
     pyADiff.adjoint.ADTypeA : The overloaded adjoint numerical type.
+    pyADiff.adjoint.ADTrace : A replayable recording of a function evaluation.
     """
-    def __init__(self):
-        self._record = []
-    
-    def record_variable(self, v):
+    OPERATIONS = (
+        'var', 'add', 'add_const', 'sub', 'sub_const', 'rsub_const',
+        'mul', 'mul_const', 'div', 'div_const', 'rdiv_const',
+        'pow', 'pow_const', 'rpow_const',
+        'neg', 'pos', 'sin', 'cos', 'exp', 'log', 'sqrt'
+    )
+    _OPCODES = {o: c for c, o in enumerate(OPERATIONS)}
+
+    def __init__(self, capacity=1024):
+        self._n = 0
+        self._m = 0
+        self._op = np.zeros(capacity, dtype=np.int8)
+        self._val = np.zeros(capacity, dtype=float)
+        self._const = np.zeros(capacity, dtype=float)
+        self._ptr = np.zeros(capacity + 1, dtype=np.int64)
+        self._idx = np.empty(capacity, dtype=np.int64)
+        self._par = np.empty(capacity, dtype=float)
+        self._adj = np.zeros(capacity, dtype=float)
+        self._guards = []
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def n_dependencies(self):
+        """Total number of dependencies (edges) stored on the tape.
+        """
+        return self._m
+
+    @property
+    def nbytes(self):
+        """Approximate number of bytes held by the tape arrays (without the values of object arrays).
+        """
+        return sum(a.nbytes for a in (self._op, self._val, self._const, self._ptr, self._idx, self._par, self._adj))
+
+    def operation_counts(self):
+        """Number of nodes per operation.
+
+        Returns
+        -------
+        dict
+            Maps the names of the recorded operations to their number of nodes.
+        """
+        counts = np.bincount(self._op[:self._n], minlength=len(self.OPERATIONS))
+        return {o: int(c) for o, c in zip(self.OPERATIONS, counts) if c > 0}
+
+    def record_variable(self, value, dependencies, operation='var', constant=0.):
         """Adds a variable to the record.
         
         Parameters
         ----------
-        v : ADTypeA
-            Variable to record.
+        value : float or ADType
+            Value of the variable.
+        dependencies : list[tuple(ADTypeA, float or ADType)]
+            The ADTypeAs the new variable depends on and their partial derivatives.
+        operation : str
+            The operation which computed the variable, one of `ADRecord.OPERATIONS`.
+        constant : float or ADType
+            The constant (not recorded) operand of the operation.
+
+        Returns
+        -------
+        int
+            The index of the new variable on the tape.
+        """
+        i = self._n
+        m = self._m
+        if i == self._adj.shape[0]:
+            self._op = _grow(self._op, 2*i)
+            self._val = _grow(self._val, 2*i)
+            self._const = _grow(self._const, 2*i)
+            self._ptr = _grow(self._ptr, 2*i + 1)
+            self._adj = _grow(self._adj, 2*i)
+        if m + len(dependencies) > self._idx.shape[0]:
+            self._idx = _grow(self._idx, 2*(m + len(dependencies)))
+            self._par = _grow(self._par, 2*(m + len(dependencies)))
+        self._op[i] = self._OPCODES[operation]
+        try:
+            self._val[i] = value
+            self._const[i] = constant
+        except TypeError:
+            self._to_object()
+            self._val[i] = value
+            self._const[i] = constant
+        for v, p in dependencies:
+            self._idx[m] = v._i
+            try:
+                self._par[m] = p
+            except TypeError:
+                self._to_object()
+                self._par[m] = p
+            m += 1
+        self._ptr[i + 1] = m
+        self._n = i + 1
+        self._m = m
+        return i
+
+    def record_guard(self, comparison, a, b):
+        """Evaluates and records a comparison.
+
+        Parameters
+        ----------
+        comparison : str
+            The comparison, one of `'lt'`, `'le'`, `'eq'`, `'ne'`, `'gt'`, `'ge'`.
+        a : ADTypeA
+            Left operand.
+        b : ADTypeA or float
+            Right operand.
+
+        Returns
+        -------
+        bool
+            The outcome of the comparison.
+        """
+        if(type(b) is np.ndarray):
+            return NotImplemented
+        try:
+            j = b._i
+            outcome = _COMPARISONS[comparison](a.value, b.value)
+            b = 0.
+        except AttributeError:
+            j = -1
+            outcome = _COMPARISONS[comparison](a.value, b)
+        self._guards.append((comparison, a._i, j, b, outcome))
+        return outcome
+
+    @property
+    def guards(self):
+        """Recorded comparisons.
+
+        List of tuples (comparison, index of left operand, index of right operand or -1, constant right operand, outcome).
+        """
+        return self._guards
+
+    def replay(self, indices, values):
+        """Replay.
+
+        Recomputes the values and partial derivatives of all nodes with new values of the nodes `indices`, without rerunning the recorded computation.
+        Then all guards are reevaluated.
+
+        Parameters
+        ----------
+        indices : list[int]
+            Indices of the input nodes.
+        values : list[float]
+            New values of the input nodes.
+
+        Returns
+        -------
+        bool
+            `True` if all guards evaluated as recorded, otherwise the control flow of the recorded computation depends on the new values and the record is invalid.
+        """
+        with pyADiff_profiling.measure('replay'):
+            n = self._n
+            op = self._op[:n].tolist()
+            val = self._val[:n].tolist()
+            const = self._const[:n].tolist()
+            ptr = self._ptr[:n + 1].tolist()
+            idx = self._idx[:self._m].tolist()
+            par = self._par[:self._m].tolist()
+            for i, v in zip(indices, values):
+                val[i] = v
+            for i in range(n):
+                if op[i] == 0:
+                    continue
+                e = ptr[i]
+                if ptr[i + 1] - e == 2:
+                    val[i], par[e], par[e + 1] = _RULES[op[i]](val[idx[e]], val[idx[e + 1]])
+                else:
+                    val[i], par[e] = _RULES[op[i]](val[idx[e]], const[i])
+            try:
+                self._val[:n] = val
+                self._par[:self._m] = par
+            except TypeError:
+                self._to_object()
+                self._val[:n] = val
+                self._par[:self._m] = par
+            for comparison, i, j, c, outcome in self._guards:
+                if _COMPARISONS[comparison](val[i], val[j] if j >= 0 else c) != outcome:
+                    return False
+            return True
+
+    def copy(self):
+        """Returns a copy of the record, which is not affected by later replays or sweeps of this record.
+        """
+        record = ADRecord.__new__(ADRecord)
+        record.__dict__.update(self.__dict__)
+        for name in ('_op', '_val', '_const', '_ptr', '_idx', '_par', '_adj'):
+            setattr(record, name, getattr(self, name).copy())
+        record._guards = list(self._guards)
+        return record
+
+    def values(self, indices):
+        """Returns the recorded values of the nodes `indices`.
+        """
+        return self._val[indices]
+
+    def tape(self):
+        """Flat view of the tape.
+
+        Returns
+        -------
+        Tape
+            Named tuple of lists with one entry per node: the `operations` (names), `values`, `constants`, `arguments` (list of indices) and `partials` (list of partial derivatives).
+        """
+        n = self._n
+        ptr = self._ptr[:n + 1].tolist()
+        idx = self._idx[:self._m].tolist()
+        par = self._par[:self._m].tolist()
+        return Tape(
+            operations=[self.OPERATIONS[o] for o in self._op[:n].tolist()],
+            values=self._val[:n].tolist(),
+            constants=self._const[:n].tolist(),
+            arguments=[idx[ptr[i]:ptr[i + 1]] for i in range(n)],
+            partials=[par[ptr[i]:ptr[i + 1]] for i in range(n)]
+        )
+
+    def dependencies(self, i):
+        """Dependencies of a node.
+
+        Parameters
+        ----------
+        i : int
+            Index of the node on the tape.
+
+        Returns
+        -------
+        list[tuple(int, float or ADType)]
+            The indices of the arguments of node `i` and the respective partial derivatives.
         """
-        self._record.append(v)
+        return [(self._idx[e], self._par[e]) for e in range(self._ptr[i], self._ptr[i + 1])]
+
+    def get_adjoint(self, i):
+        """Returns the adjoint of node `i`.
+        """
+        return self._adj[i]
+
+    def set_adjoint(self, i, a):
+        """Sets the adjoint of node `i` to `a`.
+        """
+        try:
+            self._adj[i] = a
+        except TypeError:
+            self._to_object()
+            self._adj[i] = a
 
     def backpropagate(self):
         """Backpgropagation.
 
         Backpropagates through all stored computations in reversed order.
+        The sweep runs on plain python lists of the tape arrays, so that no per-node objects are involved.
+        """
+        with pyADiff_profiling.measure('sweep'):
+            n = self._n
+            ptr = self._ptr[:n + 1].tolist()
+            idx = self._idx[:self._m].tolist()
+            par = self._par[:self._m].tolist()
+            adj = self._adj[:n].tolist()
+            skip_zeros = self._adj.dtype != object
+            for i in range(n - 1, -1, -1):
+                a = adj[i]
+                if skip_zeros and a == 0.:
+                    continue
+                for e in range(ptr[i], ptr[i + 1]):
+                    adj[idx[e]] += par[e]*a
+            try:
+                self._adj[:n] = adj
+            except TypeError:
+                self._to_object()
+                self._adj[:n] = adj
+
+    def backpropagate_vector(self, indices, seeds):
+        """Vector Backpropagation.
+
+        Backpropagates a block of `k` adjoint directions through all stored computations in a single reverse sweep.
+        The adjoints of the tape (`derivative` of the ADTypeAs) are not touched, the vector adjoints are returned instead.
+
+        Parameters
+        ----------
+        indices : list[int]
+            Indices of the seeded nodes.
+        seeds : array
+            Adjoint seeds of shape ``(len(indices), k)``, row `r` is added to the adjoint vector of node ``indices[r]``.
+
+        Returns
+        -------
+        array
+            The adjoint vectors of all nodes, shape ``(len(record), k)``.
+        """
+        with pyADiff_profiling.measure('sweep'):
+            n = self._n
+            seeds = np.asarray(seeds)
+            adj = np.zeros((n, seeds.shape[1]), dtype=np.result_type(self._par.dtype, seeds.dtype))
+            for i, s in zip(indices, seeds):
+                adj[i] += s
+            ptr = self._ptr[:n + 1].tolist()
+            idx = self._idx[:self._m].tolist()
+            par = self._par[:self._m].tolist()
+            rows = list(adj)
+            skip_zeros = adj.dtype != object
+            for i in range(n - 1, -1, -1):
+                a = rows[i]
+                if skip_zeros and not a.any():
+                    continue
+                for e in range(ptr[i], ptr[i + 1]):
+                    rows[idx[e]] += a*par[e]
+            return adj
+
+    def propagate_vector(self, indices, seeds):
+        """Vector Tangent Propagation.
+
+        Propagates a block of `k` tangent directions through all stored computations in a single forward sweep, using the recorded partial derivatives.
+
+        Parameters
+        ----------
+        indices : list[int]
+            Indices of the seeded nodes (usually the inputs).
+        seeds : array
+            Tangent seeds of shape ``(len(indices), k)``.
+
+        Returns
+        -------
+        array
+            The tangent vectors of all nodes, shape ``(len(record), k)``.
+        """
+        with pyADiff_profiling.measure('forward_sweep'):
+            n = self._n
+            seeds = np.asarray(seeds)
+            tangents = np.zeros((n, seeds.shape[1]), dtype=np.result_type(self._par.dtype, seeds.dtype))
+            for i, s in zip(indices, seeds):
+                tangents[i] += s
+            ptr = self._ptr[:n + 1].tolist()
+            idx = self._idx[:self._m].tolist()
+            par = self._par[:self._m].tolist()
+            rows = list(tangents)
+            for i in range(n):
+                for e in range(ptr[i], ptr[i + 1]):
+                    rows[i] += rows[idx[e]]*par[e]
+            return tangents
+
+    def backpropagate_second_order(self, index, tangents):
+        """Second Order Backpropagation.
+
+        Backpropagates the adjoint seed `1` of node `index` together with the second order adjoints in a single reverse sweep (forward over reverse).
+        The second order adjoints are the derivatives of the adjoints in the `k` directions of `tangents`,
+        they accumulate the second order adjoints of the nodes multiplied with the partial derivatives
+        and the adjoints of the nodes multiplied with the second partial derivatives and the tangents of the arguments.
+        The adjoints of the tape (`derivative` of the ADTypeAs) are not touched.
+
+        Parameters
+        ----------
+        index : int
+            Index of the seeded node (usually the scalar output).
+        tangents : array
+            The tangent vectors of all nodes of shape ``(len(record), k)``, see `propagate_vector`.
+
+        Returns
+        -------
+        tuple(array, array)
+            The adjoints of all nodes, shape ``(len(record),)``, and the second order adjoints of all nodes, shape ``(len(record), k)``.
+        """
+        with pyADiff_profiling.measure('sweep'):
+            n = self._n
+            tangents = np.asarray(tangents)
+            dtype = np.result_type(self._par.dtype, tangents.dtype)
+            adj = np.zeros(n, dtype=dtype)
+            adj2 = np.zeros((n, tangents.shape[1]), dtype=dtype)
+            adj[index] = 1.
+            op = self._op[:n].tolist()
+            val = self._val[:n].tolist()
+            const = self._const[:n].tolist()
+            ptr = self._ptr[:n + 1].tolist()
+            idx = self._idx[:self._m].tolist()
+            par = self._par[:self._m].tolist()
+            a = adj.tolist() if dtype != object else list(adj)
+            rows = list(adj2)
+            t = list(tangents)
+            skip_zeros = dtype != object
+            for i in range(n - 1, -1, -1):
+                a_i = a[i]
+                r_i = rows[i]
+                if skip_zeros and a_i == 0. and not r_i.any():
+                    continue
+                start, end = ptr[i], ptr[i + 1]
+                for e in range(start, end):
+                    a[idx[e]] += par[e]*a_i
+                    rows[idx[e]] += r_i*par[e]
+                curvature = _CURVATURES[op[i]]
+                if curvature is None or (skip_zeros and a_i == 0.):
+                    continue
+                if(end - start == 2):
+                    j, l = idx[start], idx[start + 1]
+                    h_jj, h_jl, h_ll = curvature(val[j], val[l], val[i])
+                    rows[j] += a_i*(h_jj*t[j] + h_jl*t[l])
+                    rows[l] += a_i*(h_jl*t[j] + h_ll*t[l])
+                elif(end - start == 1):
+                    j = idx[start]
+                    rows[j] += (a_i*curvature(val[j], const[i], val[i]))*t[j]
+            adj[:] = a
+            return adj, adj2
+
+    def backpropagate_node(self, i):
+        """Backpropagation of a single node.
+
+        Accumulates the adjoint of node `i`, multiplied with the partial derivatives, to its arguments.
         """
-        for v in reversed(self._record):
-            v.backpropagate()
+        a = self._adj[i]
+        for e in range(self._ptr[i], self._ptr[i + 1]):
+            self.set_adjoint(self._idx[e], self._adj[self._idx[e]] + self._par[e]*a)
 
     def reset(self):
         """Resets the derivatives.
 
         Resets the derivatives of all values to 0.
         """
-        for v in self._record:
-            v.derivative = 0.
+        with pyADiff_profiling.measure('reset'):
+            self._adj[:self._n] = 0.
+
+    def _to_object(self):
+        self._val = self._val.astype(object)
+        self._const = self._const.astype(object)
+        self._par = self._par.astype(object)
+        self._adj = self._adj.astype(object)
+
+Tape = namedtuple('Tape', ['operations', 'values', 'constants', 'arguments', 'partials'])
+
+# Local rules of the operations (indexed by their code in `ADRecord.OPERATIONS`).
+# Binary operations map the values of both arguments to the value and both partial derivatives,
+# unary operations map the value of the argument and the constant operand to the value and the partial derivative.
+_RULES = (
+    None,                                                   # var
+    lambda a, b: (a + b, 1., 1.),                           # add
+    lambda a, c: (a + c, 1.),                               # add_const
+    lambda a, b: (a - b, 1., -1.),                          # sub
+    lambda a, c: (a - c, 1.),                               # sub_const
+    lambda a, c: (c - a, -1.),                              # rsub_const
+    lambda a, b: (a*b, b, a),                               # mul
+    lambda a, c: (a*c, c),                                  # mul_const
+    lambda a, b: (a/b, 1./b, -a/b**2.),                     # div
+    lambda a, c: (a/c, 1./c),                               # div_const
+    lambda a, c: (c/a, -c/a**2.),                           # rdiv_const
+    lambda a, b: (a**b, b*a**(b - 1.), a**b*log(a)),        # pow
+    lambda a, c: (a**c, c*a**(c - 1.)),                     # pow_const
+    lambda a, c: (c**a, c**a*log(c)),                       # rpow_const
+    lambda a, c: (-a, -1.),                                 # neg
+    lambda a, c: (a, 1.),                                   # pos
+    lambda a, c: (sin(a), cos(a)),                          # sin
+    lambda a, c: (cos(a), -sin(a)),                         # cos
+    lambda a, c: (exp(a), exp(a)),                          # exp
+    lambda a, c: (log(a), 1./a),                            # log
+    lambda a, c: (sqrt(a), 1./(2.*sqrt(a))),                # sqrt
+)
+
+# Second order partial derivatives of the operations (indexed by their code in `ADRecord.OPERATIONS`), `None` for linear operations.
+# Binary operations map the values of both arguments and the value of the node to the second partials (d2/da2, d2/dadb, d2/db2),
+# unary operations map the value of the argument, the constant operand and the value of the node to the second partial d2/da2.
+_CURVATURES = (
+    None,                                                                   # var
+    None,                                                                   # add
+    None,                                                                   # add_const
+    None,                                                                   # sub
+    None,                                                                   # sub_const
+    None,                                                                   # rsub_const
+    lambda a, b, v: (0., 1., 0.),                                           # mul
+    None,                                                                   # mul_const
+    lambda a, b, v: (0., -1./b**2., 2.*a/b**3.),                            # div
+    None,                                                                   # div_const
+    lambda a, c, v: 2.*c/a**3.,                                             # rdiv_const
+    lambda a, b, v: (b*(b - 1.)*a**(b - 2.), a**(b - 1.)*(1. + b*log(a)), v*log(a)**2.),   # pow
+    lambda a, c, v: c*(c - 1.)*a**(c - 2.),                                 # pow_const
+    lambda a, c, v: v*log(c)**2.,                                           # rpow_const
+    None,                                                                   # neg
+    None,                                                                   # pos
+    lambda a, c, v: -v,                                                     # sin
+    lambda a, c, v: -v,                                                     # cos
+    lambda a, c, v: v,                                                      # exp
+    lambda a, c, v: -1./a**2.,                                              # log
+    lambda a, c, v: -0.25/(a*v),                                            # sqrt
+)
+
+_COMPARISONS = {
+    'lt': operator.lt,
+    'le': operator.le,
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'gt': operator.gt,
+    'ge': operator.ge
+}
+
+def _grow(a, n):
+    """Returns a copy of `a` with its first axis enlarged to length `n`, padded with zeros.
+    """
+    b = np.zeros((n,) + a.shape[1:], dtype=a.dtype)
+    b[:a.shape[0]] = a
+    return b
 
 class ADTypeA(object):
     """Adjoint ADType.
 
     This class overloads the basic numerical type of python.
-    Instead of only an `value` it also stores a `derivative`, its `dependencies` and a `record`.
+    It is a thin handle which stores its `value`, the `record` and its `index` on the tape of the record.
+    The `derivative` and the `dependencies` are stored on the tape.
 
-    This class implements the numerical operators (+, -, .. ) as expected for a numerical type, but additionaly stores the operands (`dependencies`) and records the operation to the `record`.
+    This class implements the numerical operators (+, -, .. ) as expected for a numerical type, but additionaly records the operation and its operands (`dependencies`) to the `record`.
     
-    Basic mathematical functions (`sin`, `cos`, `exp`, ...) are implemented as member functions and also store the operand in the return `ADTypeA` and record the operation.
+    Basic mathematical functions (`sin`, `cos`, `exp`, ...) are implemented as member functions and also record the operation.
 
     Parameters
     ----------
@@ -61,20 +552,26 @@ class ADTypeA(object):
         The record of all operations.
     dependencies : list[tuple(ADTypeA, float or ADType)]
         List of the ADTypeAs this ADTypeA depends on and their partial derivatives.
-    deriative : float or ADType
+    deriative : float or ADType, optional
         The derivative of the overloaded numerical type.
+    operation : str, optional
+        The operation which computed the value, one of `ADRecord.OPERATIONS`.
+    constant : float or ADType, optional
+        The constant (not recorded) operand of the operation.
 
     See also
     --------
     pyADiff.adjoint.ADRecord : Records all operations.
     pyADiff.math_functions : Implementation of basic mathematical functions for the ADType.
     """
-    def __init__(self, value, record, dependencies=[], derivative=0.):
+    __slots__ = ('_v', '_r', '_i')
+
+    def __init__(self, value, record, dependencies=[], derivative=None, operation='var', constant=0.):
         self._v = value
-        self._d = derivative
-        self._deps = dependencies
         self._r = record
-        self._r.record_variable(self)
+        self._i = record.record_variable(value, dependencies, operation, constant)
+        if derivative is not None:
+            record.set_adjoint(self._i, derivative)
             
     @property
     def value(self):
@@ -86,31 +583,36 @@ class ADTypeA(object):
     def value(self, value):
         self._v = value
 
+    @property
+    def index(self):
+        """Index of the ADTypeA on the tape of its record.
+        """
+        return self._i
+
     @property
     def derivative(self):
         """Derivative of the overloaded numerical type.
         """
-        return self._d
+        return self._r.get_adjoint(self._i)
 
     @derivative.setter
     def derivative(self, derivative):
-        self._d = derivative
+        self._r.set_adjoint(self._i, derivative)
 
     @property
     def dependencies(self):
         """Dependencies of the ADTypeA
 
-        List of tuples(ADTypeA, float or ADType) which represent the dependencies of this ADTypeA.
+        List of tuples(int, float or ADType) which represent the tape indices this ADTypeA depends on and the partial derivatives.
         """
-        return self._deps
+        return self._r.dependencies(self._i)
 
     def backpropagate(self):
         """Backpropagation.
 
         Calculates and accumulates the partial derivatives of its dependencies.
         """
-        for v, p in self.dependencies:
-            v.derivative += p*self.derivative
+        self._r.backpropagate_node(self._i)
 
     def __repr__(self):
         return str(self.value)
@@ -126,7 +628,8 @@ class ADTypeA(object):
                 dependencies=[
                     (self, 1.),
                     (other, 1.)
-                ]
+                ],
+                operation='add'
             )
         except AttributeError:
             temp = other.__radd__(self)
@@ -136,7 +639,9 @@ class ADTypeA(object):
                     record=self._r,
                     dependencies=[
                         (self, 1.),
-                    ]
+                    ],
+                    operation='add_const',
+                    constant=other
                 )
             else:
                 return temp
@@ -147,7 +652,9 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, 1.)
-            ]
+            ],
+            operation='add_const',
+            constant=other
         )
 
     def __sub__(self, other):
@@ -158,7 +665,8 @@ class ADTypeA(object):
                 dependencies=[
                     (self, 1.),
                     (other, -1.)
-                ]
+                ],
+                operation='sub'
             )
         except AttributeError:
             temp = other.__rsub__(self)
@@ -168,7 +676,9 @@ class ADTypeA(object):
                     record=self._r,
                     dependencies=[
                         (self, 1.),
-                    ]
+                    ],
+                    operation='sub_const',
+                    constant=other
                 )
             else:
                 return temp
@@ -179,7 +689,9 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, -1.)
-            ]
+            ],
+            operation='rsub_const',
+            constant=other
         )
 
     def __mul__(self, other):
@@ -190,7 +702,8 @@ class ADTypeA(object):
                 dependencies=[
                     (self, other.value),
                     (other, self.value)
-                ]
+                ],
+                operation='mul'
             )
         except AttributeError:
             temp = other.__rmul__(self)
@@ -200,7 +713,9 @@ class ADTypeA(object):
                     record=self._r,
                     dependencies=[
                         (self, other),
-                    ]
+                    ],
+                    operation='mul_const',
+                    constant=other
                 )
             else:
                 return temp
@@ -211,7 +726,9 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, other)
-            ]
+            ],
+            operation='mul_const',
+            constant=other
         )
 
     def __truediv__(self, other):
@@ -222,7 +739,8 @@ class ADTypeA(object):
                 dependencies=[
                     (self, 1./other.value),
                     (other, -self.value/other.value**2.)
-                ]
+                ],
+                operation='div'
             )
         except AttributeError:
             temp = other.__rtruediv__(self)
@@ -232,7 +750,9 @@ class ADTypeA(object):
                     record=self._r,
                     dependencies=[
                         (self, 1./other),
-                    ]
+                    ],
+                    operation='div_const',
+                    constant=other
                 )
             else:
                 return temp
@@ -243,7 +763,9 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, -other/self.value**2.)
-            ]
+            ],
+            operation='rdiv_const',
+            constant=other
         )
 
     def __pow__(self, other):
@@ -254,7 +776,8 @@ class ADTypeA(object):
                 dependencies=[
                     (self, other.value*self.value**(other.value-1.)),
                     (other, self.value**other.value*log(self.value))
-                ]
+                ],
+                operation='pow'
             )
         except AttributeError:
             temp = other.__rpow__(self)
@@ -264,7 +787,9 @@ class ADTypeA(object):
                     record=self._r,
                     dependencies=[
                         (self, other*self.value**(other-1.)),
-                    ]
+                    ],
+                    operation='pow_const',
+                    constant=other
                 )
             else:
                 return temp
@@ -275,9 +800,30 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, other**self.value*log(other))
-            ]
+            ],
+            operation='rpow_const',
+            constant=other
         )
 
+    ### EQUALITIES AND INEQUALITIES
+    def __lt__(self, other):
+        return self._r.record_guard('lt', self, other)
+
+    def __le__(self, other):
+        return self._r.record_guard('le', self, other)
+
+    def __eq__(self, other):
+        return self._r.record_guard('eq', self, other)
+
+    def __ne__(self, other):
+        return self._r.record_guard('ne', self, other)
+
+    def __gt__(self, other):
+        return self._r.record_guard('gt', self, other)
+
+    def __ge__(self, other):
+        return self._r.record_guard('ge', self, other)
+
     ### SINGLE INPUT FUNCTIONS
     def __neg__(self):
         return ADTypeA(
@@ -285,14 +831,18 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, -1.)
-            ]
+            ],
+            operation='neg'
         )
 
     def __pos__(self):
         return ADTypeA(
             value=self.value,
             record=self._r,
-            dependencies=(self, 1.)
+            dependencies=[
+                (self, 1.)
+            ],
+            operation='pos'
         )
 
     def __abs__(self):
@@ -304,7 +854,8 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, cos(self.value))
-            ]
+            ],
+            operation='sin'
         )
 
     def cos(self):
@@ -313,7 +864,8 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, -sin(self.value))
-            ]
+            ],
+            operation='cos'
         )
 
     def exp(self):
@@ -322,7 +874,8 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, exp(self.value))
-            ]
+            ],
+            operation='exp'
         )
     
     def log(self):
@@ -331,7 +884,8 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, 1./self.value)
-            ]
+            ],
+            operation='log'
         )
 
     def sqrt(self):
@@ -340,13 +894,650 @@ class ADTypeA(object):
             record=self._r,
             dependencies=[
                 (self, 1./(2.*sqrt(self.value)))
-            ]
+            ],
+            operation='sqrt'
         )
 
     def __hash__(self):
         return int(id(self))
 
-def dfdx(f, x_v):
+class ADTrace(object):
+    """ADTrace.
+
+    A replayable recording of the evaluation of `f` at `x_v`.
+
+    The inputs `x_v` are converted to their respective `ADTypeA` and `f` is run once to create the record of all operations.
+    Afterwards the trace can be replayed at new inputs of the same shape without calling `f` again (see `ADRecord.replay`).
+    If the control flow of `f` depends on the new inputs, detected by a comparison which evaluates differently, the replay fails and `f` has to be traced again.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to record.
+    x_v : scalar, list, array
+        The value where to evaluate `f`.
+
+    See also
+    --------
+    pyADiff.adjoint.ADRecord : The record of all operations.
+    pyADiff.adjoint.ADTraceCache : Caches traces of a function.
+    """
+    def __init__(self, f, x_v):
+        if(type(x_v) is list):
+            x_v = np.array(x_v)
+        self.record = ADRecord()
+        with pyADiff_profiling.measure('trace'):
+            if(type(x_v) is np.ndarray):
+                x = np.empty(x_v.shape, dtype=ADTypeA)
+                for i in np.ndindex(x_v.shape):
+                    x[i] = ADTypeA(x_v[i], self.record)
+                self._x_indices = [v.index for v in x.flat]
+                self._x_shape = x.shape
+            else:
+                x = ADTypeA(x_v, self.record)
+                self._x_indices = [x.index]
+                self._x_shape = ()
+            y = f(x)
+        if(isinstance(y, (list, tuple))):
+            y = np.asarray(y)
+        if(type(y) is np.ndarray):
+            y_flat = list(y.flat)
+            self._y_shape = y.shape
+        else:
+            y_flat = [y]
+            self._y_shape = ()
+        self._y_indices = [_index(v, self.record) for v in y_flat]
+        self._y_constants = [0. if i >= 0 else v for i, v in zip(self._y_indices, y_flat)]
+        pyADiff_profiling.add_record(self.record)
+
+    @property
+    def x_indices(self):
+        """Tape indices of the (flattened) input `x`.
+        """
+        return self._x_indices
+
+    @property
+    def y_indices(self):
+        """Tape indices of the (flattened) output `y`, `-1` for outputs which are constants.
+        """
+        return self._y_indices
+
+    @property
+    def y_constants(self):
+        """Values of the (flattened) outputs which are constants, `0.` for recorded outputs.
+        """
+        return self._y_constants
+
+    @property
+    def x_shape(self):
+        """Shape of the input `x`.
+        """
+        return self._x_shape
+
+    @property
+    def y_shape(self):
+        """Shape of the output `y`.
+        """
+        return self._y_shape
+
+    @property
+    def value(self):
+        """The output `y = f(x)` at the recorded (or last replayed) input.
+        """
+        y = np.array([self.record.values(i) if i >= 0 else c for i, c in zip(self._y_indices, self._y_constants)])
+        if(len(self._y_shape) == 0):
+            return y[0]
+        return y.reshape(self._y_shape)
+
+    def replay(self, x_v):
+        """Replays the trace at the new input `x_v`.
+
+        Returns
+        -------
+        bool
+            `True` if the replay succeeded, `False` if `x_v` has a different shape or the control flow of `f` changed.
+        """
+        x_v = np.asarray(x_v)
+        if(x_v.shape != self._x_shape):
+            return False
+        return self.record.replay(self._x_indices, x_v.ravel().tolist())
+
+    def copy(self):
+        """Returns a copy of the trace with a copy of the record, e.g. to keep the values and partials at the current input while the trace is replayed.
+        """
+        trace = ADTrace.__new__(ADTrace)
+        trace.__dict__.update(self.__dict__)
+        trace.record = self.record.copy()
+        return trace
+
+    def jacobian(self, chunk_size=None, mode='reverse'):
+        """Jacobian of the recorded function via (vector) backpropagation or forward sweeps through the tape.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Number of outputs (`'reverse'`) or inputs (`'forward'`) which are propagated in one sweep. Defaults to all.
+        mode : str, optional
+            `'reverse'` or `'forward'`.
+
+        Returns
+        -------
+        scalar or array
+            The derivative of shape ``y.shape + x.shape``.
+        """
+        if(mode == 'reverse'):
+            df = _jacobian(self.record, self._y_indices, self._x_indices, chunk_size)
+        elif(mode == 'forward'):
+            df = _jacobian_forward(self.record, self._y_indices, self._x_indices, chunk_size)
+        else:
+            raise ValueError("mode has to be 'reverse' or 'forward', not {}".format(mode))
+        df = df.reshape(self._y_shape + self._x_shape)
+        if(df.ndim == 0):
+            return df[()]
+        return df
+
+    def jacobian_costs(self, memory_limit=2**28):
+        """Cost estimates of the Jacobian computations from the tape.
+
+        Estimates the time of the vector forward sweeps (one direction per input), the vector reverse sweeps (one direction per output)
+        and the scalar reverse sweeps (one sweep per output) from the number of inputs, outputs and dependencies of the tape.
+        The vector variants are chunked such that the tangent (adjoint) vectors of all nodes fit into `memory_limit` bytes.
+
+        Parameters
+        ----------
+        memory_limit : int, optional
+            Maximum number of bytes of the tangent (adjoint) vectors of one sweep.
+
+        Returns
+        -------
+        list[JacobianCost]
+            The variants, sorted by their estimated time.
+        """
+        n = len(self._x_indices)
+        m = len(self._y_indices)
+        nodes = max(len(self.record), 1)
+        edges = self.record.n_dependencies
+        costs = []
+        for mode, directions in (('forward', n), ('reverse', m)):
+            chunk_size = max(1, min(directions, memory_limit//(8*nodes)))
+            sweeps = -(-directions//chunk_size)
+            costs.append(JacobianCost(
+                mode=mode,
+                chunk_size=chunk_size,
+                sweeps=sweeps,
+                time=(sweeps*_VECTOR_SWEEP_EDGE + directions*_VECTOR_SWEEP_ENTRY)*edges,
+                memory=8*nodes*chunk_size
+            ))
+        costs.append(JacobianCost(mode='reverse', chunk_size=1, sweeps=m, time=m*_SCALAR_SWEEP_EDGE*edges, memory=0))
+        return sorted(costs, key=lambda c: c.time)
+
+    def transposed_jacobian_product(self, W):
+        """Transposed Jacobian Matrix Product.
+
+        Computes the product of the transposed derivative of the recorded function with the `k` adjoint directions `W` in a single (vector) reverse sweep.
+
+        Parameters
+        ----------
+        W : array
+            Adjoint directions of shape ``y.shape + (k,)``.
+
+        Returns
+        -------
+        array
+            The product of the transposed derivative with `W`, of shape ``x.shape + (k,)``.
+        """
+        W = np.asarray(W)
+        k = W.shape[-1]
+        W = W.reshape(-1, k)
+        rows = [r for r, i in enumerate(self._y_indices) if i >= 0]
+        adj = self.record.backpropagate_vector([self._y_indices[r] for r in rows], W[rows])
+        return adj[self._x_indices].reshape(self._x_shape + (k,))
+
+    def jacobian_product(self, V):
+        """Jacobian Matrix Product.
+
+        Computes the product of the derivative of the recorded function with the `k` tangent directions `V` in a single (vector) forward sweep through the tape,
+        without running the function again.
+
+        Parameters
+        ----------
+        V : array
+            Tangent directions of shape ``x.shape + (k,)``.
+
+        Returns
+        -------
+        array
+            The product of the derivative with `V`, of shape ``y.shape + (k,)``.
+        """
+        V = np.asarray(V)
+        k = V.shape[-1]
+        tangents = self.record.propagate_vector(self._x_indices, V.reshape(-1, k))
+        result = np.zeros((len(self._y_indices), k), dtype=tangents.dtype)
+        rows = [r for r, i in enumerate(self._y_indices) if i >= 0]
+        result[rows] = tangents[[self._y_indices[r] for r in rows]]
+        return result.reshape(self._y_shape + (k,))
+
+    def hessian_product(self, V):
+        """Hessian Matrix Product.
+
+        Computes the gradient and the product of the Hessian of the recorded scalar function with the `k` directions `V`
+        by one (vector) forward sweep of the tangents and one second order reverse sweep through the tape, without running the function again.
+
+        Parameters
+        ----------
+        V : array
+            Directions of shape ``x.shape + (k,)``.
+
+        Returns
+        -------
+        tuple(scalar or array, array)
+            The gradient of shape ``x.shape`` and the Hessian vector products of shape ``x.shape + (k,)``.
+
+        See also
+        --------
+        pyADiff.adjoint.ADRecord.backpropagate_second_order : The second order reverse sweep.
+        """
+        if(self._y_shape != ()):
+            raise ValueError('the Hessian requires a scalar function, but f returned shape {}'.format(self._y_shape))
+        V = np.asarray(V)
+        k = V.shape[-1]
+        if(self._y_indices[0] < 0):
+            return np.zeros(self._x_shape)[()], np.zeros(self._x_shape + (k,))
+        tangents = self.record.propagate_vector(self._x_indices, V.reshape(-1, k))
+        adj, adj2 = self.record.backpropagate_second_order(self._y_indices[0], tangents)
+        gradient = adj[self._x_indices].reshape(self._x_shape)
+        if(gradient.ndim == 0):
+            gradient = gradient[()]
+        return gradient, adj2[self._x_indices].reshape(self._x_shape + (k,))
+
+    def hessian(self):
+        """Dense Hessian of the recorded scalar function of shape ``x.shape + x.shape``.
+
+        Seeds the forward sweep with all unit directions, so the Hessian is computed by one forward and one reverse sweep through the tape.
+        """
+        n = len(self._x_indices)
+        H = self.hessian_product(np.eye(n).reshape(self._x_shape + (n,)))[1].reshape(self._x_shape + self._x_shape)
+        if(H.ndim == 0):
+            return H[()]
+        return H
+
+class ADTraceCache(object):
+    """ADTraceCache.
+
+    Least recently used cache of `ADTrace` s of the function `f`, one per input shape.
+
+    A cached trace is replayed at new inputs instead of tracing `f` again.
+    If the replay fails, because the control flow of `f` changed, `f` is traced again and the cached trace is replaced.
+    Only inputs of floats (or integers) are cached, inputs of ADTypes (nested differentiation) are always traced.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to record.
+    max_size : int
+        Maximum number of cached traces, the least recently used trace is evicted first.
+
+    See also
+    --------
+    pyADiff.adjoint.ADTrace : A replayable recording of a function evaluation.
+    """
+    def __init__(self, f, max_size=8):
+        self._f = f
+        self._max_size = max_size
+        self._traces = OrderedDict()
+
+    def __len__(self):
+        return len(self._traces)
+
+    def trace(self, x_v):
+        """Returns a trace of `f` at `x_v`, replayed from the cache or newly recorded.
+        """
+        if(type(x_v) is list):
+            x_v = np.array(x_v)
+        key = _cache_key(x_v)
+        if key is None:
+            return ADTrace(self._f, x_v)
+        trace = self._traces.get(key)
+        if trace is None or not trace.replay(x_v):
+            trace = ADTrace(self._f, x_v)
+            self._traces[key] = trace
+        self._traces.move_to_end(key)
+        while len(self._traces) > self._max_size:
+            self._traces.popitem(last=False)
+        return trace
+
+    def dfdx(self, x_v, chunk_size=None):
+        """Adjoint derivative of `f` at `x_v` using a (cached) trace.
+
+        See also
+        --------
+        pyADiff.adjoint.dfdx : Adjoint Differentiation Driver.
+        """
+        return self.trace(x_v).jacobian(chunk_size)
+
+class AutoJacobian(object):
+    """AutoJacobian.
+
+    Jacobian of the function `f` with automatic choice of the mode.
+
+    `f` is recorded (or a cached trace is replayed) and the cost of the forward, vector reverse and scalar reverse sweeps through the tape
+    is estimated from the number of inputs, outputs and dependencies of the tape (see `ADTrace.jacobian_costs`). The cheapest variant is used.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    mode : str, optional
+        `'auto'`, `'forward'` or `'reverse'`. A fixed mode still uses the cheapest chunking of that mode.
+    memory_limit : int, optional
+        Maximum number of bytes of the tangent (adjoint) vectors of one sweep.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache.
+
+    Attributes
+    ----------
+    last_costs : list[JacobianCost]
+        The cost estimates of the last call, sorted by their estimated time. The first entry is the chosen variant.
+
+    See also
+    --------
+    pyADiff.adjoint.ADTrace.jacobian_costs : The cost model.
+    """
+    def __init__(self, f, mode='auto', memory_limit=2**28, cache_size=8):
+        if(mode not in ('auto', 'forward', 'reverse')):
+            raise ValueError("mode has to be 'auto', 'forward' or 'reverse', not {}".format(mode))
+        self._f = f
+        self._mode = mode
+        self._memory_limit = memory_limit
+        self._cache = ADTraceCache(f, cache_size) if cache_size > 0 else None
+        self.last_costs = None
+
+    def __call__(self, x_v):
+        trace = self._trace(x_v)
+        self.last_costs = self._costs(trace)
+        best = self.last_costs[0]
+        return trace.jacobian(best.chunk_size, best.mode)
+
+    def _trace(self, x_v):
+        if self._cache is None:
+            return ADTrace(self._f, x_v)
+        return self._cache.trace(x_v)
+
+    def _costs(self, trace):
+        costs = trace.jacobian_costs(self._memory_limit)
+        if(self._mode != 'auto'):
+            costs = [c for c in costs if c.mode == self._mode]
+        return costs
+
+    def costs(self, x_v):
+        """Cost estimates of the Jacobian at `x_v` without computing it, sorted by their estimated time.
+        """
+        return self._costs(self._trace(x_v))
+
+class JacobianOperator(object):
+    """JacobianOperator.
+
+    The derivative of `f` at `x_v` as a lazy linear operator of shape ``(y.size, x.size)``.
+
+    `f` is recorded once, all products are computed on demand by forward (tangent) or reverse (adjoint) sweeps through the cached tape,
+    so that the Jacobian is never formed. Vectors are flat, following the conventions of `scipy.sparse.linalg.LinearOperator`.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x_v : scalar, list, array
+        The value where to evaluate the derivative.
+    trace : ADTrace, optional
+        An existing recording of `f`, which is used instead of tracing `f` at `x_v`.
+
+    See also
+    --------
+    pyADiff.adjoint.ADTrace.jacobian_product : Forward sweep through the tape.
+    pyADiff.adjoint.ADTrace.transposed_jacobian_product : Reverse sweep through the tape.
+    """
+    def __init__(self, f, x_v=None, trace=None):
+        self.trace = ADTrace(f, x_v) if trace is None else trace
+        self._transposed = False
+
+    @property
+    def shape(self):
+        """Shape ``(y.size, x.size)`` of the operator.
+        """
+        shape = (len(self.trace.y_indices), len(self.trace.x_indices))
+        return shape[::-1] if self._transposed else shape
+
+    @property
+    def dtype(self):
+        return np.dtype(float)
+
+    @property
+    def value(self):
+        """The output `y = f(x)` at the recorded input.
+        """
+        return self.trace.value
+
+    @property
+    def T(self):
+        """The transposed operator, which shares the tape.
+        """
+        transposed = JacobianOperator(None, trace=self.trace)
+        transposed._transposed = not self._transposed
+        return transposed
+
+    def __repr__(self):
+        return '<{}x{} JacobianOperator>'.format(*self.shape)
+
+    def _forward(self, V):
+        k = V.shape[1]
+        return self.trace.jacobian_product(V.reshape(self.trace.x_shape + (k,))).reshape(-1, k)
+
+    def _reverse(self, W):
+        k = W.shape[1]
+        return self.trace.transposed_jacobian_product(W.reshape(self.trace.y_shape + (k,))).reshape(-1, k)
+
+    def matmat(self, V):
+        """Product with the matrix `V` of shape ``(shape[1], k)`` in one vector sweep.
+        """
+        V = np.asarray(V, dtype=float)
+        if(self._transposed):
+            return self._reverse(V)
+        return self._forward(V)
+
+    def rmatmat(self, W):
+        """Product of the transposed operator with the matrix `W` of shape ``(shape[0], k)`` in one vector sweep.
+        """
+        W = np.asarray(W, dtype=float)
+        if(self._transposed):
+            return self._forward(W)
+        return self._reverse(W)
+
+    def matvec(self, v):
+        """Product with the vector `v` of length ``shape[1]``.
+        """
+        return self.matmat(np.reshape(v, (-1, 1)))[:, 0]
+
+    def rmatvec(self, w):
+        """Product of the transposed operator with the vector `w` of length ``shape[0]``.
+        """
+        return self.rmatmat(np.reshape(w, (-1, 1)))[:, 0]
+
+    def __matmul__(self, V):
+        V = np.asarray(V, dtype=float)
+        if(V.ndim == 1):
+            return self.matvec(V)
+        return self.matmat(V)
+
+    def dot(self, V):
+        return self.__matmul__(V)
+
+    def columns(self, j):
+        """The columns `j` (int or list of int) of the operator, of shape ``(shape[0],)`` or ``(shape[0], len(j))``.
+        """
+        E = np.zeros((self.shape[1], np.size(j)))
+        E[np.ravel(j), np.arange(np.size(j))] = 1.
+        C = self.matmat(E)
+        if(np.ndim(j) == 0):
+            return C[:, 0]
+        return C
+
+    def rows(self, i):
+        """The rows `i` (int or list of int) of the operator, of shape ``(shape[1],)`` or ``(len(i), shape[1])``.
+        """
+        E = np.zeros((self.shape[0], np.size(i)))
+        E[np.ravel(i), np.arange(np.size(i))] = 1.
+        R = self.rmatmat(E).T
+        if(np.ndim(i) == 0):
+            return R[0]
+        return R
+
+    def toarray(self):
+        """Returns the operator as dense matrix of shape `shape`.
+        """
+        if(self.shape[1] <= self.shape[0]):
+            return self.matmat(np.eye(self.shape[1]))
+        return self.rmatmat(np.eye(self.shape[0])).T
+
+    def aslinearoperator(self):
+        """Returns the operator as `scipy.sparse.linalg.LinearOperator` (requires scipy).
+        """
+        import scipy.sparse.linalg
+        return scipy.sparse.linalg.LinearOperator(
+            self.shape, matvec=self.matvec, rmatvec=self.rmatvec, matmat=self.matmat, rmatmat=self.rmatmat, dtype=float
+        )
+
+class GaussNewton(object):
+    """GaussNewton.
+
+    The Gauss-Newton model of the least squares objective ``0.5*||r(x)||^2`` of the residuals `r` at `x_v`.
+
+    `residual_fn` is recorded once. The gradient ``J^T r``, the products ``J v``, ``J^T w`` and the Gauss-Newton products ``J^T (J v)``
+    are computed by forward and reverse sweeps through the tape, so the Jacobian `J` is never formed (unless the dense matrix ``J^T J`` is requested).
+    Vectors are flat, of length ``x.size`` or ``r.size``, blocks of `k` vectors are matrices with `k` columns.
+
+    Parameters
+    ----------
+    residual_fn : function_type
+        The residuals of the least squares problem.
+    x_v : scalar, list, array
+        The value where to evaluate the model.
+    trace : ADTrace, optional
+        An existing recording of `residual_fn`, which is used instead of tracing `residual_fn` at `x_v`.
+        The model is only valid as long as the trace is not replayed at another input, use a copy (`ADTrace.copy`) of a shared trace.
+
+    Attributes
+    ----------
+    jacobian : JacobianOperator
+        The Jacobian of the residuals, which shares the tape.
+
+    See also
+    --------
+    pyADiff.differentiation.gauss_newton : Wrapper which caches the tape per input shape.
+    """
+    def __init__(self, residual_fn, x_v=None, trace=None):
+        self.jacobian = JacobianOperator(residual_fn, x_v, trace)
+        self._gradient = None
+
+    @property
+    def shape(self):
+        """Shape ``(x.size, x.size)`` of ``J^T J``.
+        """
+        return (self.jacobian.shape[1], self.jacobian.shape[1])
+
+    @property
+    def dtype(self):
+        return np.dtype(float)
+
+    @property
+    def residual(self):
+        """The flat residuals `r` at the recorded input.
+        """
+        return np.ravel(self.jacobian.value).astype(float)
+
+    @property
+    def cost(self):
+        """The objective ``0.5*||r||^2``.
+        """
+        r = self.residual
+        return 0.5*float(r.dot(r))
+
+    @property
+    def gradient(self):
+        """The gradient ``J^T r`` of the objective, computed by one reverse sweep.
+        """
+        if self._gradient is None:
+            self._gradient = self.jacobian.rmatvec(self.residual)
+        return self._gradient
+
+    def __repr__(self):
+        return '<{}x{} GaussNewton>'.format(*self.shape)
+
+    def jvp(self, v):
+        """Product ``J v`` with the vector `v` (or matrix of shape ``(x.size, k)``).
+        """
+        return self.jacobian @ v
+
+    def vjp(self, w):
+        """Product ``J^T w`` with the vector `w` (or matrix of shape ``(r.size, k)``).
+        """
+        return self.jacobian.T @ w
+
+    def matmat(self, V, damping=0.):
+        """Product ``J^T (J V) + damping*V`` with the matrix `V` of shape ``(x.size, k)`` by one forward and one reverse sweep.
+        """
+        V = np.asarray(V, dtype=float)
+        return self.jacobian.rmatmat(self.jacobian.matmat(V)) + damping*V
+
+    def matvec(self, v, damping=0.):
+        """Product ``J^T (J v) + damping*v`` with the vector `v` of length ``x.size``.
+        """
+        return self.matmat(np.reshape(v, (-1, 1)), damping)[:, 0]
+
+    def __matmul__(self, V):
+        V = np.asarray(V, dtype=float)
+        if(V.ndim == 1):
+            return self.matvec(V)
+        return self.matmat(V)
+
+    def dot(self, V):
+        return self.__matmul__(V)
+
+    def toarray(self, damping=0.):
+        """Returns the dense matrix ``J^T J + damping*I`` of shape ``(x.size, x.size)``, meant for small `x`.
+        """
+        J = self.jacobian.toarray()
+        return J.T.dot(J) + damping*np.eye(J.shape[1])
+
+    def aslinearoperator(self, damping=0.):
+        """Returns ``J^T J + damping*I`` as `scipy.sparse.linalg.LinearOperator` (requires scipy).
+        """
+        import scipy.sparse.linalg
+        return scipy.sparse.linalg.LinearOperator(
+            self.shape, matvec=lambda v: self.matvec(v, damping), rmatvec=lambda v: self.matvec(v, damping),
+            matmat=lambda V: self.matmat(V, damping), dtype=float
+        )
+
+JacobianCost = namedtuple('JacobianCost', ['mode', 'chunk_size', 'sweeps', 'time', 'memory'])
+JacobianCost.__doc__ = """Cost estimate of a Jacobian computation: the `mode` and `chunk_size` passed to `ADTrace.jacobian`, the number of `sweeps`,
+the estimated `time` in seconds and the `memory` in bytes of the tangent (adjoint) vectors."""
+
+# Measured costs of the sweeps in seconds: per dependency and vector sweep, per dependency and direction of a vector sweep, per dependency and scalar sweep.
+_VECTOR_SWEEP_EDGE = 2e-6
+_VECTOR_SWEEP_ENTRY = 1.3e-8
+_SCALAR_SWEEP_EDGE = 2e-7
+
+def _cache_key(x_v):
+    """Cache key of the input `x_v`, or `None` if traces of `x_v` should not be cached.
+    """
+    if(type(x_v) is np.ndarray):
+        if(x_v.dtype.kind in 'fiu'):
+            return x_v.shape
+        return None
+    if(isinstance(x_v, (float, int, np.floating, np.integer))):
+        return ()
+    return None
+
+def dfdx(f, x_v, chunk_size=None):
     """Adjoint Differentiation Driver.
 
     This computes the derivative of `f` with respect to `x` at the position `x_v`.
@@ -355,11 +1546,11 @@ def dfdx(f, x_v):
         {scalar, list, array} = f({scalar, list, array})
 
     This function converts the inputs x_v to their respective `ADTypeA`, runs the function `f` and simultaneously creates the record of all operations.
-    Then it successively sets the derivtive of the outputs `y=f(x)` to one and backpropgates through the record.
-    Then the derivative value can be collected from the inputs `x`.
+    Then it seeds the adjoints of the outputs `y=f(x)` with unit vectors and backpropgates them through the record (vector adjoint mode).
+    Then the derivative value can be collected from the adjoint vectors of the inputs `x`.
 
     Only one forward run of `f` is necessary, no matter the dimension of `x`.
-    The backpropagation is performed once for each output `y`.
+    If `y` has `m` entries, the backpropagation is performed ``ceil(m/chunk_size)`` times, each carrying adjoint vectors of length `chunk_size`.
 
     Parameters
     ----------
@@ -367,56 +1558,118 @@ def dfdx(f, x_v):
         The function to differentiate.
     x_v : scalar, list, array
         The value where to evaluate the derivative.
+    chunk_size : int, optional
+        Number of outputs which are backpropagated in one sweep. Defaults to all outputs, `1` runs one scalar sweep per output.
 
     See also
     --------
     pyADiff.differentiation.derrev : Wrapper for the comutation of the derivative via adjoint mode.
+    pyADiff.adjoint.ADRecord.backpropagate_vector : The vector reverse sweep.
+    pyADiff.adjoint.ADTrace : The recording of `f`.
     """
-    rec = ADRecord()
-    if(type(x_v) is np.ndarray):
-        x = np.empty(x_v.shape, dtype=ADTypeA)
-        for i in np.ndindex(x_v.shape):
-            x[i] = ADTypeA(x_v[i], rec)
-        y = f(x)
-        if(type(y) is np.ndarray):
-            df = None
-            for j in np.ndindex(y.shape):
-                y[j].derivative = 1.
-                rec.backpropagate()
-                if df is None:
-                    df = np.empty(y.shape + x.shape, dtype=type(x.flat[0].derivative))
-                for i in np.ndindex(x.shape):
-                    df[j + i] = x[i].derivative
-                y[j].derivative = 0.
-                rec.reset()
-        else:
-            y.derivative = 1.
-            rec.backpropagate()
-            df = np.empty(x.shape, dtype=type(x.flat[0].derivative))
-            for i in np.ndindex(x.shape):
-                df[i] = x[i].derivative
-            y.derivative = 0.
-            rec.reset()
-        return df
-    elif(type(x_v) is list):
-        return dfdx(f, np.array(x_v))
-    else:
-        x = ADTypeA(x_v, rec)
-        y = f(x)
-        if(type(y) is np.ndarray):
-            df = None
-            for j in np.ndindex(y.shape):
-                y[j].derivative = 1.
-                rec.backpropagate()
-                if df is None:
-                    df = np.empty(y.shape, dtype=type(x.derivative))
-                df[j] = x.derivative
-                y[j].derivative = 0.
-                rec.reset()
-        else:
-            y.derivative = 1.
-            rec.backpropagate()
-            df = x.derivative
-            y.derivative = 0.
-            rec.reset()
-        return df
\ No newline at end of file
+    return ADTrace(f, x_v).jacobian(chunk_size)
+
+def _jacobian_forward(record, y_indices, x_indices, chunk_size=None):
+    """Jacobian of the recorded nodes `y_indices` with respect to the nodes `x_indices`.
+
+    The columns are computed by vector forward sweeps in chunks of `chunk_size` inputs.
+    Returns an array of shape ``(len(y_indices), len(x_indices))``.
+    """
+    n = len(x_indices)
+    if chunk_size is None:
+        chunk_size = max(n, 1)
+    rows = [r for r, i in enumerate(y_indices) if i >= 0]
+    outputs = [y_indices[r] for r in rows]
+    df = np.zeros((len(y_indices), n))
+    for start in range(0, n, chunk_size):
+        chunk = x_indices[start:start + chunk_size]
+        tangents = record.propagate_vector(chunk, np.eye(len(chunk)))
+        df[rows, start:start + len(chunk)] = tangents[outputs]
+    return df
+
+def hessian_vector_product(f, x_v, V):
+    """Hessian Vector Product.
+
+    Computes the product of the Hessian of the scalar function `f` at `x_v` with the `k` directions `V` by forward over reverse mode.
+    The inputs are `ADTypeT` s, whose derivatives are seeded with `V`, and `f` is recorded once with these inputs.
+    A single reverse sweep then yields the gradient, whose tangents are the Hessian vector products.
+    The cost is a small multiple of one gradient evaluation, the Hessian is never formed.
+
+    Parameters
+    ----------
+    f : function_type
+        The scalar function.
+    x_v : scalar, list, array
+        The value where to evaluate the Hessian.
+    V : array
+        Directions of shape ``x.shape + (k,)``.
+
+    Returns
+    -------
+    tuple(scalar or array, array)
+        The gradient of `f` at `x_v` and the Hessian vector products of shape ``x.shape + (k,)``.
+
+    See also
+    --------
+    pyADiff.differentiation.hvp : Wrapper for the computation of Hessian vector products.
+    """
+    x_v = np.asarray(x_v, dtype=float)
+    V = np.asarray(V, dtype=float)
+    k = V.shape[-1]
+    x = np.empty(x_v.shape, dtype=object)
+    for i in np.ndindex(x_v.shape):
+        x[i] = pyADiff_tangent.ADTypeT(x_v[i], V[i])
+    if(x.ndim == 0):
+        x = x[()]
+    trace = ADTrace(f, x)
+    if(trace.y_shape != ()):
+        raise ValueError('the Hessian vector product requires a scalar function, but f returned shape {}'.format(trace.y_shape))
+    record = trace.record
+    record.reset()
+    if(trace.y_indices[0] >= 0):
+        record.set_adjoint(trace.y_indices[0], 1.)
+        record.backpropagate()
+    adjoints = [record.get_adjoint(i) for i in trace.x_indices]
+    record.reset()
+    gradient = np.array([pyADiff_tangent._value(a) for a in adjoints], dtype=float).reshape(x_v.shape)
+    products = np.array([pyADiff_tangent._derivatives(a, k) for a in adjoints], dtype=float).reshape(x_v.shape + (k,))
+    if(gradient.ndim == 0):
+        gradient = gradient[()]
+    return gradient, products
+
+def _index(v, record):
+    """Tape index of the output `v`, or `-1` if `v` is a constant (int, float or numpy number).
+    """
+    if(type(v) is ADTypeA and v._r is record):
+        return v.index
+    if(isinstance(v, (int, float, np.number))):
+        return -1
+    raise TypeError('the output {!r} of type {} is neither an ADTypeA of the trace nor a constant'.format(v, type(v).__name__))
+
+def _jacobian(record, y_indices, x_indices, chunk_size=None):
+    """Jacobian of the recorded nodes `y_indices` with respect to the nodes `x_indices`.
+
+    The rows are computed by (vector) backpropagation in chunks of `chunk_size` outputs.
+    Returns an array of shape ``(len(y_indices), len(x_indices))``.
+    """
+    m = len(y_indices)
+    if chunk_size is None:
+        chunk_size = max(m, 1)
+    rows = []
+    for start in range(0, m, chunk_size):
+        chunk = y_indices[start:start + chunk_size]
+        if(chunk_size == 1):
+            record.reset()
+            if(chunk[0] >= 0):
+                record.set_adjoint(chunk[0], 1.)
+                record.backpropagate()
+            rows.append(np.array([[record.get_adjoint(i) for i in x_indices]]))
+            continue
+        indices = [i for i in chunk if i >= 0]
+        seeds = np.eye(len(chunk))[[r for r, i in enumerate(chunk) if i >= 0]]
+        adj = record.backpropagate_vector(indices, seeds)
+        rows.append(adj[x_indices].T)
+    record.reset()
+    if(len(rows) == 0):
+        return np.empty((0, len(x_indices)))
+    return np.concatenate(rows, axis=0)
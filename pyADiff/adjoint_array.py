@@ -0,0 +1,677 @@
+"""Module Adjoint Array.
+
+Array-level reverse mode.
+
+The `ADArray` wraps a whole numpy array and records every numpy operation on it (element-wise ufuncs with broadcasting, reductions, slicing, reshaping)
+as a single node of an `ArrayRecord`, instead of one `ADTypeA` node per element.
+The reverse sweep applies a vectorised adjoint rule (vector Jacobian product) per node.
+
+The `ADArray` hooks into numpy through `__array_ufunc__` and `__array_function__`, so that e.g. ``np.sin(x)``, ``np.sum(x, axis=0)`` or ``x*y + 1.`` are recorded,
+and implements the mathematical functions of `pyADiff.math_functions` as member functions.
+
+The linear algebra functions `matmul` (``@``), `solve`, `inv`, `det`, `slogdet`, `cholesky` and `eigh` (also through `numpy.linalg`) are recorded as single nodes
+with closed form adjoint rules, so a matrix product or a linear solve costs one node instead of one node per scalar operation.
+`cholesky` and `eigh` assume a symmetric input, their adjoints are symmetric.
+
+Control flow on the values (comparisons) is not recorded, the comparisons of `ADArray` s return plain boolean arrays.
+
+See also
+--------
+pyADiff.adjoint: The scalar reverse mode.
+pyADiff.differentiation.derrev_array: Wrapper for the array-level reverse mode.
+"""
+from collections import Counter
+
+import numpy as np
+
+import pyADiff
+import pyADiff.profiling as pyADiff_profiling
+
+
+class ArrayRecord(object):
+    """ArrayRecord.
+
+    Stores the nodes of an array-level computation.
+    Every node holds its value, the name of its operation, the indices of its arguments and one adjoint rule per argument,
+    which maps the adjoint of the node to the contribution to the adjoint of the argument.
+    """
+    def __init__(self):
+        self._values = []
+        self._operations = []
+        self._arguments = []
+        self._rules = []
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def n_dependencies(self):
+        """Total number of dependencies (edges) stored on the tape.
+        """
+        return sum(len(a) for a in self._arguments)
+
+    @property
+    def nbytes(self):
+        """Approximate number of bytes held by the values of the tape.
+        """
+        return sum(np.asarray(v).nbytes for v in self._values)
+
+    def operation_counts(self):
+        """Number of nodes per operation.
+        """
+        return dict(Counter(self._operations))
+
+    def record_variable(self, value, dependencies, operation='var'):
+        """Adds a variable to the record.
+
+        Parameters
+        ----------
+        value : array
+            The value of the variable.
+        dependencies : list[tuple(ADArray, function_type)]
+            The arguments of the operation and the adjoint rules, which map the adjoint of the new variable to the contribution to the adjoint of the argument.
+        operation : str, optional
+            Name of the operation.
+
+        Returns
+        -------
+        int
+            Index of the variable on the tape.
+        """
+        self._values.append(value)
+        self._operations.append(operation)
+        self._arguments.append(tuple(a._i for a, _ in dependencies))
+        self._rules.append(tuple(rule for _, rule in dependencies))
+        return len(self._values) - 1
+
+    def value(self, i):
+        """Returns the recorded value of node `i`.
+        """
+        return self._values[i]
+
+    def backpropagate(self, seeds, indices):
+        """Backpropagation.
+
+        Backpropagates the adjoint `seeds` through all stored computations in reversed order.
+        The adjoints of intermediate nodes are released as soon as they are propagated.
+
+        Parameters
+        ----------
+        seeds : dict
+            Maps node indices to their adjoint seeds (arrays of the shape of the node).
+        indices : list[int]
+            The nodes whose adjoints are returned.
+
+        Returns
+        -------
+        list[array]
+            The adjoints of the nodes `indices`.
+        """
+        with pyADiff_profiling.measure('sweep'):
+            keep = set(indices)
+            adj = [None]*len(self._values)
+            for i, s in seeds.items():
+                adj[i] = np.asarray(s, dtype=float)
+            for i in range(len(self._values) - 1, -1, -1):
+                g = adj[i]
+                if g is None:
+                    continue
+                for j, rule in zip(self._arguments[i], self._rules[i]):
+                    c = rule(g)
+                    adj[j] = c if adj[j] is None else adj[j] + c
+                if i not in keep:
+                    adj[i] = None
+            return [adj[i] if adj[i] is not None else np.zeros(np.shape(self._values[i])) for i in indices]
+
+
+class ADArray(object):
+    """Array Adjoint ADType.
+
+    Wraps a numpy array `value` and records the numpy operations on it as single nodes of an `ArrayRecord`.
+
+    Supported are the element-wise ufuncs `add`, `subtract`, `multiply`, `divide`, `power`, `negative`, `positive`, `absolute`, `square`, `sqrt`, `exp`, `log`, `sin`, `cos`, `tan`, `tanh`, `maximum` and `minimum` (with broadcasting),
+    the reductions `sum` and `mean`, indexing (basic and advanced), `reshape`, `transpose`, `concatenate`, `stack` and `where`,
+    and the linear algebra functions `matmul`, `dot`, `solve`, `inv`, `det`, `slogdet`, `cholesky` and `eigh`.
+
+    Parameters
+    ----------
+    value : array
+        The value of the array.
+    record : ArrayRecord
+        The record the array belongs to.
+    dependencies : list[tuple(ADArray, function_type)], optional
+        The arguments of the operation which created the array and their adjoint rules.
+    operation : str, optional
+        Name of the operation which created the array.
+
+    See also
+    --------
+    pyADiff.adjoint_array.dfdx : Array-level adjoint differentiation driver.
+    """
+    __slots__ = ('_v', '_r', '_i')
+
+    def __init__(self, value, record, dependencies=[], operation='var'):
+        self._v = np.asarray(value)
+        self._r = record
+        self._i = record.record_variable(self._v, dependencies, operation)
+
+    @property
+    def value(self):
+        """Value of the array.
+        """
+        return self._v
+
+    @property
+    def index(self):
+        """Index of the array on the tape.
+        """
+        return self._i
+
+    @property
+    def shape(self):
+        return self._v.shape
+
+    @property
+    def ndim(self):
+        return self._v.ndim
+
+    @property
+    def size(self):
+        return self._v.size
+
+    @property
+    def dtype(self):
+        return self._v.dtype
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def __len__(self):
+        return len(self._v)
+
+    def __repr__(self):
+        return 'ADArray(' + repr(self._v) + ')'
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if(method != '__call__' or len(kwargs) > 0):
+            return NotImplemented
+        values = [_value(a) for a in inputs]
+        if ufunc in _COMPARISONS:
+            return ufunc(*values)
+        if ufunc is np.matmul:
+            return matmul(*inputs)
+        rules = _UFUNCS.get(ufunc)
+        if rules is None:
+            return NotImplemented
+        v = ufunc(*values)
+        dependencies = []
+        for k, a in enumerate(inputs):
+            if(type(a) is ADArray):
+                rule = rules[k]
+                dependencies.append((a, _unbroadcasting(rule, values, v, a.shape)))
+        return ADArray(v, self._r, dependencies, ufunc.__name__)
+
+    def __array_function__(self, func, types, args, kwargs):
+        function = _FUNCTIONS.get(func)
+        if function is None:
+            return NotImplemented
+        return function(*args, **kwargs)
+
+    def __add__(self, other):
+        return np.add(self, other)
+
+    def __radd__(self, other):
+        return np.add(other, self)
+
+    def __sub__(self, other):
+        return np.subtract(self, other)
+
+    def __rsub__(self, other):
+        return np.subtract(other, self)
+
+    def __mul__(self, other):
+        return np.multiply(self, other)
+
+    def __rmul__(self, other):
+        return np.multiply(other, self)
+
+    def __truediv__(self, other):
+        return np.true_divide(self, other)
+
+    def __rtruediv__(self, other):
+        return np.true_divide(other, self)
+
+    def __pow__(self, other):
+        return np.power(self, other)
+
+    def __matmul__(self, other):
+        return matmul(self, other)
+
+    def __rmatmul__(self, other):
+        return matmul(other, self)
+
+    def __rpow__(self, other):
+        return np.power(other, self)
+
+    def __neg__(self):
+        return np.negative(self)
+
+    def __pos__(self):
+        return np.positive(self)
+
+    def __abs__(self):
+        return np.absolute(self)
+
+    def __lt__(self, other):
+        return np.less(self, other)
+
+    def __le__(self, other):
+        return np.less_equal(self, other)
+
+    def __eq__(self, other):
+        return np.equal(self, other)
+
+    def __ne__(self, other):
+        return np.not_equal(self, other)
+
+    def __gt__(self, other):
+        return np.greater(self, other)
+
+    def __ge__(self, other):
+        return np.greater_equal(self, other)
+
+    __hash__ = None
+
+    def __getitem__(self, key):
+        key = _key(key)
+        shape = self.shape
+        if(_is_basic(key)):
+            def rule(g):
+                a = np.zeros(shape)
+                a[key] = g
+                return a
+        else:
+            def rule(g):
+                a = np.zeros(shape)
+                np.add.at(a, key, g)
+                return a
+        return ADArray(self._v[key], self._r, [(self, rule)], 'getitem')
+
+    def __setitem__(self, key, value):
+        raise TypeError('ADArray does not support item assignment, use where, concatenate or stack instead')
+
+    def sum(self, axis=None, keepdims=False):
+        shape = self.shape
+        axes = _axes(axis, self.ndim)
+        def rule(g):
+            if not keepdims:
+                g = np.expand_dims(g, axes)
+            return np.broadcast_to(g, shape)
+        return ADArray(self._v.sum(axis=axis, keepdims=keepdims), self._r, [(self, rule)], 'sum')
+
+    def mean(self, axis=None, keepdims=False):
+        count = np.prod([self.shape[a] for a in _axes(axis, self.ndim)], dtype=int)
+        return self.sum(axis=axis, keepdims=keepdims)/float(count)
+
+    def reshape(self, *shape):
+        if(len(shape) == 1 and type(shape[0]) in (tuple, list)):
+            shape = tuple(shape[0])
+        old_shape = self.shape
+        return ADArray(self._v.reshape(shape), self._r, [(self, lambda g: np.reshape(g, old_shape))], 'reshape')
+
+    def ravel(self):
+        return self.reshape(-1)
+
+    def transpose(self, *axes):
+        if(len(axes) == 1 and type(axes[0]) in (tuple, list)):
+            axes = tuple(axes[0])
+        if(len(axes) == 0):
+            axes = tuple(range(self.ndim - 1, -1, -1))
+        inverse = tuple(np.argsort(axes))
+        return ADArray(self._v.transpose(axes), self._r, [(self, lambda g: np.transpose(g, inverse))], 'transpose')
+
+    def sin(self):
+        return np.sin(self)
+
+    def cos(self):
+        return np.cos(self)
+
+    def exp(self):
+        return np.exp(self)
+
+    def log(self):
+        return np.log(self)
+
+    def sqrt(self):
+        return np.sqrt(self)
+
+    def matmul(self, other):
+        return matmul(self, other)
+
+    def solve(self, b):
+        return solve(self, b)
+
+    def inv(self):
+        return inv(self)
+
+    def det(self):
+        return det(self)
+
+    def slogdet(self):
+        return slogdet(self)
+
+    def cholesky(self):
+        return cholesky(self)
+
+    def eigh(self):
+        return eigh(self)
+
+def concatenate(arrays, axis=0):
+    """Concatenation of `ADArray` s (and constant arrays) along `axis`.
+    """
+    values = [_value(a) for a in arrays]
+    v = np.concatenate(values, axis=axis)
+    splits = np.cumsum([np.shape(a)[axis] for a in values])[:-1]
+    dependencies = []
+    for k, a in enumerate(arrays):
+        if(type(a) is ADArray):
+            dependencies.append((a, lambda g, k=k: np.split(g, splits, axis=axis)[k]))
+    return _new(v, arrays, dependencies, 'concatenate')
+
+def stack(arrays, axis=0):
+    """Stacks `ADArray` s (and constant arrays) along a new `axis`.
+    """
+    values = [_value(a) for a in arrays]
+    v = np.stack(values, axis=axis)
+    dependencies = []
+    for k, a in enumerate(arrays):
+        if(type(a) is ADArray):
+            dependencies.append((a, lambda g, k=k: np.take(g, k, axis=axis)))
+    return _new(v, arrays, dependencies, 'stack')
+
+def where(condition, a, b):
+    """Element-wise selection of `a` where `condition` holds, else `b`.
+    """
+    condition = _value(condition)
+    values = [_value(a), _value(b)]
+    v = np.where(condition, *values)
+    dependencies = []
+    if(type(a) is ADArray):
+        dependencies.append((a, _unbroadcasting(lambda g, v, a, b: np.where(condition, g, 0.), values, v, a.shape)))
+    if(type(b) is ADArray):
+        dependencies.append((b, _unbroadcasting(lambda g, v, a, b: np.where(condition, 0., g), values, v, b.shape)))
+    return _new(v, [a, b], dependencies, 'where')
+
+def matmul(a, b):
+    """Matrix product of `ADArray` s (and constant arrays), following `numpy.matmul` (vectors and stacks of matrices).
+
+    Adjoints: ``A_bar = G @ B^T`` and ``B_bar = A^T @ G``.
+    """
+    A, B = np.asarray(_value(a)), np.asarray(_value(b))
+    v = np.matmul(A, B)
+    A2 = A[np.newaxis] if A.ndim == 1 else A
+    B2 = B[:, np.newaxis] if B.ndim == 1 else B
+    shape = np.broadcast_shapes(A2.shape[:-2], B2.shape[:-2]) + (A2.shape[-2], B2.shape[-1])
+    dependencies = []
+    if(type(a) is ADArray):
+        dependencies.append((a, lambda g: _sum_to(np.matmul(np.reshape(g, shape), _t(B2)), A2.shape).reshape(A.shape)))
+    if(type(b) is ADArray):
+        dependencies.append((b, lambda g: _sum_to(np.matmul(_t(A2), np.reshape(g, shape)), B2.shape).reshape(B.shape)))
+    return _new(v, [a, b], dependencies, 'matmul')
+
+def dot(a, b):
+    """Dot product of vectors and matrices, see `matmul`.
+    """
+    if(np.ndim(_value(a)) == 0 or np.ndim(_value(b)) == 0):
+        return np.multiply(a, b)
+    if(np.ndim(_value(a)) > 2 or np.ndim(_value(b)) > 2):
+        raise TypeError('dot of ADArrays supports vectors and matrices only, use matmul for stacks of matrices')
+    return matmul(a, b)
+
+def solve(a, b):
+    """Solution `X` of the linear system ``A @ X = B``, following `numpy.linalg.solve`.
+
+    Adjoints: ``B_bar = A^-T @ G`` and ``A_bar = -B_bar @ X^T``.
+    """
+    A, B = np.asarray(_value(a)), np.asarray(_value(b))
+    vector = B.ndim == A.ndim - 1
+    B2 = B[..., np.newaxis] if vector else B
+    X2 = np.linalg.solve(A, B2)
+    v = X2[..., 0] if vector else X2
+
+    def adjoint_b(g):
+        return np.linalg.solve(_t(A), g[..., np.newaxis] if vector else g)
+
+    dependencies = []
+    if(type(a) is ADArray):
+        dependencies.append((a, lambda g: _sum_to(-np.matmul(adjoint_b(g), _t(X2)), A.shape)))
+    if(type(b) is ADArray):
+        dependencies.append((b, lambda g: _sum_to(adjoint_b(g), B2.shape).reshape(B.shape)))
+    return _new(v, [a, b], dependencies, 'solve')
+
+def inv(a):
+    """Inverse `Y` of the (stack of) square matrix `a`.
+
+    Adjoint: ``A_bar = -Y^T @ G @ Y^T``.
+    """
+    v = np.linalg.inv(_value(a))
+    return _new(v, [a], [(a, lambda g: -np.matmul(_t(v), np.matmul(g, _t(v))))] if type(a) is ADArray else [], 'inv')
+
+def det(a):
+    """Determinant `d` of the (stack of) square matrix `a`.
+
+    Adjoint: ``A_bar = G*d*A^-T``.
+    """
+    A = _value(a)
+    v = np.linalg.det(A)
+    rule = lambda g: (g*v)[..., np.newaxis, np.newaxis]*_t(np.linalg.inv(A))
+    return _new(v, [a], [(a, rule)] if type(a) is ADArray else [], 'det')
+
+def slogdet(a):
+    """Sign and logarithm of the absolute value of the determinant of the (stack of) square matrix `a`.
+
+    The sign is a constant array. Adjoint of the logarithm: ``A_bar = G*A^-T``.
+    """
+    A = _value(a)
+    sign, v = np.linalg.slogdet(A)
+    rule = lambda g: np.asarray(g)[..., np.newaxis, np.newaxis]*_t(np.linalg.inv(A))
+    return sign, _new(v, [a], [(a, rule)] if type(a) is ADArray else [], 'slogdet')
+
+def cholesky(a):
+    """Lower triangular Cholesky factor `L` of the (stack of) symmetric positive definite matrix `a`.
+
+    Adjoint (Murray): ``A_bar = sym(L^-T @ Phi(L^T @ G) @ L^-1)``, where `Phi` takes the lower triangle and halves the diagonal.
+    """
+    v = np.linalg.cholesky(_value(a))
+
+    def rule(g):
+        L_inv = np.linalg.inv(v)
+        return _sym(np.matmul(_t(L_inv), np.matmul(_phi(np.matmul(_t(v), g)), L_inv)))
+    return _new(v, [a], [(a, rule)] if type(a) is ADArray else [], 'cholesky')
+
+def eigh(a):
+    """Eigenvalues `w` (ascending) and eigenvectors `V` of the (stack of) symmetric matrix `a`.
+
+    Adjoints: ``A_bar = V @ diag(w_bar) @ V^T`` and ``A_bar = sym(V @ (F * (V^T @ V_bar)) @ V^T)`` with ``F_ij = 1/(w_j - w_i)``, ``F_ii = 0``.
+    The eigenvalues have to be distinct, if the eigenvectors are differentiated.
+    """
+    w, V = np.linalg.eigh(_value(a))
+    if(type(a) is not ADArray):
+        return w, V
+    F = _eigengap(w)
+    return (
+        ADArray(w, a._r, [(a, lambda g: np.matmul(V*np.asarray(g)[..., np.newaxis, :], _t(V)))], 'eigh'),
+        ADArray(V, a._r, [(a, lambda g: _sym(np.matmul(V, np.matmul(F*np.matmul(_t(V), g), _t(V)))))], 'eigh')
+    )
+
+def dfdx(f, x_v):
+    """Array-level Adjoint Differentiation Driver.
+
+    This computes the derivative of `f` with respect to `x` at the position `x_v`.
+    The signature of `f` is assumed to be::
+
+        {scalar, array} = f(array)
+
+    where `f` uses numpy operations on its input as a whole (no element-wise loops).
+    The input is wrapped into an `ADArray`, `f` is run once and the tape is backpropagated once per output entry,
+    so for scalar `f` (a gradient) a single reverse sweep is needed.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x_v : scalar, list, array
+        The value where to evaluate the derivative.
+
+    Returns
+    -------
+    scalar or array
+        The derivative of shape ``y.shape + x.shape``.
+
+    See also
+    --------
+    pyADiff.differentiation.derrev_array : Wrapper for the array-level reverse mode.
+    """
+    x_v = np.asarray(x_v, dtype=float)
+    record = ArrayRecord()
+    with pyADiff_profiling.measure('trace'):
+        x = ADArray(x_v, record)
+        y = f(x)
+    pyADiff_profiling.add_record(record)
+    if(type(y) is not ADArray or y._r is not record):
+        df = np.zeros(np.shape(y) + x_v.shape)
+    elif(y.size == 1):
+        df = record.backpropagate({y.index: np.ones(y.shape)}, [x.index])[0].reshape(y.shape + x_v.shape)
+    else:
+        rows = []
+        for r in range(y.size):
+            seed = np.zeros(y.size)
+            seed[r] = 1.
+            rows.append(record.backpropagate({y.index: seed.reshape(y.shape)}, [x.index])[0])
+        df = np.array(rows).reshape(y.shape + x_v.shape)
+    if(df.ndim == 0):
+        return df[()]
+    return df
+
+def _value(a):
+    """Value of `a`, which may be an `ADArray` or a constant.
+    """
+    if(type(a) is ADArray):
+        return a._v
+    return a
+
+def _new(v, arguments, dependencies, operation):
+    """New `ADArray` on the record of the first `ADArray` in `arguments`, or the plain value if there is none.
+    """
+    if(len(dependencies) == 0):
+        return v
+    return ADArray(v, dependencies[0][0]._r, dependencies, operation)
+
+def _unbroadcasting(rule, values, v, shape):
+    """Adjoint rule of an element-wise operation, which sums the contribution over the broadcasted axes to `shape`.
+    """
+    def adjoint(g):
+        c = np.asarray(rule(g, v, *values))
+        if(c.shape != shape):
+            c = np.broadcast_to(c, np.broadcast_shapes(c.shape, shape))
+            c = c.sum(axis=tuple(range(c.ndim - len(shape))))
+            c = c.sum(axis=tuple(k for k, n in enumerate(shape) if n == 1 and c.shape[k] != 1), keepdims=True)
+        return c
+    return adjoint
+
+def _sum_to(c, shape):
+    """Sums `c` over the axes, which were broadcasted from `shape`.
+    """
+    if(c.shape != shape):
+        c = c.sum(axis=tuple(range(c.ndim - len(shape))))
+        c = c.sum(axis=tuple(k for k, n in enumerate(shape) if n == 1 and c.shape[k] != 1), keepdims=True)
+    return c
+
+def _t(a):
+    """Transposes the (stack of) matrix `a`.
+    """
+    return np.swapaxes(a, -1, -2)
+
+def _sym(a):
+    """Symmetric part of the (stack of) matrix `a`.
+    """
+    return 0.5*(a + _t(a))
+
+def _phi(a):
+    """Lower triangle of the (stack of) matrix `a` with halved diagonal.
+    """
+    return np.tril(a) - 0.5*a*np.eye(a.shape[-1])
+
+def _eigengap(w):
+    """The matrix ``F_ij = 1/(w_j - w_i)`` for ``i != j`` and ``F_ii = 0`` of the eigenvalues `w`.
+    """
+    gap = w[..., np.newaxis, :] - w[..., :, np.newaxis]
+    diagonal = np.eye(w.shape[-1], dtype=bool)
+    with np.errstate(divide='ignore'):
+        return np.where(diagonal, 0., 1./np.where(diagonal, 1., gap))
+
+def _axes(axis, ndim):
+    """Normalized tuple of reduction axes.
+    """
+    if axis is None:
+        return tuple(range(ndim))
+    if(type(axis) is not tuple):
+        axis = (axis,)
+    return tuple(a % ndim for a in axis)
+
+def _key(key):
+    """Replaces `ADArray` s in an index by their values.
+    """
+    if(type(key) is tuple):
+        return tuple(_value(k) for k in key)
+    return _value(key)
+
+def _is_basic(key):
+    """Whether `key` is a basic index (integers, slices, Ellipsis and None), which does not select an entry twice.
+    """
+    if(type(key) is not tuple):
+        key = (key,)
+    return all(k is None or k is Ellipsis or isinstance(k, (int, np.integer, slice)) for k in key)
+
+# Adjoint rules of the ufuncs, one per argument: (g, v, a[, b]) -> contribution, where g is the adjoint of the result, v the result and a, b the arguments.
+_UFUNCS = {
+    np.add: (lambda g, v, a, b: g, lambda g, v, a, b: g),
+    np.subtract: (lambda g, v, a, b: g, lambda g, v, a, b: -g),
+    np.multiply: (lambda g, v, a, b: g*b, lambda g, v, a, b: g*a),
+    np.true_divide: (lambda g, v, a, b: g/b, lambda g, v, a, b: -g*v/b),
+    np.power: (lambda g, v, a, b: g*b*np.power(a, b - 1.), lambda g, v, a, b: g*v*np.log(a)),
+    np.maximum: (lambda g, v, a, b: g*(a >= b), lambda g, v, a, b: g*(a < b)),
+    np.minimum: (lambda g, v, a, b: g*(a <= b), lambda g, v, a, b: g*(a > b)),
+    np.negative: (lambda g, v, a: -g,),
+    np.positive: (lambda g, v, a: g,),
+    np.absolute: (lambda g, v, a: g*np.sign(a),),
+    np.square: (lambda g, v, a: 2.*g*a,),
+    np.sqrt: (lambda g, v, a: 0.5*g/v,),
+    np.exp: (lambda g, v, a: g*v,),
+    np.log: (lambda g, v, a: g/a,),
+    np.sin: (lambda g, v, a: g*np.cos(a),),
+    np.cos: (lambda g, v, a: -g*np.sin(a),),
+    np.tan: (lambda g, v, a: g*(1. + v**2),),
+    np.tanh: (lambda g, v, a: g*(1. - v**2),),
+}
+
+_COMPARISONS = (np.less, np.less_equal, np.equal, np.not_equal, np.greater, np.greater_equal)
+
+_FUNCTIONS = {
+    np.sum: lambda a, axis=None, keepdims=False: a.sum(axis=axis, keepdims=keepdims),
+    np.mean: lambda a, axis=None, keepdims=False: a.mean(axis=axis, keepdims=keepdims),
+    np.reshape: lambda a, newshape: a.reshape(newshape),
+    np.transpose: lambda a, axes=None: a.transpose() if axes is None else a.transpose(axes),
+    np.ravel: lambda a: a.ravel(),
+    np.concatenate: concatenate,
+    np.stack: stack,
+    np.where: where,
+    np.dot: dot,
+    np.linalg.solve: solve,
+    np.linalg.inv: inv,
+    np.linalg.det: det,
+    np.linalg.slogdet: slogdet,
+    np.linalg.cholesky: cholesky,
+    np.linalg.eigh: lambda a, UPLO='L': eigh(a),
+}
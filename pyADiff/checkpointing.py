@@ -0,0 +1,223 @@
+"""Module Checkpointing.
+
+Adjoints of long time stepping loops ``x_{k+1} = step(x_k, k)`` with bounded memory.
+
+Instead of recording all steps on one tape, only a limited number of states (checkpoints) are stored.
+During the reverse sweep the steps between two checkpoints are recomputed and only a single step is recorded at a time.
+The checkpoints are placed according to the binomial schedule of revolve (Griewank and Walther), which minimizes the number of recomputed steps for a given number of checkpoints.
+
+The checkpoints can be stored in memory or on disk.
+
+See also
+--------
+pyADiff.adjoint.ADTrace: The recording of a single step.
+"""
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import pyADiff
+import pyADiff.adjoint as pyADiff_adjoint
+
+
+class Checkpointing(object):
+    """Checkpointing.
+
+    Binomial checkpointing (revolve) for the loop ``x_{k+1} = step(x_k, k)``, ``k = 0, ..., n_steps - 1``.
+
+    `forward` runs the loop and stores the checkpoints of the first descent of the schedule,
+    `reverse` backpropagates an adjoint of the final state to the initial state, recomputing the states between the checkpoints.
+    Parameters of the loop, which are not changed by `step`, can be carried as part of the state.
+
+    Parameters
+    ----------
+    step : function_type
+        The time step, ``x_{k+1} = step(x_k, k)`` with states of type {scalar, array}.
+    n_steps : int
+        Number of steps.
+    snaps : int, optional
+        Number of checkpoints which may be stored at the same time (in addition to the initial state). Defaults to ``ceil(sqrt(n_steps))``.
+    storage : str, optional
+        `'memory'` or `'disk'`.
+    directory : str, optional
+        Directory of the checkpoints on disk, defaults to a temporary directory.
+
+    See also
+    --------
+    pyADiff.differentiation.checkpoint : Wrapper which returns the final state and a pullback.
+    """
+    def __init__(self, step, n_steps, snaps=None, storage='memory', directory=None):
+        if(storage not in ('memory', 'disk')):
+            raise ValueError("storage has to be 'memory' or 'disk', not {}".format(storage))
+        self._step = step
+        self._n_steps = n_steps
+        self._snaps = int(math.ceil(math.sqrt(n_steps))) if snaps is None else snaps
+        self._storage = _MemoryStorage() if storage == 'memory' else _DiskStorage(directory)
+        self.n_forward_steps = 0
+        self.n_adjoint_steps = 0
+        self.max_checkpoints = 0
+
+    def forward(self, x0):
+        """Runs the loop from `x0` and returns the final state.
+
+        The initial state and the checkpoints of the first descent of the schedule are stored.
+        """
+        self._storage.clear()
+        self._storage.store(0, x0)
+        positions = set()
+        i, j, snaps = 0, self._n_steps, self._snaps
+        while j - i > 1 and snaps > 0:
+            i += _advance(j - i, snaps)
+            snaps -= 1
+            positions.add(i)
+        x = x0
+        for k in range(self._n_steps):
+            if k in positions:
+                self._store(k, x)
+            x = self._advance(x, k)
+        return x
+
+    def reverse(self, x_n_bar):
+        """Backpropagates the adjoint `x_n_bar` of the final state and returns the adjoint of the initial state.
+
+        `forward` has to be called first. Afterwards only the initial state is kept, so `reverse` can be called again (with more recomputations).
+        """
+        x_bar = np.asarray(x_n_bar, dtype=float)
+        x_bar = self._reverse(0, self._n_steps, self._snaps, x_bar)
+        if(x_bar.ndim == 0):
+            return x_bar[()]
+        return x_bar
+
+    def _reverse(self, i, j, snaps, x_bar):
+        """Reverses the steps `i, ..., j-1`, where the state `i` is stored. `x_bar` is the adjoint of the state `j`.
+        """
+        while j - i > 1 and snaps > 0:
+            m = i + _advance(j - i, snaps)
+            if m not in self._storage:
+                x = self._storage.load(i)
+                for k in range(i, m):
+                    x = self._advance(x, k)
+                self._store(m, x)
+            x_bar = self._reverse(m, j, snaps - 1, x_bar)
+            self._storage.delete(m)
+            j = m
+        for k in range(j - 1, i - 1, -1):
+            x = self._storage.load(i)
+            for l in range(i, k):
+                x = self._advance(x, l)
+            x_bar = self._adjoint(x, k, x_bar)
+        return x_bar
+
+    def _advance(self, x, k):
+        self.n_forward_steps += 1
+        return self._step(x, k)
+
+    def _adjoint(self, x, k, x_bar):
+        self.n_adjoint_steps += 1
+        trace = pyADiff_adjoint.ADTrace(lambda x: self._step(x, k), x)
+        return trace.transposed_jacobian_product(x_bar[..., np.newaxis])[..., 0]
+
+    def _store(self, k, x):
+        self._storage.store(k, x)
+        self.max_checkpoints = max(self.max_checkpoints, len(self._storage) - 1)
+
+def _advance(steps, snaps):
+    """Number of steps to advance before the next checkpoint of the binomial schedule (revolve).
+
+    Parameters
+    ----------
+    steps : int
+        Number of steps which have to be reversed.
+    snaps : int
+        Number of available checkpoints.
+    """
+    reps = 0
+    binomial = 1
+    while binomial < steps:
+        reps += 1
+        binomial = binomial*(reps + snaps)//reps
+    bino1 = binomial*reps//(snaps + reps)
+    bino2 = bino1*snaps//(snaps + reps - 1) if snaps > 1 else 1
+    if(snaps == 1):
+        bino3 = 0
+    elif(snaps > 2):
+        bino3 = bino2*(snaps - 1)//(snaps + reps - 2)
+    else:
+        bino3 = 1
+    bino4 = bino2*(reps - 1)//snaps
+    if(snaps < 3):
+        bino5 = 0
+    elif(snaps > 3):
+        bino5 = bino3*(snaps - 2)//reps
+    else:
+        bino5 = 1
+    if(steps <= bino1 + bino3):
+        advance = bino4
+    elif(steps >= binomial - bino5):
+        advance = bino1
+    else:
+        advance = steps - bino2 - bino3
+    return min(max(advance, 1), steps - 1)
+
+class _MemoryStorage(object):
+    """Stores the checkpoints in a dictionary.
+    """
+    def __init__(self):
+        self._states = {}
+
+    def __contains__(self, k):
+        return k in self._states
+
+    def __len__(self):
+        return len(self._states)
+
+    def store(self, k, x):
+        self._states[k] = np.array(x, copy=True)
+
+    def load(self, k):
+        return self._states[k].copy()
+
+    def delete(self, k):
+        del self._states[k]
+
+    def clear(self):
+        self._states.clear()
+
+class _DiskStorage(object):
+    """Stores the checkpoints as `.npy` files in `directory`.
+    """
+    def __init__(self, directory=None):
+        self._temporary = directory is None
+        self._directory = tempfile.mkdtemp(prefix='pyADiff_') if directory is None else directory
+        self._keys = set()
+
+    def __contains__(self, k):
+        return k in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __del__(self):
+        if self._temporary:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _path(self, k):
+        return os.path.join(self._directory, 'checkpoint_{}.npy'.format(k))
+
+    def store(self, k, x):
+        np.save(self._path(k), np.asarray(x))
+        self._keys.add(k)
+
+    def load(self, k):
+        return np.load(self._path(k))
+
+    def delete(self, k):
+        os.remove(self._path(k))
+        self._keys.discard(k)
+
+    def clear(self):
+        for k in list(self._keys):
+            self.delete(k)
@@ -0,0 +1,305 @@
+"""Module Code Generation.
+
+Generates straight-line python code from a recorded `ADTrace`.
+
+The generated function works on flat local variables (one per node of the tape) and plain python floats, no ADType objects are created.
+It first computes the primal values, then either the adjoint (reverse) or the tangent (forward) sweep.
+Every recorded comparison is checked, if the control flow of the recorded function changes at new inputs a `ControlFlowException` is raised.
+
+See also
+--------
+pyADiff.adjoint.ADTrace: The recording of a function.
+pyADiff.adjoint.ADRecord: The record of all operations.
+"""
+import math
+
+import numpy as np
+
+import pyADiff
+from pyADiff.exceptions import ControlFlowException
+
+
+# Templates of the values and partial derivatives of the operations.
+# {a} and {b} are the arguments, {c} the constant operand and {v} the value of the node itself.
+_VALUES = {
+    'add': '{a} + {b}',
+    'add_const': '{a} + {c}',
+    'sub': '{a} - {b}',
+    'sub_const': '{a} - {c}',
+    'rsub_const': '{c} - {a}',
+    'mul': '{a}*{b}',
+    'mul_const': '{a}*{c}',
+    'div': '{a}/{b}',
+    'div_const': '{a}/{c}',
+    'rdiv_const': '{c}/{a}',
+    'pow': '{a}**{b}',
+    'pow_const': '{a}**{c}',
+    'rpow_const': '{c}**{a}',
+    'neg': '-{a}',
+    'pos': '{a}',
+    'sin': 'sin({a})',
+    'cos': 'cos({a})',
+    'exp': 'exp({a})',
+    'log': 'log({a})',
+    'sqrt': 'sqrt({a})'
+}
+
+_PARTIALS = {
+    'add': ('1.', '1.'),
+    'add_const': ('1.',),
+    'sub': ('1.', '-1.'),
+    'sub_const': ('1.',),
+    'rsub_const': ('-1.',),
+    'mul': ('{b}', '{a}'),
+    'mul_const': ('{c}',),
+    'div': ('1./{b}', '-{v}/{b}'),
+    'div_const': ('1./{c}',),
+    'rdiv_const': ('-{v}/{a}',),
+    'pow': ('{b}*{a}**({b} - 1.)', '{v}*log({a})'),
+    'pow_const': ('{c}*{a}**({c} - 1.)',),
+    'rpow_const': ('{v}*log({c})',),
+    'neg': ('-1.',),
+    'pos': ('1.',),
+    'sin': ('cos({a})',),
+    'cos': ('-sin({a})',),
+    'exp': ('{v}',),
+    'log': ('1./{a}',),
+    'sqrt': ('0.5/{v}',)
+}
+
+_COMPARISONS = {
+    'lt': '<',
+    'le': '<=',
+    'eq': '==',
+    'ne': '!=',
+    'gt': '>',
+    'ge': '>='
+}
+
+# The functions are bound from numpy (not math), so that the generated code returns inf and nan outside of the domain like the tape.
+_NAMESPACE = {
+    'sin': np.sin,
+    'cos': np.cos,
+    'exp': np.exp,
+    'log': np.log,
+    'sqrt': np.sqrt,
+    'inf': np.inf,
+    'nan': np.nan,
+    'ControlFlowException': ControlFlowException
+}
+
+
+class CompiledTrace(object):
+    """CompiledTrace.
+
+    Straight-line python code generated from an `ADTrace`, which computes the derivative of the recorded function at new inputs.
+
+    In `'adjoint'` mode the generated function has the signature ``y, x_bar = adjoint(x, y_bar)``,
+    in `'tangent'` mode ``y, y_dot = tangent(x, x_dot)``, where all arguments and results are flat lists.
+    The seeds can be floats or numpy vectors (then several directions are propagated at once).
+    The generated source is available as `source`.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of the function, the values of the record have to be floats.
+    mode : str
+        `'adjoint'` or `'tangent'`.
+
+    See also
+    --------
+    pyADiff.codegen.generate_source : Generates the source code.
+    pyADiff.differentiation.compile_derivative : Wrapper which traces and compiles a function.
+    """
+    def __init__(self, trace, mode='adjoint'):
+        self._source = generate_source(trace, mode)
+        self._mode = mode
+        self._x_shape = trace.x_shape
+        self._y_shape = trace.y_shape
+        namespace = dict(_NAMESPACE)
+        exec(compile(self._source, '<pyADiff.codegen>', 'exec'), namespace)
+        self._function = namespace[mode]
+
+    @property
+    def source(self):
+        """The generated python source code.
+        """
+        return self._source
+
+    @property
+    def mode(self):
+        """The mode of the generated derivative code, `'adjoint'` or `'tangent'`.
+        """
+        return self._mode
+
+    def evaluate(self, x_v, seeds):
+        """Runs the generated function.
+
+        Parameters
+        ----------
+        x_v : scalar, list, array
+            The value where to evaluate the derivative, of the same shape as the recorded input.
+        seeds : list
+            The flat adjoint seeds of the outputs (`'adjoint'`) or tangent seeds of the inputs (`'tangent'`).
+
+        Returns
+        -------
+        tuple(list, list)
+            The flat outputs and the flat adjoints of the inputs (`'adjoint'`) or tangents of the outputs (`'tangent'`).
+        """
+        x_v = np.asarray(x_v, dtype=float)
+        if(x_v.shape != self._x_shape):
+            raise ValueError('the input has shape {}, but the trace was recorded with shape {}'.format(x_v.shape, self._x_shape))
+        return self._function(list(x_v.ravel()), seeds)
+
+    def __call__(self, x_v):
+        """Derivative of the recorded function at `x_v` of shape ``y.shape + x.shape``.
+        """
+        n = int(np.prod(self._x_shape, dtype=int))
+        m = int(np.prod(self._y_shape, dtype=int))
+        k = m if self._mode == 'adjoint' else n
+        seeds = [1.] if k == 1 else list(np.eye(k))
+        _, d = self.evaluate(x_v, seeds)
+        d = np.array([np.broadcast_to(v, (k,)) if k > 1 else v for v in d], dtype=float).reshape(-1, k)
+        if(self._mode == 'adjoint'):
+            d = d.T
+        df = d.reshape(self._y_shape + self._x_shape)
+        if(df.ndim == 0):
+            return df[()]
+        return df
+
+def generate_source(trace, mode='adjoint'):
+    """Generates straight-line python code from an `ADTrace`.
+
+    Only the nodes of the tape which the outputs or the recorded comparisons depend on are emitted.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of the function, the values of the record have to be floats.
+    mode : str
+        `'adjoint'` or `'tangent'`.
+
+    Returns
+    -------
+    str
+        The source of the function `adjoint(x, y_bar)` or `tangent(x, x_dot)`.
+    """
+    if(mode not in ('adjoint', 'tangent')):
+        raise ValueError("mode has to be 'adjoint' or 'tangent', not {}".format(mode))
+    record = trace.record
+    tape = record.tape()
+    n = len(record)
+    op = tape.operations
+    val = tape.values
+    const = tape.constants
+    args = tape.arguments
+    if(not all(isinstance(v, float) for v in val)):
+        raise TypeError('only records of float values can be compiled')
+    x_indices = trace.x_indices
+    y_indices = trace.y_indices
+    inputs = set(x_indices)
+
+    live = [False]*n
+    for i in y_indices:
+        if(i >= 0):
+            live[i] = True
+    for _, i, j, _, _ in record.guards:
+        live[i] = True
+        if(j >= 0):
+            live[j] = True
+    for i in range(n - 1, -1, -1):
+        if live[i]:
+            for j in args[i]:
+                live[j] = True
+
+    lines = ['def {}(x, {}):'.format(mode, 'y_bar' if mode == 'adjoint' else 'x_dot')]
+    for k, i in enumerate(x_indices):
+        lines.append('    v{} = x[{}]'.format(i, k))
+    guards = {}
+    for comparison, i, j, c, outcome in record.guards:
+        guards.setdefault(max(i, j), []).append((comparison, i, j, c, outcome))
+    for i in range(n):
+        if live[i] and i not in inputs:
+            if(op[i] == 'var'):
+                lines.append('    v{} = {}'.format(i, _literal(val[i])))
+            else:
+                lines.append('    v{} = {}'.format(i, _format(_VALUES[op[i]], i, args[i], const[i])))
+        for comparison, a, b, c, outcome in guards.get(i, []):
+            condition = 'v{} {} {}'.format(a, _COMPARISONS[comparison], 'v{}'.format(b) if b >= 0 else _literal(c))
+            lines.append('    if {}({}):'.format('not ' if outcome else '', condition))
+            lines.append('        raise ControlFlowException')
+    outputs = ', '.join('v{}'.format(i) if i >= 0 else _literal(c) for i, c in zip(y_indices, trace.y_constants))
+
+    if(mode == 'adjoint'):
+        assigned = set()
+        for k, i in enumerate(y_indices):
+            if(i >= 0):
+                lines.append(_accumulate(i, 'y_bar[{}]'.format(k), assigned))
+        for i in range(n - 1, -1, -1):
+            if i not in assigned or i in inputs:
+                continue
+            for j, p in zip(args[i], _PARTIALS.get(op[i], ())):
+                p = _format(p, i, args[i], const[i])
+                if(p == '1.'):
+                    lines.append(_accumulate(j, 'a{}'.format(i), assigned))
+                elif(p == '-1.'):
+                    lines.append(_accumulate(j, '-a{}'.format(i), assigned))
+                else:
+                    lines.append(_accumulate(j, '({})*a{}'.format(p, i), assigned))
+        derivatives = ', '.join('a{}'.format(i) if i in assigned else '0.' for i in x_indices)
+    else:
+        tangents = set()
+        for k, i in enumerate(x_indices):
+            lines.append('    t{} = x_dot[{}]'.format(i, k))
+            tangents.add(i)
+        for i in range(n):
+            if not live[i] or i in inputs:
+                continue
+            terms = []
+            for j, p in zip(args[i], _PARTIALS.get(op[i], ())):
+                if j not in tangents:
+                    continue
+                p = _format(p, i, args[i], const[i])
+                if(p == '1.'):
+                    terms.append('t{}'.format(j))
+                elif(p == '-1.'):
+                    terms.append('-t{}'.format(j))
+                else:
+                    terms.append('({})*t{}'.format(p, j))
+            if(len(terms) > 0):
+                lines.append('    t{} = {}'.format(i, ' + '.join(terms)))
+                tangents.add(i)
+        derivatives = ', '.join('t{}'.format(i) if i in tangents else '0.' for i in y_indices)
+    lines.append('    return [{}], [{}]'.format(outputs, derivatives))
+    return '\n'.join(lines) + '\n'
+
+def _literal(c):
+    """Python literal of the float constant `c`.
+    """
+    c = float(c)
+    if(math.isnan(c)):
+        return 'nan'
+    if(math.isinf(c)):
+        return 'inf' if c > 0 else '(-inf)'
+    if(c < 0 or (c == 0 and math.copysign(1., c) < 0)):
+        return '({})'.format(repr(c))
+    return repr(c)
+
+def _format(template, i, args, c):
+    """Fills the template of node `i`.
+    """
+    return template.format(
+        v='v{}'.format(i),
+        a='v{}'.format(args[0]) if len(args) > 0 else '',
+        b='v{}'.format(args[1]) if len(args) > 1 else '',
+        c=_literal(c)
+    )
+
+def _accumulate(j, expression, assigned):
+    """Line which adds `expression` to the adjoint of node `j`.
+    """
+    if j in assigned:
+        return '    a{} = a{} + {}'.format(j, j, expression)
+    assigned.add(j)
+    return '    a{} = {}'.format(j, expression)
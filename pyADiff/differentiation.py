@@ -5,12 +5,26 @@ The functions defined here wrap the tangent and adjoint derivative computations
 The tangent/forward computation is wrapped as `derfor`, the adjoint/reverse computation as `derrev`.
 For convenience also the functions `derivative`, `gradient` and `hessian` are implemented, but they simply call `derfor`/`derrev`.
 """
+import weakref
+
+import numpy as np
+
 import pyADiff
 import pyADiff.tangent as pyADiff_tangent
 import pyADiff.adjoint as pyADiff_adjoint
-
-
-def derfor(f):
+import pyADiff.codegen as pyADiff_codegen
+import pyADiff.sparse as pyADiff_sparse
+import pyADiff.checkpointing as pyADiff_checkpointing
+import pyADiff.profiling as pyADiff_profiling
+import pyADiff.adjoint_array as pyADiff_adjoint_array
+import pyADiff.tangent_array as pyADiff_tangent_array
+import pyADiff.higher_order as pyADiff_higher_order
+import pyADiff.elimination as pyADiff_elimination
+import pyADiff.separability as pyADiff_separability
+import pyADiff.randomized as pyADiff_randomized
+
+
+def derfor(f, chunk_size=None):
     """Forward Differentiation.
 
     Wraps the calculation of the derivative of `f` with respect to its inputs via tangent mode differentiation.
@@ -30,6 +44,8 @@ def derfor(f):
     ----------
     f : function_type
         The function to be differentiated. 
+    chunk_size : int, optional
+        Number of tangent directions propagated together in one (vector) run of f. Defaults to all inputs.
 
     Returns
     -------
@@ -41,9 +57,9 @@ def derfor(f):
     pyADiff.tangent.dfdx : The function which actually computes the derivative.
     pyADiff.tangent.ADTypeT : The overloaded scalar ADType which is used for the computation.
     """
-    return lambda x: pyADiff_tangent.dfdx(f, x)
+    return lambda x: pyADiff_tangent.dfdx(f, x, chunk_size)
 
-def derrev(f):
+def derrev(f, chunk_size=None, cache_size=8):
     """Adjoint Differentiation.
 
     Wraps the calculation of the derivative of f with respect to its inputs via adjoint mode differentiation.
@@ -59,10 +75,18 @@ def derrev(f):
 
     .. math:: f': \\mathbb{R}^{i \\times j \\times ...} \\to \\mathbb{R}^{m \\times n \\times ... \\times i \\times j \\times ...}
 
+    The record of f is cached per input shape and replayed at new inputs instead of running f again.
+    Comparisons of the inputs are recorded, if one of them evaluates differently at a new input f is traced again.
+    Therefore f must be a pure function of its input, which does not access the `value` of its arguments directly.
+
     Parameters
     ----------
     f : function_type
         The function to be differentiated. 
+    chunk_size : int, optional
+        Number of outputs of f which are backpropagated together in one (vector) reverse sweep. Defaults to all outputs.
+    cache_size : int, optional
+        Maximum number of cached records (least recently used are evicted), `0` disables the cache.
 
     Returns
     -------
@@ -74,8 +98,12 @@ def derrev(f):
     pyADiff.adjoint.dfdx : Function actually computes the derivative.
     pyADiff.adjoint.ADTypeA : The overloaded scalar ADType which holds the derivtives.
     pyADiff.adjoint.ADRecord : The object which holds the "record" of single assignment operations.
+    pyADiff.adjoint.ADTraceCache : The cache of records.
     """
-    return lambda x: pyADiff_adjoint.dfdx(f, x)
+    if(cache_size == 0):
+        return lambda x: pyADiff_adjoint.dfdx(f, x, chunk_size)
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    return lambda x: cache.dfdx(x, chunk_size)
 
 def derivative(f):
     """Derivative Computation
@@ -101,7 +129,7 @@ def derivative(f):
     """
     return derfor(f)
 
-def gradient(f):
+def gradient(f, cache_size=8):
     """Gradient Computation
 
     Uses adjoint mode differentiation to calculate the gradient.
@@ -113,6 +141,8 @@ def gradient(f):
     ----------
     f : function_type
         The function to be differentiated. 
+    cache_size : int, optional
+        Maximum number of cached records of f, `0` disables the cache.
 
     Returns
     -------
@@ -123,9 +153,9 @@ def gradient(f):
     --------
     pyADiff.differentiation.derrev : Wrapper for the comutation of the derivative via adjoint mode.
     """
-    return derrev(f)
+    return derrev(f, cache_size=cache_size)
     
-def hessian(f):
+def hessian(f, mode='nested', cache_size=8):
     """Hessian Computation
 
     Uses tangent and adjoint mode differentiation to calculate the hessian.
@@ -133,10 +163,18 @@ def hessian(f):
     
     Nevertheless `f` is not assumed to have this signature.
 
+    With `mode='tape'` the function has to be scalar. It is recorded once (cached per input shape and replayed at new inputs)
+    and the Hessian is computed by one vector forward sweep of the tangents and one second order reverse sweep through the flat tape,
+    instead of running the adjoint mode with `ADTypeT` values once per tangent direction.
+
     Parameters
     ----------
     f : function_type
         The function to be differentiated. 
+    mode : str, optional
+        `'nested'` (tangent over adjoint mode) or `'tape'` (second order sweeps through one tape).
+    cache_size : int, optional
+        Maximum number of cached traces of f in `'tape'` mode (one per input shape). `0` disables the cache.
 
     Returns
     -------
@@ -147,6 +185,724 @@ def hessian(f):
     --------
     pyADiff.differentiation.derfor : Wrapper for the comutation of the derivative via tangent mode.
     pyADiff.differentiation.derrev : Wrapper for the comutation of the derivative via adjoint mode.
+    pyADiff.adjoint.ADTrace.hessian : The Hessian by second order sweeps through the tape.
+    """
+    if(mode == 'nested'):
+        return derfor(derrev(f))
+    if(mode != 'tape'):
+        raise ValueError("mode has to be 'nested' or 'tape', not {}".format(mode))
+    if(cache_size == 0):
+        return lambda x: pyADiff_adjoint.ADTrace(f, x).hessian()
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    return lambda x: cache.trace(x).hessian()
+
+
+def compile_derivative(f, x, mode='adjoint'):
+    """Compiled Derivative.
+
+    Traces `f` once at `x` and generates straight-line python code for its derivative, which works on plain floats without any ADType objects.
+    The returned function computes the derivative at new inputs of the same shape, as long as the control flow of `f` does not change (otherwise a `ControlFlowException` is raised).
+
+    Parameters
+    ----------
+    f : function_type
+        The function to be differentiated. 
+    x : scalar, list, array
+        The value where `f` is traced.
+    mode : str, optional
+        `'adjoint'` or `'tangent'`, the mode of the generated derivative code.
+
+    Returns
+    -------
+    CompiledTrace
+        A callable which returns the derivative of f, its generated code is available as `source`.
+
+    See also
+    --------
+    pyADiff.codegen.CompiledTrace : The compiled derivative code.
+    pyADiff.adjoint.ADTrace : The recording of f.
+    """
+    return pyADiff_codegen.CompiledTrace(pyADiff_adjoint.ADTrace(f, x), mode)
+
+def sparse_jacobian(f, pattern=None, mode='auto', cache_size=8):
+    """Sparse Jacobian Computation
+
+    Uses graph coloring and compressed tangent or adjoint directions to compute the Jacobian of f as sparse matrix.
+    Instead of one tangent run of f per input (or one reverse sweep per output) only one direction per color is needed, e.g. three for a tridiagonal Jacobian of any size.
+
+    The signature of f is assumed to be::
+
+        {scalar, list, array} = f({scalar, list, array})
+
+    and the Jacobian is returned with the flattened shape ``(y.size, x.size)``.
+    The traces of f are cached per input shape and replayed at new inputs.
+    If no pattern is given, it is computed from the tape of every new trace, i.e. again whenever the control flow of f changes and f is traced again.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to be differentiated. 
+    pattern : COOMatrix, array or scipy.sparse matrix, optional
+        The sparsity pattern of the Jacobian.
+    mode : str, optional
+        `'forward'` (column coloring), `'reverse'` (row coloring) or `'auto'`.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache, then the pattern is detected at every call.
+
+    Returns
+    -------
+    function_type
+        A function which returns the Jacobian of f as `COOMatrix`.
+
+    See also
+    --------
+    pyADiff.sparse.dfdx : The function which actually computes the sparse Jacobian.
+    pyADiff.sparse.COOMatrix : The sparse matrix format.
+    """
+    if(cache_size == 0):
+        return lambda x: pyADiff_sparse.dfdx(f, x, pattern, mode)
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    patterns = weakref.WeakKeyDictionary()
+
+    def df(x):
+        trace = cache.trace(x)
+        p = pattern
+        if p is None:
+            p = patterns.get(trace)
+            if p is None:
+                p = patterns[trace] = pyADiff_sparse.jacobian_pattern(trace)
+        return pyADiff_sparse.dfdx(f, x, p, mode, trace)
+    return df
+
+def jacobian_sparsity(f):
+    """Jacobian Sparsity Pattern
+
+    Uses index set propagation (one run of f with `ADTypeS` inputs, no derivative values) to detect the structural nonzeros of the Jacobian of f.
+    The pattern has the flattened shape ``(y.size, x.size)``.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to be analysed. 
+
+    Returns
+    -------
+    function_type
+        A function which returns the boolean sparsity pattern as `COOMatrix`.
+
+    See also
+    --------
+    pyADiff.sparse.detect_jacobian_pattern : The function which actually detects the pattern.
+    """
+    return lambda x: pyADiff_sparse.detect_jacobian_pattern(f, x)
+
+def hessian_sparsity(f):
+    """Hessian Sparsity Pattern
+
+    Uses index set propagation with nonlinear interaction sets to detect the structural nonzeros of the Hessian of f.
+    The pattern has the shape ``(x.size, x.size)``.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to be analysed. 
+
+    Returns
+    -------
+    function_type
+        A function which returns the symmetric boolean sparsity pattern as `COOMatrix`.
+
+    See also
+    --------
+    pyADiff.sparse.detect_hessian_pattern : The function which actually detects the pattern.
+    """
+    return lambda x: pyADiff_sparse.detect_hessian_pattern(f, x)
+
+def checkpoint(step, n_steps, x0, snaps=None, storage='memory', directory=None):
+    """Checkpointed Time Stepping
+
+    Runs the loop ``x_{k+1} = step(x_k, k)`` for ``k = 0, ..., n_steps - 1`` and returns the final state together with a pullback,
+    which maps an adjoint of the final state to the adjoint of `x0`.
+    Only `snaps` states are stored at a time (binomial checkpointing, revolve), the steps in between are recomputed and recorded one at a time during the reverse sweep.
+
+    Parameters
+    ----------
+    step : function_type
+        The time step with the signature ``{scalar, array} = step({scalar, array}, int)``.
+    n_steps : int
+        Number of steps.
+    x0 : scalar, array
+        The initial state.
+    snaps : int, optional
+        Number of checkpoints, defaults to ``ceil(sqrt(n_steps))``.
+    storage : str, optional
+        `'memory'` or `'disk'`.
+    directory : str, optional
+        Directory of the checkpoints on disk, defaults to a temporary directory.
+
+    Returns
+    -------
+    tuple(scalar or array, function_type)
+        The final state and the pullback ``x0_bar = pullback(x_n_bar)``.
+
+    See also
+    --------
+    pyADiff.checkpointing.Checkpointing : The class which actually implements the schedule.
+    """
+    checkpointing = pyADiff_checkpointing.Checkpointing(step, n_steps, snaps, storage, directory)
+    return checkpointing.forward(x0), checkpointing.reverse
+
+def profile():
+    """Profiling
+
+    Returns a `Profile`, which collects statistics of all differentiations inside its ``with`` block::
+
+        with pyADiff.profile() as p:
+            df = pyADiff.derrev(f)(x)
+        p.as_dict()
+
+    Reported are the operation counts, dependencies and bytes of the recorded tapes, the number and time of traces, replays, reverse sweeps and resets,
+    and the number and time of the runs of `f` in tangent mode as well as the number of `ADTypeT` allocations.
+
+    Returns
+    -------
+    Profile
+        The profile, to be used as context manager.
+
+    See also
+    --------
+    pyADiff.profiling.Profile : The collected statistics.
+    """
+    return pyADiff_profiling.Profile()
+
+def derrev_array(f):
+    """Array-level Reverse Derivative
+
+    Uses the array-level reverse mode (`ADArray`) to compute the derivative of f.
+    Every numpy operation on the input as a whole (ufuncs, reductions, slicing) is recorded as a single node, instead of one node per element.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to be differentiated, written with numpy operations on its array input.
+
+    Returns
+    -------
+    function_type
+        A function which calculates the derivative of f.
+
+    See also
+    --------
+    pyADiff.adjoint_array.dfdx : The function which actually computes the derivative.
+    """
+    return lambda x: pyADiff_adjoint_array.dfdx(f, x)
+
+def derfor_array(f, chunk_size=None):
+    """Array-level Forward Derivative
+
+    Uses the array-level forward mode (`DualArray`) to compute the derivative of f.
+    Values and tangents are held in two arrays and propagated with vectorised numpy operations, no python object is created per element.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to be differentiated, written with numpy operations on its array input.
+    chunk_size : int, optional
+        Number of tangent directions propagated in one run of f. Defaults to all entries of the input.
+
+    Returns
+    -------
+    function_type
+        A function which calculates the derivative of f.
+
+    See also
+    --------
+    pyADiff.tangent_array.dfdx : The function which actually computes the derivative.
+    """
+    return lambda x: pyADiff_tangent_array.dfdx(f, x, chunk_size)
+
+def hvp(f):
+    """Hessian Vector Product
+
+    Uses forward over reverse mode to compute products of the Hessian of the scalar function f with vectors, without forming the Hessian.
+    f is recorded once with tangent inputs seeded by the vectors and one reverse sweep yields all products.
+
+    The returned function is called as ``hvp(f)(x, v)``:
+    if `v` has the shape of `x` the product has the shape of `x`,
+    if `V` has the shape ``x.shape + (k,)`` the `k` products are computed at once and returned with the shape ``x.shape + (k,)``.
+
+    Parameters
+    ----------
+    f : function_type
+        The scalar function.
+
+    Returns
+    -------
+    function_type
+        A function which calculates the Hessian vector product(s) of f.
+
+    See also
+    --------
+    pyADiff.adjoint.hessian_vector_product : The function which actually computes the products.
+    """
+    def Hv(x, v):
+        x = np.asarray(x, dtype=float)
+        v = np.asarray(v, dtype=float)
+        if(v.shape == x.shape):
+            return pyADiff_adjoint.hessian_vector_product(f, x, v[..., np.newaxis])[1][..., 0]
+        return pyADiff_adjoint.hessian_vector_product(f, x, v)[1]
+    return Hv
+
+def sparse_hessian(f, cache_size=8):
+    """Sparse Hessian
+
+    Uses edge pushing, a second order reverse sweep through the recorded tape, to compute the Hessian of the scalar function f as sparse matrix.
+    Only the nonzero interactions are created and propagated, so that memory and time scale with the number of nonzeros instead of ``n**2``.
+    The traces of f are cached per input shape and replayed at new inputs.
+
+    Parameters
+    ----------
+    f : function_type
+        The scalar function.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache.
+
+    Returns
+    -------
+    function_type
+        A function which returns the lower triangle of the Hessian as `COOMatrix` of shape ``(x.size, x.size)``.
+
+    See also
+    --------
+    pyADiff.sparse.edge_pushing : The second order reverse sweep.
+    """
+    if(cache_size == 0):
+        return lambda x: pyADiff_sparse.hessian(f, x)
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    return lambda x: pyADiff_sparse.edge_pushing(cache.trace(x))[1]
+
+def taylor(f, x, direction, order):
+    """Taylor Coefficients
+
+    Propagates a truncated univariate Taylor series (`ADTypeTaylor`) through f to compute the Taylor coefficients of ``t -> f(x + t*direction)`` up to the degree `order` in one run of f.
+    The `k`-th coefficient is the `k`-th directional derivative of f in `direction` divided by ``k!``, at a cost of ``O(order**2)`` per operation.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to expand.
+    x : scalar, list, array
+        The point of expansion.
+    direction : scalar, list, array
+        The direction of the line, of the same shape as `x`.
+    order : int
+        The highest degree of the coefficients.
+
+    Returns
+    -------
+    array
+        The coefficients of shape ``y.shape + (order + 1,)``.
+
+    See also
+    --------
+    pyADiff.higher_order.taylor_coefficients : The function which actually computes the coefficients.
+    """
+    return pyADiff_higher_order.taylor_coefficients(f, x, direction, order)
+
+def derivative_tensor(f, order):
+    """Derivative Tensor
+
+    Computes the unique entries of the derivative tensor of order `order` of f by interpolation from univariate Taylor series along
+    ``binom(n + order - 1, order)`` directions, which are propagated together in one run of f.
+    The tensor is returned in packed symmetric form, no permuted entry is computed or stored twice.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    order : int
+        Order of the derivative tensor.
+
+    Returns
+    -------
+    function_type
+        A function which returns the derivative tensor of f as `SymmetricTensor`.
+
+    See also
+    --------
+    pyADiff.higher_order.derivative_tensor : The function which actually computes the tensor.
+    pyADiff.higher_order.SymmetricTensor : The packed tensor format.
+    """
+    return lambda x: pyADiff_higher_order.derivative_tensor(f, x, order)
+
+def jvp(f):
+    """Jacobian Vector Product
+
+    Computes the product of the derivative of f with a tangent vector in one tangent run of f, seeded with the vector.
+    The Jacobian is never formed.
+
+    The returned function is called as ``jvp(f)(x, v)`` and returns the value ``y = f(x)`` and the product:
+    if `v` has the shape of `x` the product has the shape of `y`,
+    if `V` has the shape ``x.shape + (k,)`` the `k` products are propagated in the same run and returned with the shape ``y.shape + (k,)``.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+
+    Returns
+    -------
+    function_type
+        A function which calculates `y` and the Jacobian vector product(s).
+
+    See also
+    --------
+    pyADiff.tangent.jacobian_product : The function which actually computes the products.
+    """
+    def Jv(x, v):
+        x = np.asarray(x, dtype=float)
+        v = np.asarray(v, dtype=float)
+        if(v.shape == x.shape):
+            y, d = pyADiff_tangent.jacobian_product(f, x, v[..., np.newaxis])
+            d = d[..., 0]
+            if(d.ndim == 0):
+                d = d[()]
+            return y, d
+        return pyADiff_tangent.jacobian_product(f, x, v)
+    return Jv
+
+def vjp(f):
+    """Vector Jacobian Product
+
+    Records f at `x` once and returns the value ``y = f(x)`` together with a pullback, which computes the product of a cotangent `w` with the derivative of f
+    by a reverse sweep through the recorded tape, without tracing f again. The Jacobian is never formed.
+
+    The pullback is called as ``pullback(w)``:
+    if `w` has the shape of `y` the product has the shape of `x`,
+    if `W` has the shape ``y.shape + (k,)`` the `k` products are computed in one vector reverse sweep and returned with the shape ``x.shape + (k,)``.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+
+    Returns
+    -------
+    function_type
+        A function which returns `y` and the pullback for a given `x`.
+
+    See also
+    --------
+    pyADiff.adjoint.ADTrace.transposed_jacobian_product : The function which actually computes the products.
+    """
+    def value_and_pullback(x):
+        trace = pyADiff_adjoint.ADTrace(f, x)
+        def pullback(w):
+            w = np.asarray(w, dtype=float)
+            if(w.shape == trace.y_shape):
+                d = trace.transposed_jacobian_product(w[..., np.newaxis])[..., 0]
+                if(d.ndim == 0):
+                    d = d[()]
+                return d
+            return trace.transposed_jacobian_product(w)
+        return trace.value, pullback
+    return value_and_pullback
+
+def jacobian_operator(f, x):
+    """Jacobian Operator
+
+    Records f at `x` once and returns its derivative as lazy linear operator of shape ``(y.size, x.size)``.
+    Products with vectors and matrices (`matvec`, `rmatvec`, `matmat`, `rmatmat`) as well as single `columns` and `rows` are computed on demand
+    by forward or reverse sweeps through the cached tape, the dense Jacobian is never formed.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x : scalar, list, array
+        The value where to evaluate the derivative.
+
+    Returns
+    -------
+    JacobianOperator
+        The derivative of f at `x`.
+
+    See also
+    --------
+    pyADiff.adjoint.JacobianOperator : The operator class.
+    """
+    return pyADiff_adjoint.JacobianOperator(f, x)
+
+def jacobian(f, mode='auto', memory_limit=2**28, cache_size=8):
+    """Jacobian
+
+    Derivative of f by sweeps through a recorded tape, where the mode is chosen automatically.
+    The cost of forward sweeps (one direction per input), vector reverse sweeps (one direction per output) and scalar reverse sweeps
+    is estimated from the input and output sizes and the length of the tape, and the cheapest variant is used.
+    The traces of f are cached per input shape, so the estimate reuses the statistics of the cached tape.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    mode : str, optional
+        `'auto'`, `'forward'` or `'reverse'`.
+    memory_limit : int, optional
+        Maximum number of bytes of the tangent (adjoint) vectors of one sweep, larger Jacobians are computed in chunks.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache.
+
+    Returns
+    -------
+    AutoJacobian
+        A function which returns the derivative of f of shape ``y.shape + x.shape``.
+        Its method `costs(x)` returns the cost estimates without computing the derivative, `last_costs` holds the estimates of the last call.
+
+    See also
+    --------
+    pyADiff.adjoint.ADTrace.jacobian_costs : The cost model.
+    """
+    return pyADiff_adjoint.AutoJacobian(f, mode, memory_limit, cache_size)
+
+def cross_country(f, method='vertex', order='markowitz', cache_size=8):
+    """Cross-Country Jacobian
+
+    Accumulates the Jacobian of f by elimination in the linearized computational graph of the recorded tape (cross-country mode).
+    Intermediate vertices (or edges) are eliminated in Markowitz order, lowest number of new multiplications first,
+    which can need far fewer multiplications than tangent or adjoint mode, e.g. for graphs with narrow bottlenecks.
+    The traces of f are cached per input shape and replayed at new inputs.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    method : str, optional
+        `'vertex'` or `'edge'` elimination.
+    order : str, optional
+        The order of the vertex elimination, `'markowitz'`, `'forward'` or `'reverse'`.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache.
+
+    Returns
+    -------
+    function_type
+        A function which returns an `Elimination` of the Jacobian of shape ``y.shape + x.shape`` and the number of multiplications,
+        compared to the multiplications of tangent and adjoint mode.
+
+    See also
+    --------
+    pyADiff.elimination.LinearizedGraph : The linearized computational graph.
     """
-    return derfor(derrev(f))
+    if(cache_size == 0):
+        return lambda x: pyADiff_elimination.accumulate(pyADiff_adjoint.ADTrace(f, x), method, order)
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    return lambda x: pyADiff_elimination.accumulate(cache.trace(x), method, order)
 
+def separable_hessian(f, executor=None, cache_size=8):
+    """Separable Hessian
+
+    Hessian of a partially separable scalar function ``f(x) = sum_i w_i*f_i(x[S_i])`` with small index sets `S_i`.
+    The element functions are detected on the recorded tape, their small dense Hessians are computed separately
+    (elements of the same structure in one vectorized batch) and assembled into a sparse matrix.
+    The traces of f are cached per input shape and replayed at new inputs.
+
+    Parameters
+    ----------
+    f : function_type
+        The scalar function.
+    executor : concurrent.futures.Executor, optional
+        Executor to evaluate the elements in parallel.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache.
+
+    Returns
+    -------
+    function_type
+        A function which returns the lower triangle of the Hessian as `COOMatrix` of shape ``(x.size, x.size)``.
+
+    See also
+    --------
+    pyADiff.separability.elements : The detection of the element functions.
+    pyADiff.differentiation.sparse_hessian : Sparse Hessians by edge pushing.
+    """
+    if(cache_size == 0):
+        return lambda x: pyADiff_separability.assemble(pyADiff_adjoint.ADTrace(f, x), executor)[1]
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    return lambda x: pyADiff_separability.assemble(cache.trace(x), executor)[1]
+
+def hessian_diagonal(f, pattern=None, cache_size=8):
+    """Hessian Diagonal
+
+    Exact diagonal of the Hessian of the scalar function f, without forming the Hessian.
+    The Hessian sparsity pattern is detected (or given) and colored, such that the diagonal is recovered from one Hessian vector product per color,
+    which are computed together by one forward and one second order reverse sweep through the recorded tape.
+    For a dense Hessian the number of colors is ``x.size``.
+    The traces of f (and the detected patterns) are cached per input shape and replayed at new inputs.
+
+    Parameters
+    ----------
+    f : function_type
+        The scalar function.
+    pattern : COOMatrix, array or scipy.sparse matrix, optional
+        The symmetric Hessian sparsity pattern of shape ``(x.size, x.size)``. Detected for every new trace, if not given.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache.
+
+    Returns
+    -------
+    function_type
+        A function which returns the diagonal of the Hessian of shape ``x.shape``.
+
+    See also
+    --------
+    pyADiff.sparse.hessian_diagonal : The computation of the diagonal.
+    pyADiff.differentiation.hessian_diag_estimate : Randomized estimate of the diagonal.
+    """
+    if(cache_size == 0):
+        return lambda x: pyADiff_sparse.hessian_diagonal(
+            pyADiff_adjoint.ADTrace(f, x), pyADiff_sparse.detect_hessian_pattern(f, x) if pattern is None else pattern
+        )
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    patterns = weakref.WeakKeyDictionary()
+
+    def diagonal(x):
+        trace = cache.trace(x)
+        p = pattern
+        if p is None:
+            p = patterns.get(trace)
+            if p is None:
+                p = patterns[trace] = pyADiff_sparse.detect_hessian_pattern(f, x)
+        return pyADiff_sparse.hessian_diagonal(trace, p)
+    return diagonal
+
+def hessian_trace(f, n_probes=16, seed=None, cache_size=8):
+    """Hessian Trace Estimate
+
+    Randomized (Hutchinson) estimate of the trace of the Hessian of the scalar function f from `n_probes` Hessian vector products
+    with Rademacher probes, computed together by one forward and one second order reverse sweep through the recorded tape.
+    The cost grows with `n_probes` instead of ``x.size``, the standard deviation of the estimate decreases with ``1/sqrt(n_probes)``.
+
+    Parameters
+    ----------
+    f : function_type
+        The scalar function.
+    n_probes : int, optional
+        Number of random probes.
+    seed : int, optional
+        Seed of the random probes.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache.
+
+    Returns
+    -------
+    function_type
+        A function which returns the estimate of the trace of the Hessian.
+
+    See also
+    --------
+    pyADiff.randomized.hessian_trace : The estimator.
+    """
+    rng = np.random.default_rng(seed)
+    if(cache_size == 0):
+        return lambda x: pyADiff_randomized.hessian_trace(pyADiff_adjoint.ADTrace(f, x), n_probes, rng)
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    return lambda x: pyADiff_randomized.hessian_trace(cache.trace(x), n_probes, rng)
+
+def hessian_diag_estimate(f, n_probes=16, seed=None, cache_size=8):
+    """Hessian Diagonal Estimate
+
+    Randomized estimate of the diagonal of the Hessian of the scalar function f from `n_probes` Hessian vector products
+    with Rademacher probes, computed together by one forward and one second order reverse sweep through the recorded tape.
+    The cost grows with `n_probes` instead of ``x.size``.
+
+    Parameters
+    ----------
+    f : function_type
+        The scalar function.
+    n_probes : int, optional
+        Number of random probes.
+    seed : int, optional
+        Seed of the random probes.
+    cache_size : int, optional
+        Maximum number of cached traces of f (one per input shape). `0` disables the cache.
+
+    Returns
+    -------
+    function_type
+        A function which returns the estimate of the diagonal of the Hessian of shape ``x.shape``.
+
+    See also
+    --------
+    pyADiff.randomized.hessian_diagonal : The estimator.
+    pyADiff.differentiation.hessian_diagonal : The exact diagonal.
+    """
+    rng = np.random.default_rng(seed)
+    if(cache_size == 0):
+        return lambda x: pyADiff_randomized.hessian_diagonal(pyADiff_adjoint.ADTrace(f, x), n_probes, rng)
+    cache = pyADiff_adjoint.ADTraceCache(f, cache_size)
+    return lambda x: pyADiff_randomized.hessian_diagonal(cache.trace(x), n_probes, rng)
+
+def jacobian_sketch(f, x, rank, oversample=10, n_iter=0, seed=None):
+    """Jacobian Sketch
+
+    Low rank approximation of the Jacobian of f at `x` by a randomized singular value decomposition.
+    f is recorded once, a block of ``rank + oversample`` random tangent directions is pushed through the tape by one vector forward sweep
+    and the orthonormalized result is pulled back by one vector reverse sweep. The Jacobian itself is never formed.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x : scalar, list, array
+        The value where to evaluate the derivative.
+    rank : int
+        Rank of the approximation.
+    oversample : int, optional
+        Number of additional random directions, which improve the accuracy.
+    n_iter : int, optional
+        Number of power iterations (one additional reverse and forward sweep each), for slowly decaying singular values.
+    seed : int, optional
+        Seed of the random directions.
+
+    Returns
+    -------
+    tuple(array, array, array)
+        The factors `U` of shape ``(y.size, r)``, `s` of shape ``(r,)`` and `Vt` of shape ``(r, x.size)`` of the dominant singular subspaces,
+        such that ``J.reshape(y.size, x.size) ~ U @ diag(s) @ Vt``.
+
+    See also
+    --------
+    pyADiff.randomized.jacobian_svd : The randomized singular value decomposition.
+    """
+    return pyADiff_randomized.jacobian_svd(pyADiff_adjoint.ADTrace(f, x), rank, oversample, n_iter, np.random.default_rng(seed))
+
+def gauss_newton(residual_fn, cache_size=8):
+    """Gauss-Newton Model
+
+    Linearizes the residuals of a least squares problem ``min 0.5*||r(x)||^2``, e.g. for Gauss-Newton or Levenberg-Marquardt iterations.
+    The returned model provides the gradient ``J^T r``, the products ``J v``, ``J^T w``, the Gauss-Newton products ``J^T (J v)``
+    (optionally damped) and the dense ``J^T J`` for small problems, all computed by sweeps through one tape of `residual_fn`.
+    The tapes are cached per input shape and replayed at new inputs, so the iterations neither run `residual_fn` in tangent mode nor trace it again.
+    Every model holds its own copy of the values and partials of the tape, so earlier models (e.g. at the accepted step of a Levenberg-Marquardt iteration)
+    stay valid when a model at a trial step is computed.
+
+    Parameters
+    ----------
+    residual_fn : function_type
+        The residuals of the least squares problem.
+    cache_size : int, optional
+        Maximum number of cached traces of `residual_fn` (one per input shape). `0` disables the cache.
+
+    Returns
+    -------
+    function_type
+        A function which returns the `GaussNewton` model at `x`.
+
+    See also
+    --------
+    pyADiff.adjoint.GaussNewton : The Gauss-Newton model.
+    """
+    if(cache_size == 0):
+        return lambda x: pyADiff_adjoint.GaussNewton(residual_fn, x)
+    cache = pyADiff_adjoint.ADTraceCache(residual_fn, cache_size)
+    return lambda x: pyADiff_adjoint.GaussNewton(None, trace=cache.trace(x).copy())
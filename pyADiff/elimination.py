@@ -0,0 +1,291 @@
+"""Module Elimination.
+
+Cross-country accumulation of Jacobians by elimination in the linearized computational graph.
+
+The tape of a recording is a directed acyclic graph, whose edges are labeled with the local partial derivatives of the operations.
+The Jacobian is the sum over all paths from an input to an output of the products of the edge labels.
+Eliminating an intermediate vertex connects each of its predecessors with each of its successors (multiplying and adding the labels),
+eliminating an edge multiplies it into the edges of its target (front elimination) or its source (back elimination).
+Once no intermediate vertex is left, the graph is bipartite and its edges are the entries of the Jacobian.
+
+Tangent mode and adjoint mode correspond to vertex elimination in forward and reverse order.
+Other orders, e.g. the Markowitz order, which always eliminates the vertex (edge) with the fewest new multiplications,
+can be much cheaper, for example for graphs with a narrow bottleneck between wide input and output layers.
+
+See also
+--------
+pyADiff.adjoint.ADTrace : The recording of a function.
+pyADiff.differentiation.cross_country : Wrapper which returns the elimination results.
+"""
+import heapq
+from collections import namedtuple
+
+import numpy as np
+
+import pyADiff
+
+
+Elimination = namedtuple('Elimination', ['jacobian', 'multiplications', 'tangent_multiplications', 'adjoint_multiplications'])
+Elimination.__doc__ = """Result of a cross-country accumulation: the `jacobian` of shape ``y.shape + x.shape``, the number of `multiplications` of the elimination
+and the number of multiplications of the tangent mode (`tangent_multiplications`, one per edge and input) and the adjoint mode (`adjoint_multiplications`, one per edge and output)."""
+
+
+class LinearizedGraph(object):
+    """LinearizedGraph.
+
+    The linearized computational graph of a recording, restricted to the vertices on paths from the inputs to the outputs.
+
+    Every input is an independent vertex and every output a dependent vertex.
+    Outputs, which are inputs, repeated or used by other operations, are represented by an additional dependent vertex with a unit edge.
+    All other vertices are intermediate and are eliminated by `eliminate_vertices` or `eliminate_edges`.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of the function.
+
+    Attributes
+    ----------
+    n_partials : int
+        Number of partial derivatives (edges) of the tape on paths from the inputs to the outputs.
+    multiplications : int
+        Number of multiplications of all eliminations so far.
+    """
+    def __init__(self, trace):
+        tape = trace.record.tape()
+        args = tape.arguments
+        n = len(args)
+        x_indices = trace.x_indices
+        y_indices = trace.y_indices
+        self._x_shape = trace.x_shape
+        self._y_shape = trace.y_shape
+        self._columns = {k: c for c, k in enumerate(x_indices)}
+
+        # vertices on paths from the inputs to the outputs
+        reachable = [False]*n
+        for k in x_indices:
+            reachable[k] = True
+        for i in range(n):
+            if not reachable[i]:
+                reachable[i] = any(reachable[j] for j in args[i])
+        relevant = [False]*n
+        for k in y_indices:
+            if k >= 0 and reachable[k]:
+                relevant[k] = True
+        for i in range(n - 1, -1, -1):
+            if relevant[i]:
+                for j in args[i]:
+                    if reachable[j]:
+                        relevant[j] = True
+
+        self._preds = {}
+        self._succs = {}
+        for i in range(n):
+            if relevant[i]:
+                self._preds[i] = {}
+                self._succs.setdefault(i, set())
+                for j, c in zip(args[i], tape.partials[i]):
+                    if relevant[j]:
+                        self._add_edge(j, i, c)
+        self.n_partials = self.n_edges
+
+        self._rows = {}
+        for r, k in enumerate(y_indices):
+            if k < 0 or not relevant[k]:
+                continue
+            if k in self._columns or k in self._rows or len(self._succs[k]) > 0:
+                v = n + r
+                self._preds[v] = {}
+                self._succs[v] = set()
+                self._add_edge(k, v, 1.)
+                k = v
+            self._rows[k] = r
+        self._intermediates = set(self._preds) - set(self._columns) - set(self._rows)
+        self.multiplications = 0
+
+    def __len__(self):
+        return len(self._preds)
+
+    @property
+    def n_edges(self):
+        """Number of edges of the graph.
+        """
+        return sum(len(p) for p in self._preds.values())
+
+    @property
+    def n_inputs(self):
+        """Number of independent vertices.
+        """
+        return len(self._columns)
+
+    @property
+    def n_outputs(self):
+        """Number of dependent vertices.
+        """
+        return len(self._rows)
+
+    def markowitz_degree(self, v):
+        """Number of multiplications of the elimination of vertex `v`, the product of the numbers of its predecessors and successors.
+        """
+        return len(self._preds[v])*len(self._succs[v])
+
+    def eliminate_vertices(self, order='markowitz'):
+        """Eliminates all intermediate vertices.
+
+        Parameters
+        ----------
+        order : str, optional
+            `'markowitz'` eliminates the vertex of lowest Markowitz degree first,
+            `'forward'` and `'reverse'` eliminate the vertices in the order of the tape (tangent mode) and in reverse order (adjoint mode).
+        """
+        if(order == 'forward'):
+            for v in sorted(self._intermediates):
+                self._eliminate_vertex(v)
+        elif(order == 'reverse'):
+            for v in sorted(self._intermediates, reverse=True):
+                self._eliminate_vertex(v)
+        elif(order == 'markowitz'):
+            heap = [(self.markowitz_degree(v), v) for v in self._intermediates]
+            heapq.heapify(heap)
+            while heap:
+                degree, v = heapq.heappop(heap)
+                if v not in self._intermediates or degree != self.markowitz_degree(v):
+                    continue
+                neighbours = set(self._preds[v]) | self._succs[v]
+                self._eliminate_vertex(v)
+                for u in neighbours & self._intermediates:
+                    heapq.heappush(heap, (self.markowitz_degree(u), u))
+        else:
+            raise ValueError("order has to be 'markowitz', 'forward' or 'reverse', not {}".format(order))
+
+    def eliminate_edges(self):
+        """Eliminates all edges incident to intermediate vertices in Markowitz order.
+
+        In every step the edge elimination with the fewest multiplications is performed:
+        the front elimination of an edge ``(i, j)`` costs one multiplication per successor of `j`,
+        the back elimination one multiplication per predecessor of `i`.
+        """
+        heap = []
+        for v in self._intermediates:
+            self._push_edges(heap, v)
+        while heap:
+            cost, back, i, j = heapq.heappop(heap)
+            if back:
+                if i not in self._intermediates or j not in self._succs[i] or cost != len(self._preds[i]):
+                    continue
+                touched = self._back_eliminate(i, j)
+            else:
+                if j not in self._intermediates or i not in self._preds[j] or cost != len(self._succs[j]):
+                    continue
+                touched = self._front_eliminate(i, j)
+            for v in touched:
+                self._push_edges(heap, v)
+
+    def jacobian(self):
+        """The Jacobian of shape ``y.shape + x.shape``, all intermediate vertices have to be eliminated.
+        """
+        if(len(self._intermediates) > 0):
+            raise RuntimeError('{} intermediate vertices are not eliminated'.format(len(self._intermediates)))
+        df = np.zeros((int(np.prod(self._y_shape)), len(self._columns)))
+        for v, r in self._rows.items():
+            for i, c in self._preds[v].items():
+                df[r, self._columns[i]] = c
+        df = df.reshape(self._y_shape + self._x_shape)
+        if(df.ndim == 0):
+            return df[()]
+        return df
+
+    def _add_edge(self, i, j, c):
+        p = self._preds[j]
+        if i in p:
+            p[i] = p[i] + c
+        else:
+            p[i] = c
+            self._succs[i].add(j)
+
+    def _remove_vertex(self, v):
+        for i in self._preds.pop(v):
+            self._succs[i].discard(v)
+        for j in self._succs.pop(v):
+            del self._preds[j][v]
+        self._intermediates.discard(v)
+
+    def _eliminate_vertex(self, v):
+        preds = self._preds[v]
+        succs = [(j, self._preds[j][v]) for j in self._succs[v]]
+        self._remove_vertex(v)
+        for i, c_vi in preds.items():
+            for j, c_jv in succs:
+                self._add_edge(i, j, c_jv*c_vi)
+        self.multiplications += len(preds)*len(succs)
+
+    def _front_eliminate(self, i, j):
+        """Eliminates the edge ``(i, j)`` into the successors of `j`, returns the vertices with changed neighbourhood.
+        """
+        c_ji = self._preds[j].pop(i)
+        self._succs[i].discard(j)
+        succs = list(self._succs[j])
+        for k in succs:
+            self._add_edge(i, k, self._preds[k][j]*c_ji)
+        self.multiplications += len(succs)
+        touched = {i, j}.union(succs)
+        if(len(self._preds[j]) == 0):
+            self._remove_vertex(j)
+        return touched
+
+    def _back_eliminate(self, i, j):
+        """Eliminates the edge ``(i, j)`` into the predecessors of `i`, returns the vertices with changed neighbourhood.
+        """
+        c_ji = self._preds[j].pop(i)
+        self._succs[i].discard(j)
+        preds = list(self._preds[i].items())
+        for h, c_ih in preds:
+            self._add_edge(h, j, c_ji*c_ih)
+        self.multiplications += len(preds)
+        touched = {i, j}.union(h for h, _ in preds)
+        if(len(self._succs[i]) == 0):
+            self._remove_vertex(i)
+        return touched
+
+    def _push_edges(self, heap, v):
+        """Pushes the costs of the front eliminations of the edges into `v` and the back eliminations of the edges out of `v`.
+        """
+        if v not in self._intermediates:
+            return
+        front = len(self._succs[v])
+        for i in self._preds[v]:
+            heapq.heappush(heap, (front, False, i, v))
+        back = len(self._preds[v])
+        for j in self._succs[v]:
+            heapq.heappush(heap, (back, True, v, j))
+
+def accumulate(trace, method='vertex', order='markowitz'):
+    """Cross-country accumulation of the Jacobian of a recording.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of the function.
+    method : str, optional
+        `'vertex'` or `'edge'` elimination.
+    order : str, optional
+        The order of the vertex elimination, `'markowitz'`, `'forward'` or `'reverse'`. Edges are always eliminated in Markowitz order.
+
+    Returns
+    -------
+    Elimination
+        The Jacobian and the number of multiplications of the elimination, compared to tangent and adjoint mode.
+    """
+    graph = LinearizedGraph(trace)
+    if(method == 'vertex'):
+        graph.eliminate_vertices(order)
+    elif(method == 'edge'):
+        graph.eliminate_edges()
+    else:
+        raise ValueError("method has to be 'vertex' or 'edge', not {}".format(method))
+    return Elimination(
+        jacobian=graph.jacobian(),
+        multiplications=graph.multiplications,
+        tangent_multiplications=graph.n_inputs*graph.n_partials,
+        adjoint_multiplications=graph.n_outputs*graph.n_partials
+    )
@@ -4,3 +4,10 @@ class NotDifferentiableExeption(Exception):
     Raised if the function to differentiate is not differentiable at a given position.
     """
     pass
+
+class ControlFlowException(Exception):
+    """ ControlFlowException
+
+    Raised if the control flow of a recorded function changes at new inputs, so that the record is not valid anymore.
+    """
+    pass
@@ -0,0 +1,520 @@
+"""Module Higher Order.
+
+Higher order derivatives by propagation of truncated univariate Taylor series.
+
+Instead of nesting first order ADTypes (whose cost grows exponentially with the order), the `ADTypeTaylor` carries the Taylor coefficients
+``x_0, x_1, ..., x_d`` of a curve ``x(t) = x_0 + x_1 t + ... + x_d t^d`` and propagates them through every operation with the standard recurrences
+of Taylor arithmetic in ``O(d^2)`` operations.
+For the line ``x(t) = x + t v`` the `k`-th coefficient of ``f(x(t))`` is the `k`-th directional derivative of `f` in the direction `v` divided by ``k!``.
+
+See also
+--------
+pyADiff.tangent.ADTypeT: The first order tangent ADType.
+pyADiff.differentiation.taylor: Wrapper for the computation of Taylor coefficients.
+"""
+import itertools
+import math
+
+import numpy as np
+
+import pyADiff
+from pyADiff.exceptions import NotDifferentiableExeption
+from pyADiff.math_functions import *
+
+
+class ADTypeTaylor(object):
+    """Taylor ADType.
+
+    This class overloads the basic numerical type of python with a truncated univariate Taylor series.
+    Instead of only a `value` it stores the Taylor `coefficients` up to a fixed degree, the value is the coefficient of degree 0.
+
+    This class implements the numerical operators (+, -, .. ) and the basic mathematical functions (`sin`, `cos`, `exp`, ...) by the recurrences of Taylor arithmetic.
+
+    The coefficients may carry a trailing axis of several series through the same point (e.g. along several directions),
+    which are then propagated simultaneously. The value is the common coefficient of degree 0.
+
+    Parameters
+    ----------
+    coefficients : list or array of float
+        The Taylor coefficients ``x_0, ..., x_d``, of shape ``(d + 1,)`` or ``(d + 1, p)``.
+
+    See also
+    --------
+    pyADiff.higher_order.taylor_coefficients : Taylor coefficients of a function along a line.
+    """
+    def __init__(self, coefficients):
+        self._c = np.asarray(coefficients, dtype=float)
+
+    @property
+    def value(self):
+        """Value (coefficient of degree 0) of the overloaded numerical type.
+        """
+        if(self._c.ndim > 1):
+            return self._c[(0,)*self._c.ndim]
+        return self._c[0]
+
+    @property
+    def coefficients(self):
+        """Taylor coefficients of the overloaded numerical type.
+        """
+        return self._c
+
+    @property
+    def degree(self):
+        """Degree of the truncated Taylor series.
+        """
+        return self._c.shape[0] - 1
+
+    def __repr__(self):
+        return 'ADTypeTaylor(' + repr(self._c.tolist()) + ')'
+
+    def __str__(self):
+        return str(self._c.tolist())
+
+    def __add__(self, other):
+        try:
+            return ADTypeTaylor(self._c + other.coefficients)
+        except AttributeError:
+            temp = other.__radd__(self)
+            if temp is NotImplemented:
+                return ADTypeTaylor(_shift(self._c, other))
+            else:
+                return temp
+
+    def __radd__(self, other):
+        return ADTypeTaylor(_shift(self._c, other))
+
+    def __sub__(self, other):
+        try:
+            return ADTypeTaylor(self._c - other.coefficients)
+        except AttributeError:
+            temp = other.__rsub__(self)
+            if temp is NotImplemented:
+                return ADTypeTaylor(_shift(self._c, -other))
+            else:
+                return temp
+
+    def __rsub__(self, other):
+        return ADTypeTaylor(_shift(-self._c, other))
+
+    def __mul__(self, other):
+        try:
+            return ADTypeTaylor(_mul(self._c, other.coefficients))
+        except AttributeError:
+            temp = other.__rmul__(self)
+            if temp is NotImplemented:
+                return ADTypeTaylor(self._c*other)
+            else:
+                return temp
+
+    def __rmul__(self, other):
+        return ADTypeTaylor(self._c*other)
+
+    def __truediv__(self, other):
+        try:
+            return ADTypeTaylor(_div(self._c, other.coefficients))
+        except AttributeError:
+            temp = other.__rtruediv__(self)
+            if temp is NotImplemented:
+                return ADTypeTaylor(self._c/other)
+            else:
+                return temp
+
+    def __rtruediv__(self, other):
+        return ADTypeTaylor(_div(_shift(np.zeros_like(self._c), other), self._c))
+
+    def __pow__(self, other):
+        try:
+            return ADTypeTaylor(_exp(_mul(other.coefficients, _log(self._c))))
+        except AttributeError:
+            temp = other.__rpow__(self)
+            if temp is NotImplemented:
+                return ADTypeTaylor(_pow(self._c, other))
+            else:
+                return temp
+
+    def __rpow__(self, other):
+        return ADTypeTaylor(_exp(self._c*log(other)))
+
+    ### EQUALITIES AND INEQUALITIES
+    def __lt__(self, other):
+        try:
+            return self.value < other.value
+        except AttributeError:
+            return self.value < other
+
+    def __le__(self, other):
+        try:
+            return self.value <= other.value
+        except AttributeError:
+            return self.value <= other
+
+    def __eq__(self, other):
+        try:
+            return self.value == other.value
+        except AttributeError:
+            return self.value == other
+
+    def __ne__(self, other):
+        try:
+            return self.value != other.value
+        except AttributeError:
+            return self.value != other
+
+    def __gt__(self, other):
+        try:
+            return self.value > other.value
+        except AttributeError:
+            return self.value > other
+
+    def __ge__(self, other):
+        try:
+            return self.value >= other.value
+        except AttributeError:
+            return self.value >= other
+
+    __hash__ = None
+
+    ### SINGLE INPUT FUNCTIONS
+    def __neg__(self):
+        return ADTypeTaylor(-self._c)
+
+    def __pos__(self):
+        return ADTypeTaylor(self._c)
+
+    def __abs__(self):
+        if self.value == 0 and np.any(self._c[1:] != 0):
+            raise NotDifferentiableExeption
+        return ADTypeTaylor(np.sign(self.value)*self._c)
+
+    def sin(self):
+        return ADTypeTaylor(_sin_cos(self._c)[0])
+
+    def cos(self):
+        return ADTypeTaylor(_sin_cos(self._c)[1])
+
+    def exp(self):
+        return ADTypeTaylor(_exp(self._c))
+
+    def log(self):
+        return ADTypeTaylor(_log(self._c))
+
+    def sqrt(self):
+        return ADTypeTaylor(_sqrt(self._c))
+
+def taylor_coefficients(f, x_v, direction, order):
+    """Taylor Coefficients.
+
+    Computes the Taylor coefficients of ``t -> f(x_v + t*direction)`` at ``t = 0`` up to the degree `order` in a single run of `f`.
+    The `k`-th coefficient is the `k`-th directional derivative of `f` at `x_v` in `direction` divided by ``k!``.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to expand.
+    x_v : scalar, list, array
+        The point of expansion.
+    direction : scalar, list, array
+        The direction of the line, of the same shape as `x_v`, or `p` directions of shape ``x.shape + (p,)``, which are propagated simultaneously.
+    order : int
+        The highest degree of the coefficients.
+
+    Returns
+    -------
+    array
+        The coefficients of shape ``y.shape + (order + 1,)``, or ``y.shape + (order + 1, p)`` for several directions.
+
+    See also
+    --------
+    pyADiff.differentiation.taylor : Wrapper for the computation of Taylor coefficients.
+    """
+    x_v = np.asarray(x_v, dtype=float)
+    direction = np.asarray(direction, dtype=float)
+    if(direction.ndim > x_v.ndim):
+        shape = (order + 1,) + direction.shape[-1:]
+    else:
+        direction = np.broadcast_to(direction, x_v.shape)
+        shape = (order + 1,)
+    x = np.empty(x_v.shape, dtype=object)
+    for i in np.ndindex(x_v.shape):
+        c = np.zeros(shape)
+        c[0] = x_v[i]
+        if(order > 0):
+            c[1] = direction[i]
+        x[i] = ADTypeTaylor(c)
+    if(x.ndim == 0):
+        x = x[()]
+    y = f(x)
+    if(type(y) is np.ndarray):
+        return np.array([_coefficients(v, shape) for v in y.flat]).reshape(y.shape + shape)
+    return _coefficients(y, shape)
+
+def _coefficients(y, shape):
+    """Taylor coefficients of the output `y`, which may be a constant.
+    """
+    try:
+        return np.broadcast_to(y.coefficients, shape)
+    except AttributeError:
+        c = np.zeros(shape)
+        c[0] = y
+        return c
+
+def _shift(a, c):
+    """Coefficients of `a` plus the constant `c`.
+    """
+    a = a.copy()
+    a[0] += c
+    return a
+
+def _mul(a, b):
+    """Truncated product of two Taylor series.
+    """
+    c = np.empty(np.broadcast(a, b).shape)
+    for k in range(c.shape[0]):
+        c[k] = (a[:k + 1]*b[k::-1]).sum(axis=0)
+    return c
+
+def _div(a, b):
+    """Truncated quotient of two Taylor series.
+    """
+    c = np.empty(np.broadcast(a, b).shape)
+    c[0] = a[0]/b[0]
+    for k in range(1, c.shape[0]):
+        c[k] = (a[k] - (b[1:k + 1]*c[k - 1::-1]).sum(axis=0))/b[0]
+    return c
+
+def _exp(a):
+    """Exponential of a Taylor series.
+    """
+    e = np.empty_like(a)
+    e[0] = exp(a[0])
+    ja = _weights(a)*a
+    for k in range(1, a.shape[0]):
+        e[k] = (ja[1:k + 1]*e[k - 1::-1]).sum(axis=0)/k
+    return e
+
+def _log(a):
+    """Logarithm of a Taylor series.
+    """
+    l = np.empty_like(a)
+    l[0] = log(a[0])
+    j = _weights(a)
+    for k in range(1, a.shape[0]):
+        l[k] = (a[k] - (j[1:k]*l[1:k]*a[k - 1:0:-1]).sum(axis=0)/k)/a[0]
+    return l
+
+def _sin_cos(a):
+    """Sine and cosine of a Taylor series.
+    """
+    s = np.empty_like(a)
+    c = np.empty_like(a)
+    s[0] = sin(a[0])
+    c[0] = cos(a[0])
+    ja = _weights(a)*a
+    for k in range(1, a.shape[0]):
+        s[k] = (ja[1:k + 1]*c[k - 1::-1]).sum(axis=0)/k
+        c[k] = -(ja[1:k + 1]*s[k - 1::-1]).sum(axis=0)/k
+    return s, c
+
+def _sqrt(a):
+    """Square root of a Taylor series.
+    """
+    r = np.empty_like(a)
+    r[0] = sqrt(a[0])
+    for k in range(1, a.shape[0]):
+        r[k] = (a[k] - (r[1:k]*r[k - 1:0:-1]).sum(axis=0))/(2.*r[0])
+    return r
+
+def _pow(a, p):
+    """Taylor series `a` to the constant power `p`.
+    """
+    if(float(p).is_integer() and p >= 0):
+        result = np.zeros_like(a)
+        result[0] = 1.
+        base = a
+        p = int(p)
+        while p > 0:
+            if p & 1:
+                result = _mul(result, base)
+            base = _mul(base, base)
+            p >>= 1
+        return result
+    r = np.empty_like(a)
+    r[0] = a[0]**p
+    j = _weights(a)
+    for k in range(1, a.shape[0]):
+        r[k] = (((p + 1.)*j[1:k + 1] - k)*a[1:k + 1]*r[k - 1::-1]).sum(axis=0)/(k*a[0])
+    return r
+
+def _weights(a):
+    """The degrees ``0, ..., d`` shaped to broadcast against the coefficients `a`.
+    """
+    return np.arange(a.shape[0], dtype=float).reshape((-1,) + (1,)*(a.ndim - 1))
+
+class SymmetricTensor(object):
+    """SymmetricTensor.
+
+    Packed storage of a symmetric derivative tensor of order `d` in `n` variables.
+    Only the unique entries, the sorted index tuples ``i_1 <= ... <= i_d``, are stored, these are ``binom(n + d - 1, d)`` instead of ``n**d``.
+    For vector valued functions every entry holds the derivatives of all outputs.
+
+    Parameters
+    ----------
+    data : array
+        The unique entries of shape ``y.shape + (p,)``, ordered like `indices`.
+    n : int
+        Number of variables.
+    order : int
+        Order `d` of the tensor.
+
+    See also
+    --------
+    pyADiff.higher_order.derivative_tensor : Computes the derivative tensor.
+    """
+    def __init__(self, data, n, order):
+        self.data = np.asarray(data)
+        self.n = n
+        self.order = order
+        self.indices = np.array(list(itertools.combinations_with_replacement(range(n), order)), dtype=np.int64).reshape(-1, order)
+        self._positions = {tuple(i): p for p, i in enumerate(self.indices.tolist())}
+
+    def __repr__(self):
+        return '<SymmetricTensor of order {} in {} variables with {} unique entries>'.format(self.order, self.n, self.indices.shape[0])
+
+    def __getitem__(self, index):
+        """The entry (of all outputs) at the index tuple `index` of length `order`, in any order.
+        """
+        if(type(index) is not tuple):
+            index = (index,)
+        return self.data[..., self._positions[tuple(sorted(int(i) for i in index))]]
+
+    def toarray(self):
+        """Returns the dense tensor of shape ``y.shape + (n,)*order``.
+        """
+        dense = np.zeros(self.data.shape[:-1] + (self.n,)*self.order, dtype=self.data.dtype)
+        for p, index in enumerate(self.indices.tolist()):
+            for permutation in set(itertools.permutations(index)):
+                dense[(Ellipsis,) + permutation] = self.data[..., p]
+        return dense
+
+    def dot(self, v):
+        """Contraction with the vector `v` along one index.
+
+        Returns
+        -------
+        SymmetricTensor or array
+            The tensor of order ``order - 1``, an array of shape ``y.shape + (n,)`` if this is of order 2, or ``y.shape`` if of order 1.
+        """
+        v = np.asarray(v, dtype=float)
+        if(self.order == 1):
+            return self.data.dot(v)
+        reduced = list(itertools.combinations_with_replacement(range(self.n), self.order - 1))
+        data = np.zeros(self.data.shape[:-1] + (len(reduced),), dtype=np.result_type(self.data, v))
+        for q, index in enumerate(reduced):
+            positions = [self._positions[tuple(sorted(index + (l,)))] for l in range(self.n)]
+            data[..., q] = self.data[..., positions].dot(v)
+        if(self.order == 2):
+            return data
+        return SymmetricTensor(data, self.n, self.order - 1)
+
+    def contract(self, v):
+        """Full contraction ``T[v, ..., v]`` with the vector `v` in every index.
+
+        Evaluated on the packed entries, each weighted with the number of its permutations.
+        """
+        v = np.asarray(v, dtype=float)
+        weights = np.empty(self.indices.shape[0])
+        for p, index in enumerate(self.indices.tolist()):
+            counts = np.bincount(index)
+            weights[p] = math.factorial(self.order)/np.prod([math.factorial(c) for c in counts])*np.prod(v[index])
+        return self.data.dot(weights)
+
+def derivative_tensor(f, x_v, order):
+    """Derivative Tensor Driver.
+
+    Computes the unique entries of the derivative tensor of order `order` of `f` at `x_v` by interpolation from univariate Taylor series (Griewank, Utke and Walther).
+
+    The Taylor coefficients of degree `order` are propagated along all ``binom(n + order - 1, order)`` directions `j`, which are the multi-indices with ``|j| = order``,
+    simultaneously in a single run of `f`. Every unique entry of the tensor is then a linear combination of the coefficients along the directions
+    with support in the variables of the entry, the weights only depend on the pattern of the multi-index and are computed once per pattern.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x_v : scalar, list, array
+        The value where to evaluate the derivatives, its entries are numbered in flattened order.
+    order : int
+        Order of the derivative tensor.
+
+    Returns
+    -------
+    SymmetricTensor
+        The packed derivative tensor.
+
+    See also
+    --------
+    pyADiff.differentiation.derivative_tensor : Wrapper for the computation of derivative tensors.
+    """
+    x_v = np.asarray(x_v, dtype=float)
+    n = x_v.size
+    d = order
+    directions = list(itertools.combinations_with_replacement(range(n), d))
+    S = np.zeros((n, len(directions)))
+    for q, index in enumerate(directions):
+        for l in index:
+            S[l, q] += 1.
+    coefficients = taylor_coefficients(f, x_v, S.reshape(x_v.shape + (len(directions),)), d)
+    coefficients = coefficients[..., d, :]
+    position = {index: q for q, index in enumerate(directions)}
+    weights = {}
+    data = np.empty(coefficients.shape[:-1] + (len(directions),))
+    for p, index in enumerate(directions):
+        support = sorted(set(index))
+        counts = tuple(index.count(l) for l in support)
+        if counts not in weights:
+            weights[counts] = _interpolation_weights(counts)
+        entry = 0.
+        for local, gamma in weights[counts]:
+            j = tuple(l for l, c in zip(support, local) for _ in range(c))
+            entry = entry + gamma*coefficients[..., position[j]]
+        data[..., p] = entry
+    return SymmetricTensor(data, n, d)
+
+def _interpolation_weights(i):
+    """Interpolation weights of the derivative with the multi-index `i` (counts on its support).
+
+    Returns the list of multi-indices `j` of the same total degree `d` on the support of `i` and their weights
+    ``gamma_ij = sum_{0 < k <= i} (-1)^|i - k| binom(i, k) binom(d k/|k|, j) (|k|/d)^d``,
+    so that the derivative is the weighted sum of the Taylor coefficients of degree `d` along the directions `j`.
+    """
+    d = sum(i)
+    result = []
+    for j in _multi_indices(len(i), d):
+        gamma = 0.
+        for k in itertools.product(*[range(c + 1) for c in i]):
+            norm = sum(k)
+            if(norm == 0):
+                continue
+            term = (-1.)**(d - norm)*(norm/d)**d
+            for i_l, j_l, k_l in zip(i, j, k):
+                term *= _binomial(i_l, k_l)*_binomial(d*k_l/norm, j_l)
+            gamma += term
+        if(gamma != 0.):
+            result.append((j, gamma))
+    return result
+
+def _multi_indices(m, d):
+    """All multi-indices of length `m` with total degree `d`.
+    """
+    if(m == 1):
+        return [(d,)]
+    return [(c,) + rest for c in range(d + 1) for rest in _multi_indices(m - 1, d - c)]
+
+def _binomial(r, k):
+    """Generalized binomial coefficient of a real `r` and an integer `k`.
+    """
+    b = 1.
+    for l in range(k):
+        b *= (r - l)/(l + 1)
+    return b
@@ -6,10 +6,15 @@ The ADTypes implement these functions as member functions.
 So in case the input `a` is an ADType, calling the respective member returns a new ADType with the calculated value (and its derivative representation).
 If the input `a` does not implement the mathematical function, a `AttributeError` is raised and we fall back to the `numpy` implementation.
 
+The linear algebra functions (`matmul`, `solve`, `inv`, `det`, `slogdet`, `cholesky`, `eigh`) are implemented by the array ADTypes,
+which record (or propagate) them as single matrix-level operations. The fallback to `numpy` dispatches to them as well, if only a later argument is an array ADType.
+
 See also
 --------
 pyADiff.tangent.ADTypeT: Implementation of the tangent ADType.
 pyADiff.adjoint.ADTypeA: Implementation of the adjoint ADType.
+pyADiff.tangent_array.DualArray: Implementation of the array tangent ADType.
+pyADiff.adjoint_array.ADArray: Implementation of the array adjoint ADType.
 """
 import numpy as np
 
@@ -89,3 +94,112 @@ def sqrt(a):
         return a.sqrt()
     except AttributeError:
         return np.sqrt(a)
+
+def matmul(a, b):
+    """Matrix product.
+
+    Implements the overload of the matrix product ``a @ b``.
+
+    Parameters
+    ----------
+    a : array or array ADType
+        First factor.
+    b : array or array ADType
+        Second factor.
+    """
+    try:
+        return a.matmul(b)
+    except AttributeError:
+        return np.matmul(a, b)
+
+def solve(a, b):
+    """Linear solve.
+
+    Implements the overload of the solution `x` of the linear system ``a @ x = b``.
+
+    Parameters
+    ----------
+    a : array or array ADType
+        The (stack of) square matrix.
+    b : array or array ADType
+        The right hand side.
+    """
+    try:
+        return a.solve(b)
+    except AttributeError:
+        return np.linalg.solve(a, b)
+
+def inv(a):
+    """Matrix inverse.
+
+    Implements the overload of the inverse of a (stack of) square matrix.
+
+    Parameters
+    ----------
+    a : array or array ADType
+        Input of the function.
+    """
+    try:
+        return a.inv()
+    except AttributeError:
+        return np.linalg.inv(a)
+
+def det(a):
+    """Determinant.
+
+    Implements the overload of the determinant of a (stack of) square matrix.
+
+    Parameters
+    ----------
+    a : array or array ADType
+        Input of the function.
+    """
+    try:
+        return a.det()
+    except AttributeError:
+        return np.linalg.det(a)
+
+def slogdet(a):
+    """Sign and log-determinant.
+
+    Implements the overload of the sign and the logarithm of the absolute value of the determinant of a (stack of) square matrix.
+
+    Parameters
+    ----------
+    a : array or array ADType
+        Input of the function.
+    """
+    try:
+        return a.slogdet()
+    except AttributeError:
+        return np.linalg.slogdet(a)
+
+def cholesky(a):
+    """Cholesky decomposition.
+
+    Implements the overload of the lower triangular Cholesky factor of a (stack of) symmetric positive definite matrix.
+
+    Parameters
+    ----------
+    a : array or array ADType
+        Input of the function.
+    """
+    try:
+        return a.cholesky()
+    except AttributeError:
+        return np.linalg.cholesky(a)
+
+def eigh(a):
+    """Symmetric eigendecomposition.
+
+    Implements the overload of the eigenvalues (ascending) and eigenvectors of a (stack of) symmetric matrix.
+
+    Parameters
+    ----------
+    a : array or array ADType
+        Input of the function.
+    """
+    try:
+        return a.eigh()
+    except AttributeError:
+        return np.linalg.eigh(a)
@@ -0,0 +1,222 @@
+"""Module Profiling.
+
+Opt-in profiling of the differentiation drivers.
+
+While a `Profile` is active (as context manager), the drivers report the recorded tapes (operation counts, dependencies, memory),
+the time spent in tracing, replays, forward and reverse sweeps and resets of the record, and the passes of `f` and `ADTypeT` allocations of the tangent mode.
+Without an active profile nothing is measured.
+
+A profile only collects the differentiations of the thread which activated it, the active profiles are stored per thread.
+
+Examples
+--------
+>>> with pyADiff.profile() as p:
+...     df = pyADiff.derrev(f)(x)
+>>> p.as_dict()
+
+See also
+--------
+pyADiff.differentiation.profile : Returns a new profile.
+pyADiff.adjoint.ADRecord.operation_counts : Number of nodes per operation of a record.
+pyADiff.adjoint.ADRecord.nbytes : Memory held by a record.
+"""
+import threading
+import time
+
+import pyADiff
+
+
+# The active profiles of each thread. The counting constructor of ADTypeT is installed (for all threads) while any profile is active.
+_local = threading.local()
+_lock = threading.Lock()
+_n_active = 0
+
+
+class Profile(object):
+    """Profile.
+
+    Collects the statistics of all differentiations performed by the current thread while the profile is active.
+    Profiles can be nested, then every active profile collects the statistics.
+
+    Attributes
+    ----------
+    n_traces : int
+        Number of recorded functions (`ADTrace`).
+    trace_time : float
+        Time spent recording functions in seconds.
+    n_replays : int
+        Number of replayed traces.
+    replay_time : float
+        Time spent replaying traces in seconds.
+    n_sweeps : int
+        Number of reverse sweeps through a record, including the second order reverse sweeps (a vector sweep counts once).
+    sweep_time : float
+        Time spent in reverse sweeps in seconds.
+    n_forward_sweeps : int
+        Number of forward (tangent) sweeps through a record (a vector sweep counts once).
+    forward_sweep_time : float
+        Time spent in forward sweeps in seconds.
+    n_resets : int
+        Number of resets of the adjoints of a record.
+    reset_time : float
+        Time spent resetting adjoints in seconds.
+    n_nodes : int
+        Number of nodes of all recorded tapes.
+    n_dependencies : int
+        Number of dependencies (partial derivatives) of all recorded tapes.
+    nbytes : int
+        Approximate bytes held by all recorded tapes.
+    operations : dict
+        Number of nodes per operation of all recorded tapes.
+    tangent_passes : int
+        Number of runs of `f` in tangent mode.
+    tangent_time : float
+        Time spent in the runs of `f` in tangent mode in seconds.
+    tangent_allocations : int
+        Number of allocated `ADTypeT` objects.
+    """
+    def __init__(self):
+        self.n_traces = 0
+        self.trace_time = 0.
+        self.n_replays = 0
+        self.replay_time = 0.
+        self.n_sweeps = 0
+        self.sweep_time = 0.
+        self.n_forward_sweeps = 0
+        self.forward_sweep_time = 0.
+        self.n_resets = 0
+        self.reset_time = 0.
+        self.n_nodes = 0
+        self.n_dependencies = 0
+        self.nbytes = 0
+        self.operations = {}
+        self.tangent_passes = 0
+        self.tangent_time = 0.
+        self.tangent_allocations = 0
+
+    def __enter__(self):
+        global _n_active
+        with _lock:
+            if(_n_active == 0):
+                pyADiff.tangent.ADTypeT.__init__ = pyADiff.tangent._counting_init
+            _n_active += 1
+        _active().append(self)
+        return self
+
+    def __exit__(self, *args):
+        global _n_active
+        _active().remove(self)
+        with _lock:
+            _n_active -= 1
+            if(_n_active == 0):
+                pyADiff.tangent.ADTypeT.__init__ = pyADiff.tangent._init
+        return False
+
+    def __repr__(self):
+        return '<Profile: {} traces, {} sweeps, {} nodes, {} tangent passes>'.format(
+            self.n_traces, self.n_sweeps, self.n_nodes, self.tangent_passes
+        )
+
+    def add_record(self, record):
+        """Adds the statistics of the tape of `record`.
+        """
+        self.n_nodes += len(record)
+        self.n_dependencies += record.n_dependencies
+        self.nbytes += record.nbytes
+        for operation, count in record.operation_counts().items():
+            self.operations[operation] = self.operations.get(operation, 0) + count
+
+    def as_dict(self):
+        """Returns the statistics as dictionary (e.g. for logging).
+        """
+        return {
+            'n_traces': self.n_traces,
+            'trace_time': self.trace_time,
+            'n_replays': self.n_replays,
+            'replay_time': self.replay_time,
+            'n_sweeps': self.n_sweeps,
+            'sweep_time': self.sweep_time,
+            'n_forward_sweeps': self.n_forward_sweeps,
+            'forward_sweep_time': self.forward_sweep_time,
+            'n_resets': self.n_resets,
+            'reset_time': self.reset_time,
+            'n_nodes': self.n_nodes,
+            'n_dependencies': self.n_dependencies,
+            'nbytes': self.nbytes,
+            'operations': dict(self.operations),
+            'tangent_passes': self.tangent_passes,
+            'tangent_time': self.tangent_time,
+            'tangent_allocations': self.tangent_allocations
+        }
+
+def measure(event):
+    """Context manager which counts and times the `event` in all active profiles.
+
+    Parameters
+    ----------
+    event : str
+        `'trace'`, `'replay'`, `'sweep'`, `'forward_sweep'`, `'reset'` or `'tangent'`.
+    """
+    active = _active()
+    if(len(active) == 0):
+        return _NULL_MEASUREMENT
+    return _Measurement(event, active)
+
+def add_record(record):
+    """Adds the statistics of the tape of `record` to all active profiles.
+    """
+    for p in _active():
+        p.add_record(record)
+
+def add_tangent_allocation():
+    """Counts one `ADTypeT` allocation in all active profiles.
+    """
+    for p in _active():
+        p.tangent_allocations += 1
+
+def _active():
+    """The active profiles of the current thread.
+    """
+    try:
+        return _local.profiles
+    except AttributeError:
+        _local.profiles = []
+        return _local.profiles
+
+_COUNTERS = {
+    'trace': ('n_traces', 'trace_time'),
+    'replay': ('n_replays', 'replay_time'),
+    'sweep': ('n_sweeps', 'sweep_time'),
+    'forward_sweep': ('n_forward_sweeps', 'forward_sweep_time'),
+    'reset': ('n_resets', 'reset_time'),
+    'tangent': ('tangent_passes', 'tangent_time')
+}
+
+class _Measurement(object):
+    """Times a block and adds it to the counters of `event` of the `active` profiles.
+    """
+    def __init__(self, event, active):
+        self._counter, self._timer = _COUNTERS[event]
+        self._active = list(active)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        elapsed = time.perf_counter() - self._start
+        for p in self._active:
+            setattr(p, self._counter, getattr(p, self._counter) + 1)
+            setattr(p, self._timer, getattr(p, self._timer) + elapsed)
+        return False
+
+class _NullMeasurement(object):
+    """Does nothing, used if no profile is active.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_NULL_MEASUREMENT = _NullMeasurement()
@@ -0,0 +1,132 @@
+"""Module Randomized.
+
+Randomized estimators of derivative quantities, which are too expensive to compute exactly.
+
+The trace and the diagonal of a Hessian are estimated from Hessian vector products with random Rademacher probes `z` (entries +1 or -1 with equal probability),
+using ``E[z^T H z] = tr(H)`` (Hutchinson) and ``E[z * (H z)] = diag(H)`` (Bekas, Kokiopoulou and Saad).
+All probes are propagated together in one vector forward sweep and one second order reverse sweep through the tape,
+so the cost grows with the number of probes instead of the dimension of `x`.
+
+Low rank approximations of Jacobians are computed by randomized singular value decompositions (Halko, Martinsson and Tropp):
+the range of the Jacobian is sampled by a block of random tangent directions in one vector forward sweep,
+and the Jacobian is projected onto this range by one vector reverse sweep, so the cost grows with the rank instead of ``min(x.size, y.size)``.
+
+See also
+--------
+pyADiff.adjoint.ADTrace.hessian_product : The Hessian vector products.
+pyADiff.adjoint.ADTrace.jacobian_product : Products of the Jacobian with tangent directions.
+pyADiff.adjoint.ADTrace.transposed_jacobian_product : Products of the transposed Jacobian with adjoint directions.
+"""
+import numpy as np
+
+import pyADiff
+
+
+def hessian_trace(trace, n_probes, rng=None):
+    """Hutchinson estimate of the trace of the Hessian of a recorded scalar function.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of a scalar function.
+    n_probes : int
+        Number of random probes.
+    rng : numpy.random.Generator, optional
+        Source of the probes, defaults to a new generator.
+
+    Returns
+    -------
+    float
+        The estimate of the trace.
+    """
+    Z, HZ = _probe(trace, n_probes, rng)
+    return float(np.sum(Z*HZ))/n_probes
+
+def hessian_diagonal(trace, n_probes, rng=None):
+    """Estimate of the diagonal of the Hessian of a recorded scalar function.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of a scalar function.
+    n_probes : int
+        Number of random probes.
+    rng : numpy.random.Generator, optional
+        Source of the probes, defaults to a new generator.
+
+    Returns
+    -------
+    scalar or array
+        The estimate of the diagonal of shape ``x.shape``.
+    """
+    Z, HZ = _probe(trace, n_probes, rng)
+    diagonal = np.mean(Z*HZ, axis=-1)
+    if(diagonal.ndim == 0):
+        return diagonal[()]
+    return diagonal
+
+def jacobian_svd(trace, rank, oversample=10, n_iter=0, rng=None):
+    """Randomized singular value decomposition of the Jacobian of a recording.
+
+    Pushes ``rank + oversample`` Gaussian tangent directions forward through the tape, orthonormalizes the sampled range `Q`
+    and pulls `Q` back through the tape, which gives the projection ``Q^T J``. Its small singular value decomposition yields the factorization.
+    Each power iteration adds one reverse and one forward sweep and improves the accuracy for slowly decaying singular values.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of the function.
+    rank : int
+        Rank of the approximation.
+    oversample : int, optional
+        Number of additional samples of the range.
+    n_iter : int, optional
+        Number of power iterations.
+    rng : numpy.random.Generator, optional
+        Source of the random directions, defaults to a new generator.
+
+    Returns
+    -------
+    tuple(array, array, array)
+        The factors `U` of shape ``(y.size, r)``, `s` of shape ``(r,)`` and `Vt` of shape ``(r, x.size)``, such that ``J ~ U @ diag(s) @ Vt``,
+        with ``r = min(rank, x.size, y.size)``.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    n = int(np.prod(trace.x_shape))
+    m = int(np.prod(trace.y_shape))
+    k = min(rank + oversample, n, m)
+    Omega = rng.standard_normal((n, k))
+    Q = _orthonormalize(_forward(trace, Omega))
+    for _ in range(n_iter):
+        Q = _orthonormalize(_forward(trace, _orthonormalize(_reverse(trace, Q))))
+    B = _reverse(trace, Q).T
+    U, s, Vt = np.linalg.svd(B, full_matrices=False)
+    r = min(rank, k)
+    return Q.dot(U[:, :r]), s[:r], Vt[:r]
+
+def rademacher(rng, shape):
+    """Random array of shape `shape` with entries +1 and -1 of equal probability.
+    """
+    return 2.*rng.integers(0, 2, size=shape) - 1.
+
+def _probe(trace, n_probes, rng):
+    """Returns Rademacher probes of shape ``x.shape + (n_probes,)`` and their Hessian vector products.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    Z = rademacher(rng, trace.x_shape + (n_probes,))
+    return Z, trace.hessian_product(Z)[1]
+
+def _forward(trace, V):
+    """``J @ V`` for directions `V` of shape ``(x.size, k)``, returns shape ``(y.size, k)``.
+    """
+    return trace.jacobian_product(V.reshape(trace.x_shape + V.shape[1:])).reshape(-1, V.shape[1])
+
+def _reverse(trace, W):
+    """``J^T @ W`` for directions `W` of shape ``(y.size, k)``, returns shape ``(x.size, k)``.
+    """
+    return trace.transposed_jacobian_product(W.reshape(trace.y_shape + W.shape[1:])).reshape(-1, W.shape[1])
+
+def _orthonormalize(Y):
+    return np.linalg.qr(Y)[0]
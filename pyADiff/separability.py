@@ -0,0 +1,251 @@
+"""Module Separability.
+
+Derivatives of partially separable functions ``f(x) = sum_i w_i*f_i(x[S_i])`` with small index sets `S_i`.
+
+The element functions `f_i` are detected on the tape of a recording of `f`:
+starting at the output, linear operations (sums, differences, scaling by constants) are followed backwards and their weights accumulated,
+every other operation is the root of an element function, whose index set are the inputs it depends on.
+The gradients and the dense Hessians of the elements are computed separately by a second order forward sweep through the nodes of the element,
+whose cost is quadratic in the size of the element instead of the dimension of `x`, and assembled into a sparse Hessian.
+The elements are independent of each other and can be evaluated in parallel.
+
+See also
+--------
+pyADiff.sparse.edge_pushing : Sparse Hessians by a second order reverse sweep.
+pyADiff.differentiation.separable_hessian : Wrapper for the computation of Hessians of partially separable functions.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import pyADiff
+import pyADiff.adjoint as pyADiff_adjoint
+import pyADiff.sparse as pyADiff_sparse
+
+
+Element = namedtuple('Element', ['root', 'weight', 'indices'])
+Element.__doc__ = """Element function of a partially separable function: the node `root` on the tape, its `weight` in the sum
+and the positions `indices` of the inputs it depends on (in ``x.ravel()``)."""
+
+# Linear operations, which combine element functions. Maps the operation to the weights of its arguments given the constant operand.
+_LINEAR = {
+    'add': lambda c: (1., 1.),
+    'sub': lambda c: (1., -1.),
+    'add_const': lambda c: (1.,),
+    'sub_const': lambda c: (1.,),
+    'rsub_const': lambda c: (-1.,),
+    'mul_const': lambda c: (c,),
+    'div_const': lambda c: (1./c,),
+    'neg': lambda c: (-1.,),
+    'pos': lambda c: (1.,),
+}
+
+
+def elements(trace):
+    """Detects the element functions of the recording of a scalar function.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of a scalar function.
+
+    Returns
+    -------
+    list[Element]
+        The element functions in the order of the tape.
+    """
+    return [e for e, _ in _detect(trace, trace.record.tape())]
+
+def element_derivatives(trace, element_list):
+    """Gradients and dense Hessians of element functions with respect to their inputs.
+
+    The tangents and Hessians of all nodes of an element are propagated forward through the tape (second order tangent mode),
+    seeded with the unit vectors of the inputs of the element.
+    Elements with the same structure (the same operations on their nodes, e.g. from vectorized expressions) are propagated together as a batch.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of the function, the values of the record have to be floats.
+    element_list : list[Element]
+        The element functions.
+
+    Returns
+    -------
+    list[tuple(array, array)]
+        The gradient of shape ``(s,)`` and the Hessian of shape ``(s, s)`` of each (unweighted) element, where ``s = len(element.indices)``.
+    """
+    tape = trace.record.tape()
+    node_lists = [sorted(_ancestors(tape.arguments, e.root)) for e in element_list]
+    tape = _FlatTape(tape)
+    groups = _group(tape, trace.x_indices, element_list, node_lists)
+    result = [None]*len(element_list)
+    for (signature, s), (members, nodes) in groups.items():
+        G, H = _propagate(tape, signature, s, np.array(nodes))
+        for b, e in enumerate(members):
+            result[e] = (G[b], H[b])
+    return result
+
+def assemble(trace, executor=None):
+    """Gradient and Hessian of a partially separable scalar function.
+
+    Detects the element functions on the tape, computes their dense Hessians separately and assembles them into a sparse matrix.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of a scalar function, the values of the record have to be floats.
+    executor : concurrent.futures.Executor, optional
+        Executor to propagate the batches of elements in parallel, by default the batches are propagated sequentially.
+
+    Returns
+    -------
+    tuple(array, COOMatrix)
+        The gradient of shape ``x.shape`` and the lower triangle of the Hessian of shape ``(x.size, x.size)``.
+    """
+    tape = trace.record.tape()
+    detected = _detect(trace, tape)
+    element_list = [e for e, _ in detected]
+    tape = _FlatTape(tape)
+    groups = list(_group(tape, trace.x_indices, element_list, [nodes for _, nodes in detected]).items())
+    batches = (executor.map if executor is not None else map)(
+        lambda group: _propagate(tape, group[0][0], group[0][1], np.array(group[1][1])), groups
+    )
+    n = len(trace.x_indices)
+    gradient = np.zeros(n)
+    data, row, col = [], [], []
+    for ((signature, s), (members, nodes)), (G, H) in zip(groups, batches):
+        indices = np.array([element_list[e].indices for e in members])
+        weights = np.array([element_list[e].weight for e in members])
+        np.add.at(gradient, indices, weights[:, np.newaxis]*G)
+        k, l = np.tril_indices(s)
+        data.append((weights[:, np.newaxis]*H[:, k, l]).ravel())
+        row.append(indices[:, k].ravel())
+        col.append(indices[:, l].ravel())
+    if(len(data) > 0):
+        data, row, col = np.concatenate(data), np.concatenate(row), np.concatenate(col)
+        nonzero = data != 0.
+        data, row, col = data[nonzero], row[nonzero], col[nonzero]
+    return gradient.reshape(trace.x_shape), pyADiff_sparse.COOMatrix(np.asarray(data, dtype=float), row, col, (n, n))
+
+def _detect(trace, tape):
+    """Element functions of the recording `trace` with the tape `tape`, together with the sorted lists of their nodes.
+    """
+    if(trace.y_shape != ()):
+        raise ValueError('partial separability requires a scalar function, but f returned shape {}'.format(trace.y_shape))
+    root = trace.y_indices[0]
+    if(root < 0):
+        return []
+    args = tape.arguments
+    position = {i: k for k, i in enumerate(trace.x_indices)}
+
+    # accumulate the weights of the linear nodes in reverse order, like adjoints
+    weights = {root: 1.}
+    roots = {}
+    for i in range(root, -1, -1):
+        w = weights.pop(i, None)
+        if(w is None):
+            continue
+        linear = _LINEAR.get(tape.operations[i])
+        if(linear is None or i in position):
+            roots[i] = w
+            continue
+        for j, w_j in zip(args[i], linear(tape.constants[i])):
+            weights[j] = weights.get(j, 0.) + w*w_j
+
+    result = []
+    for i in sorted(roots):
+        nodes = sorted(_ancestors(args, i))
+        indices = sorted(position[j] for j in nodes if j in position)
+        if(len(indices) > 0):
+            result.append((Element(root=i, weight=roots[i], indices=indices), nodes))
+    return result
+
+class _FlatTape(object):
+    """The tape as numpy arrays: operation codes, values, constants and the flattened partials with pointers.
+    """
+    def __init__(self, tape):
+        if(not all(isinstance(v, float) for v in tape.values)):
+            raise TypeError('element derivatives require a record of float values')
+        codes = {name: code for code, name in enumerate(pyADiff_adjoint.ADRecord.OPERATIONS)}
+        self.arguments = tape.arguments
+        self.codes = [codes[o] for o in tape.operations]
+        self.values = np.array(tape.values, dtype=float)
+        self.constants = np.array(tape.constants, dtype=float)
+        self.pointers = np.cumsum([0] + [len(a) for a in tape.arguments])
+        self.partials = np.array([d for p in tape.partials for d in p], dtype=float)
+
+def _group(tape, x_indices, element_list, node_lists):
+    """Groups the elements by their structure.
+
+    The signature of an element lists for each of its nodes (in the order of the tape) the operation, the local positions of the arguments
+    and the local column of an input (or `-1`). `node_lists` are the sorted nodes of the elements. Returns a dictionary mapping ``(signature, s)`` to the positions of the elements in `element_list`
+    and the lists of their nodes.
+    """
+    groups = {}
+    for e, (element, nodes) in enumerate(zip(element_list, node_lists)):
+        local = {i: p for p, i in enumerate(nodes)}
+        seeds = {x_indices[k]: l for l, k in enumerate(element.indices)}
+        signature = tuple(
+            (tape.codes[i], tuple(local[j] for j in tape.arguments[i]), seeds.get(i, -1)) for i in nodes
+        )
+        members, node_lists = groups.setdefault((signature, len(element.indices)), ([], []))
+        members.append(e)
+        node_lists.append(nodes)
+    return groups
+
+def _propagate(tape, signature, s, nodes):
+    """Second order forward sweep through a batch of elements with the same signature.
+
+    `nodes` is an int array of shape ``(b, L)`` of the nodes of the `b` elements. Returns the gradients of shape ``(b, s)`` and the Hessians of shape ``(b, s, s)`` of the roots.
+    """
+    b = nodes.shape[0]
+    tangent = [None]*len(signature)
+    hessian = [None]*len(signature)
+    for p, (code, local_args, seed) in enumerate(signature):
+        if(seed >= 0):
+            g = np.zeros((b, s))
+            g[:, seed] = 1.
+            tangent[p] = g
+            hessian[p] = np.zeros((b, s, s))
+            continue
+        active = [(k, q) for k, q in enumerate(local_args) if tangent[q] is not None]
+        if(len(active) == 0):
+            continue
+        i = nodes[:, p]
+        g = 0.
+        H = 0.
+        for k, q in active:
+            d = tape.partials[tape.pointers[i] + k]
+            g = g + d[:, np.newaxis]*tangent[q]
+            H = H + d[:, np.newaxis, np.newaxis]*hessian[q]
+        curvature = pyADiff_adjoint._CURVATURES[code]
+        if(curvature is not None):
+            a = nodes[:, local_args[0]]
+            g_a = tangent[local_args[0]] if tangent[local_args[0]] is not None else np.zeros((b, s))
+            if(len(local_args) == 2):
+                c = nodes[:, local_args[1]]
+                g_b = tangent[local_args[1]] if tangent[local_args[1]] is not None else np.zeros((b, s))
+                h_aa, h_ab, h_bb = (np.broadcast_to(h, (b,)) for h in curvature(tape.values[a], tape.values[c], tape.values[i]))
+                g_ab = np.einsum('bi,bj->bij', g_a, g_b)
+                H = H + h_aa[:, np.newaxis, np.newaxis]*np.einsum('bi,bj->bij', g_a, g_a) \
+                    + h_ab[:, np.newaxis, np.newaxis]*(g_ab + g_ab.transpose(0, 2, 1)) \
+                    + h_bb[:, np.newaxis, np.newaxis]*np.einsum('bi,bj->bij', g_b, g_b)
+            else:
+                h_aa = np.broadcast_to(curvature(tape.values[a], tape.constants[i], tape.values[i]), (b,))
+                H = H + h_aa[:, np.newaxis, np.newaxis]*np.einsum('bi,bj->bij', g_a, g_a)
+        tangent[p] = g
+        hessian[p] = H
+    return tangent[-1], hessian[-1]
+
+def _ancestors(args, root):
+    """Indices of the node `root` and all nodes it depends on.
+    """
+    visited = {root}
+    stack = [root]
+    while stack:
+        for j in args[stack.pop()]:
+            if j not in visited:
+                visited.add(j)
+                stack.append(j)
+    return visited
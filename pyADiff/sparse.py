@@ -0,0 +1,516 @@
+"""Module Sparse.
+
+Computation of sparse Jacobians by graph coloring and compressed seeding (Curtis-Powell-Reid).
+
+Two columns of a Jacobian, which do not have a nonzero in a common row, can be computed with one tangent direction (the sum of both unit vectors).
+Coloring the columns such that no two columns of the same color share a row, the Jacobian is recovered from as many tangent directions as there are colors.
+Equivalently rows without a common nonzero column can share one adjoint direction.
+
+Sparse Hessians are computed by edge pushing (Gower and Mello), a second order reverse sweep through the tape,
+which only creates and propagates the nonlinear interactions of the nodes, so that its cost scales with the number of nonzeros.
+
+For a banded Jacobian the number of colors equals the bandwidth, independent of the dimension.
+
+The results are returned as `COOMatrix`, which can be converted to the `scipy.sparse` formats if scipy is installed.
+
+See also
+--------
+pyADiff.tangent.jacobian_product: Product of the Jacobian with tangent directions.
+pyADiff.adjoint.ADTrace.transposed_jacobian_product: Product of the transposed Jacobian with adjoint directions.
+"""
+import numpy as np
+
+import pyADiff
+import pyADiff.tangent as pyADiff_tangent
+import pyADiff.adjoint as pyADiff_adjoint
+
+
+class COOMatrix(object):
+    """COOMatrix.
+
+    A sparse matrix in coordinate format, the entry `data[k]` is located at `(row[k], col[k])`.
+    Mirrors the attributes of `scipy.sparse.coo_matrix`.
+
+    Parameters
+    ----------
+    data : array
+        The nonzero entries.
+    row : array of int
+        Row indices of the entries.
+    col : array of int
+        Column indices of the entries.
+    shape : tuple(int, int)
+        Shape of the matrix.
+    """
+    def __init__(self, data, row, col, shape):
+        self.data = np.asarray(data)
+        self.row = np.asarray(row, dtype=np.int64)
+        self.col = np.asarray(col, dtype=np.int64)
+        self.shape = tuple(shape)
+
+    @property
+    def nnz(self):
+        """Number of stored entries.
+        """
+        return self.data.shape[0]
+
+    @property
+    def T(self):
+        """Transposed matrix.
+        """
+        return COOMatrix(self.data, self.col, self.row, self.shape[::-1])
+
+    def __repr__(self):
+        return '<{}x{} COOMatrix with {} stored entries>'.format(self.shape[0], self.shape[1], self.nnz)
+
+    def toarray(self):
+        """Returns the matrix as dense array.
+        """
+        a = np.zeros(self.shape, dtype=self.data.dtype)
+        np.add.at(a, (self.row, self.col), self.data)
+        return a
+
+    def dot(self, v):
+        """Product of the matrix with the vector (or matrix) `v`.
+        """
+        v = np.asarray(v)
+        out = np.zeros((self.shape[0],) + v.shape[1:], dtype=np.result_type(self.data, v))
+        np.add.at(out, self.row, (self.data*v[self.col].T).T)
+        return out
+
+    def tocoo(self):
+        """Returns the matrix as `scipy.sparse.coo_matrix` (requires scipy).
+        """
+        import scipy.sparse
+        return scipy.sparse.coo_matrix((self.data, (self.row, self.col)), shape=self.shape)
+
+    def tocsr(self):
+        """Returns the matrix as `scipy.sparse.csr_matrix` (requires scipy).
+        """
+        return self.tocoo().tocsr()
+
+def as_pattern(pattern):
+    """Converts a sparsity pattern to a boolean `COOMatrix`.
+
+    Parameters
+    ----------
+    pattern : COOMatrix, array or scipy.sparse matrix
+        The structural nonzeros, a dense array is interpreted as boolean mask.
+
+    Returns
+    -------
+    COOMatrix
+        The pattern with `True` entries.
+    """
+    if(isinstance(pattern, COOMatrix)):
+        row, col, shape = pattern.row, pattern.col, pattern.shape
+    elif(hasattr(pattern, 'tocoo')):
+        coo = pattern.tocoo()
+        row, col, shape = coo.row, coo.col, coo.shape
+    else:
+        pattern = np.asarray(pattern, dtype=bool)
+        row, col = np.nonzero(pattern)
+        shape = pattern.shape
+    return COOMatrix(np.ones(len(row), dtype=bool), row, col, shape)
+
+def color_columns(pattern):
+    """Column Coloring.
+
+    Greedy coloring (largest degree first) of the columns of `pattern`, such that no two columns of the same color have a nonzero in a common row.
+
+    Parameters
+    ----------
+    pattern : COOMatrix, array or scipy.sparse matrix
+        The sparsity pattern.
+
+    Returns
+    -------
+    array of int
+        The color of each column, the colors are numbered from 0.
+    """
+    pattern = as_pattern(pattern)
+    m, n = pattern.shape
+    row_cols = [[] for _ in range(m)]
+    col_rows = [[] for _ in range(n)]
+    for i, j in zip(pattern.row.tolist(), pattern.col.tolist()):
+        row_cols[i].append(j)
+        col_rows[j].append(i)
+    colors = [-1]*n
+    for j in sorted(range(n), key=lambda j: -len(col_rows[j])):
+        forbidden = set()
+        for i in col_rows[j]:
+            for l in row_cols[i]:
+                forbidden.add(colors[l])
+        c = 0
+        while c in forbidden:
+            c += 1
+        colors[j] = c
+    return np.array(colors, dtype=np.int64)
+
+def color_rows(pattern):
+    """Row Coloring.
+
+    Greedy coloring of the rows of `pattern`, such that no two rows of the same color have a nonzero in a common column.
+
+    See also
+    --------
+    pyADiff.sparse.color_columns : Column Coloring.
+    """
+    return color_columns(as_pattern(pattern).T)
+
+def color_adjacent(pattern):
+    """Adjacency Coloring.
+
+    Greedy coloring (largest degree first) of the indices of the symmetric `pattern`, such that two indices `i != j` with a nonzero at ``(i, j)`` have different colors.
+    Then the diagonal entry ``(i, i)`` is recovered from the product of the matrix with the sum of the unit vectors of the color of `i`.
+
+    Parameters
+    ----------
+    pattern : COOMatrix, array or scipy.sparse matrix
+        The symmetric sparsity pattern.
+
+    Returns
+    -------
+    array of int
+        The color of each index, the colors are numbered from 0.
+    """
+    pattern = as_pattern(pattern)
+    n = pattern.shape[0]
+    neighbours = [set() for _ in range(n)]
+    for i, j in zip(pattern.row.tolist(), pattern.col.tolist()):
+        if(i != j):
+            neighbours[i].add(j)
+            neighbours[j].add(i)
+    colors = [-1]*n
+    for i in sorted(range(n), key=lambda i: -len(neighbours[i])):
+        forbidden = set(colors[j] for j in neighbours[i])
+        c = 0
+        while c in forbidden:
+            c += 1
+        colors[i] = c
+    return np.array(colors, dtype=np.int64)
+
+def jacobian_pattern(trace):
+    """Jacobian sparsity pattern of a recorded function.
+
+    Propagates the sets of inputs each node depends on through the tape of `trace`.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of the function.
+
+    Returns
+    -------
+    COOMatrix
+        The boolean pattern of shape ``(y.size, x.size)``.
+    """
+    tape = trace.record.tape()
+    sets = [frozenset()]*len(tape.operations)
+    for k, i in enumerate(trace.x_indices):
+        sets[i] = frozenset([k])
+    for i, args in enumerate(tape.arguments):
+        if(len(args) == 1):
+            sets[i] = sets[args[0]]
+        elif(len(args) > 1):
+            sets[i] = frozenset().union(*[sets[j] for j in args])
+    row, col = [], []
+    for r, i in enumerate(trace.y_indices):
+        if(i >= 0):
+            for j in sorted(sets[i]):
+                row.append(r)
+                col.append(j)
+    shape = (len(trace.y_indices), len(trace.x_indices))
+    return COOMatrix(np.ones(len(row), dtype=bool), row, col, shape)
+
+def detect_jacobian_pattern(f, x_v):
+    """Jacobian sparsity pattern detection.
+
+    Runs `f` once with `ADTypeS` inputs (index set propagation) and collects the structural nonzeros of the Jacobian, no derivative values are computed.
+    The pattern is valid for the control flow `f` takes at `x_v`.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to analyse.
+    x_v : scalar, list, array
+        The value where to evaluate `f`.
+
+    Returns
+    -------
+    COOMatrix
+        The boolean pattern of shape ``(y.size, x.size)``.
+
+    See also
+    --------
+    pyADiff.tangent.ADTypeS : The index set ADType.
+    """
+    return _detect(f, x_v, False)[0]
+
+def detect_hessian_pattern(f, x_v):
+    """Hessian sparsity pattern detection.
+
+    Runs `f` once with `ADTypeS` inputs and collects the nonlinear interactions of the inputs.
+    The pattern is symmetric and conservative, for vector valued `f` it covers the Hessians of all outputs.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to analyse.
+    x_v : scalar, list, array
+        The value where to evaluate `f`.
+
+    Returns
+    -------
+    COOMatrix
+        The symmetric boolean pattern of shape ``(x.size, x.size)``.
+
+    See also
+    --------
+    pyADiff.tangent.ADTypeS : The index set ADType.
+    """
+    return _detect(f, x_v, True)[1]
+
+def _detect(f, x_v, hessian):
+    """Runs `f` with `ADTypeS` inputs and returns the Jacobian and (if `hessian`) the Hessian pattern.
+    """
+    x_v = np.asarray(x_v)
+    interactions = set() if hessian else None
+    x = np.empty(x_v.shape, dtype=pyADiff_tangent.ADTypeS)
+    for k, i in enumerate(np.ndindex(x_v.shape)):
+        x[i] = pyADiff_tangent.ADTypeS(x_v[i], frozenset([k]), interactions)
+    if(x.ndim == 0):
+        x = x[()]
+    y = f(x)
+    y_flat = list(y.flat) if type(y) is np.ndarray else [y]
+    row, col = [], []
+    for r, v in enumerate(y_flat):
+        for j in sorted(getattr(v, 'indices', ())):
+            row.append(r)
+            col.append(j)
+    n = x_v.size
+    jacobian = COOMatrix(np.ones(len(row), dtype=bool), row, col, (len(y_flat), n))
+    if not hessian:
+        return jacobian, None
+    row, col = [], []
+    for i, j in sorted(interactions):
+        row.append(i)
+        col.append(j)
+        if(i != j):
+            row.append(j)
+            col.append(i)
+    return jacobian, COOMatrix(np.ones(len(row), dtype=bool), row, col, (n, n))
+
+def dfdx(f, x_v, pattern=None, mode='auto', trace=None):
+    """Sparse Differentiation Driver.
+
+    This computes the derivative of `f` with respect to `x` at the position `x_v` as sparse matrix of shape ``(y.size, x.size)``.
+    The signature of `f` is assumed to be::
+
+        {scalar, list, array} = f({scalar, list, array})
+
+    The columns (rows) of the sparsity pattern are colored and the Jacobian is computed from one compressed tangent (adjoint) direction per color, which are propagated in a single vector tangent run of `f` (vector reverse sweep).
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x_v : scalar, list, array
+        The value where to evaluate the derivative.
+    pattern : COOMatrix, array or scipy.sparse matrix, optional
+        The sparsity pattern of the Jacobian. If not given, it is detected by index set propagation.
+    mode : str, optional
+        `'forward'` (column coloring), `'reverse'` (row coloring) or `'auto'` (the mode with less colors).
+    trace : ADTrace, optional
+        A recording of `f` at `x_v`, which is used for the reverse sweep instead of recording `f` again.
+
+    Returns
+    -------
+    COOMatrix
+        The sparse Jacobian.
+
+    See also
+    --------
+    pyADiff.differentiation.sparse_jacobian : Wrapper for the computation of sparse Jacobians.
+    pyADiff.sparse.color_columns : Column Coloring.
+    """
+    if(mode not in ('auto', 'forward', 'reverse')):
+        raise ValueError("mode has to be 'auto', 'forward' or 'reverse', not {}".format(mode))
+    x_v = np.asarray(x_v)
+    if(pattern is None):
+        pattern = detect_jacobian_pattern(f, x_v)
+    else:
+        pattern = as_pattern(pattern)
+    column_colors = color_columns(pattern) if mode != 'reverse' else None
+    row_colors = color_rows(pattern) if mode != 'forward' else None
+    if(mode == 'auto'):
+        n_column_colors = column_colors.max(initial=-1) + 1
+        n_row_colors = row_colors.max(initial=-1) + 1
+        mode = 'forward' if n_column_colors <= n_row_colors else 'reverse'
+    m, n = pattern.shape
+    if(mode == 'forward'):
+        p = column_colors.max(initial=-1) + 1
+        seeds = np.zeros((n, p))
+        seeds[np.arange(n), column_colors] = 1.
+        _, compressed = pyADiff_tangent.jacobian_product(f, x_v, seeds.reshape(x_v.shape + (p,)))
+        compressed = compressed.reshape(m, p)
+        data = compressed[pattern.row, column_colors[pattern.col]]
+    else:
+        q = row_colors.max(initial=-1) + 1
+        seeds = np.zeros((m, q))
+        seeds[np.arange(m), row_colors] = 1.
+        if(trace is None):
+            trace = pyADiff_adjoint.ADTrace(f, x_v)
+        compressed = trace.transposed_jacobian_product(seeds.reshape(trace.y_shape + (q,))).reshape(n, q)
+        data = compressed[pattern.col, row_colors[pattern.row]]
+    return COOMatrix(data, pattern.row, pattern.col, pattern.shape)
+
+def edge_pushing(trace):
+    """Edge Pushing.
+
+    Second order reverse sweep through the tape of a scalar function, which computes the gradient and the Hessian (Gower and Mello).
+
+    The nodes are eliminated in reverse order. Each node pushes its nonlinear interactions (edges) to its arguments,
+    weighted by its partial derivatives, and creates new edges between its arguments, weighted by its adjoint and its second partial derivatives.
+    Only nonzero edges are stored, so that memory and time scale with the number of nonzeros of the Hessian (and of the intermediate interactions).
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of a scalar function, the values of the record have to be floats.
+
+    Returns
+    -------
+    tuple(array, COOMatrix)
+        The gradient of shape ``x.shape`` and the lower triangle of the Hessian of shape ``(x.size, x.size)``.
+    """
+    if(trace.y_shape != ()):
+        raise ValueError('edge pushing requires a scalar function, but f returned shape {}'.format(trace.y_shape))
+    tape = trace.record.tape()
+    op = tape.operations
+    val = tape.values
+    const = tape.constants
+    args = tape.arguments
+    par = tape.partials
+    if(not all(isinstance(v, float) for v in val)):
+        raise TypeError('edge pushing requires a record of float values')
+    curvatures = dict(zip(pyADiff_adjoint.ADRecord.OPERATIONS, pyADiff_adjoint._CURVATURES))
+    n = len(op)
+    adj = [0.]*n
+    edges = {}
+
+    def add(i, j, w):
+        if(w == 0.):
+            return
+        row = edges.setdefault(i, {})
+        row[j] = row.get(j, 0.) + w
+        if(i != j):
+            row = edges.setdefault(j, {})
+            row[i] = row.get(i, 0.) + w
+
+    def add_symmetric(i, j, w):
+        add(i, j, w if i != j else 2.*w)
+
+    if(trace.y_indices[0] >= 0):
+        adj[trace.y_indices[0]] = 1.
+    for i in range(n - 1, -1, -1):
+        a = args[i]
+        if(len(a) == 0):
+            continue
+        row = edges.pop(i, {})
+        if(adj[i] == 0. and len(row) == 0):
+            continue
+        d = par[i]
+        w_ii = row.pop(i, 0.)
+        for p in row:
+            del edges[p][i]
+        for p, w in row.items():
+            for j, d_j in zip(a, d):
+                add_symmetric(j, p, d_j*w)
+        if(w_ii != 0.):
+            for s in range(len(a)):
+                add(a[s], a[s], d[s]*d[s]*w_ii)
+                for t in range(s + 1, len(a)):
+                    add_symmetric(a[s], a[t], d[s]*d[t]*w_ii)
+        adj_i = adj[i]
+        if(adj_i != 0.):
+            curvature = curvatures[op[i]]
+            if(curvature is not None):
+                if(len(a) == 2):
+                    h_aa, h_ab, h_bb = curvature(val[a[0]], val[a[1]], val[i])
+                    add(a[0], a[0], adj_i*h_aa)
+                    add_symmetric(a[0], a[1], adj_i*h_ab)
+                    add(a[1], a[1], adj_i*h_bb)
+                else:
+                    add(a[0], a[0], adj_i*curvature(val[a[0]], const[i], val[i]))
+            for j, d_j in zip(a, d):
+                adj[j] += d_j*adj_i
+    position = {i: k for k, i in enumerate(trace.x_indices)}
+    data, row, col = [], [], []
+    for k, i in enumerate(trace.x_indices):
+        for j, w in edges.get(i, {}).items():
+            l = position.get(j)
+            if(l is not None and l <= k):
+                data.append(w)
+                row.append(k)
+                col.append(l)
+    m = len(trace.x_indices)
+    gradient = np.array([adj[i] for i in trace.x_indices]).reshape(trace.x_shape)
+    return gradient, COOMatrix(np.array(data, dtype=float), row, col, (m, m))
+
+def hessian_diagonal(trace, pattern):
+    """Hessian Diagonal.
+
+    Computes the diagonal of the Hessian of a recorded scalar function from Hessian vector products with compressed directions.
+    The indices are colored such that no two indices of the same color interact (`color_adjacent`),
+    the directions are the sums of the unit vectors of each color and all products are computed in one forward and one second order reverse sweep.
+
+    Parameters
+    ----------
+    trace : ADTrace
+        The recording of a scalar function.
+    pattern : COOMatrix, array or scipy.sparse matrix
+        The symmetric Hessian sparsity pattern of shape ``(x.size, x.size)``.
+
+    Returns
+    -------
+    scalar or array
+        The diagonal of the Hessian of shape ``x.shape``.
+
+    See also
+    --------
+    pyADiff.adjoint.ADTrace.hessian_product : The Hessian vector products.
+    """
+    colors = color_adjacent(pattern)
+    n = len(colors)
+    V = np.zeros((n, colors.max() + 1 if n > 0 else 0))
+    V[np.arange(n), colors] = 1.
+    HV = trace.hessian_product(V.reshape(trace.x_shape + V.shape[1:]))[1].reshape(V.shape)
+    diagonal = HV[np.arange(n), colors].reshape(trace.x_shape)
+    if(diagonal.ndim == 0):
+        return diagonal[()]
+    return diagonal
+
+def hessian(f, x_v):
+    """Sparse Hessian Driver.
+
+    Records the scalar function `f` at `x_v` and computes its Hessian by edge pushing.
+
+    Parameters
+    ----------
+    f : function_type
+        The scalar function.
+    x_v : scalar, list, array
+        The value where to evaluate the Hessian.
+
+    Returns
+    -------
+    COOMatrix
+        The lower triangle of the Hessian of shape ``(x.size, x.size)``.
+
+    See also
+    --------
+    pyADiff.sparse.edge_pushing : The second order reverse sweep.
+    pyADiff.differentiation.sparse_hessian : Wrapper for the computation of sparse Hessians.
+    """
+    return edge_pushing(pyADiff_adjoint.ADTrace(f, x_v))[1]
@@ -1,6 +1,7 @@
 import numpy as np
 
 import pyADiff
+import pyADiff.profiling as pyADiff_profiling
 from pyADiff.exceptions import NotDifferentiableExeption
 from pyADiff.math_functions import *
 
@@ -13,14 +14,16 @@ class ADTypeT(object):
 
     This class implements the numerical operators (+, -, .. ) as expected for a numerical type, but additionaly accumulates the partial derivatives.
 
+    The `derivative` can also be a numpy vector, then all its entries (tangent directions) are propagated simultaneously (vector tangent mode).
+
     Basic mathematical functions (`sin`, `cos`, `exp`, ...) are implemented as member functions and also accumulate the partial derivatives.
 
     Parameters
     ----------
     value : float or ADType
         The value of the overloaded numerical type.
-    deriative : float or ADType
-        The derivative of the overloaded numerical type.
+    deriative : float, ADType or array
+        The derivative of the overloaded numerical type, an array holds one entry per tangent direction.
 
     See also
     --------
@@ -217,7 +220,7 @@ class ADTypeT(object):
         )
 
     def __abs__(self):
-        if self.value == 0 and self.derivative != 0:
+        if self.value == 0 and np.any(self.derivative != 0):
             raise NotDifferentiableExeption
         return ADTypeT(
             value=abs(self.value),
@@ -254,8 +257,221 @@ class ADTypeT(object):
             derivative=self.derivative/(2.*sqrt(self.value))
         )
 
+_init = ADTypeT.__init__
+
+def _counting_init(self, value, derivative=0.):
+    """Constructor of `ADTypeT` which counts the allocations, installed while a profile is active.
+    """
+    pyADiff_profiling.add_tangent_allocation()
+    _init(self, value, derivative)
+
+
+class ADTypeS(object):
+    """Sparsity ADType.
+
+    This class overloads the basic numerical type of python.
+    Instead of a `derivative` it stores the `indices` of the inputs its value depends on (index set propagation).
+    These are the structural nonzeros of its gradient, no derivative values are computed.
+
+    If a set of `interactions` is given, all nonlinear interactions of the inputs are collected in it (nonlinear interaction domains).
+    Together these are a (conservative) pattern of the structural nonzeros of the Hessian.
+
+    The `value` is propagated as well, so that comparisons (and therefore the control flow of the computation) behave as for floats.
+
+    Parameters
+    ----------
+    value : float
+        The value of the overloaded numerical type.
+    indices : frozenset[int]
+        The indices of the inputs the value depends on.
+    interactions : set[tuple(int, int)], optional
+        Set of the nonlinear interactions ``(i, j)`` with ``i <= j``, shared by all ADTypeS of a computation.
+
+    See also
+    --------
+    pyADiff.sparse.detect_jacobian_pattern : Detects the sparsity pattern of a Jacobian.
+    pyADiff.sparse.detect_hessian_pattern : Detects the sparsity pattern of a Hessian.
+    """
+    def __init__(self, value, indices=frozenset(), interactions=None):
+        self._v = value
+        self._s = indices
+        self._n = interactions
+
+    @property
+    def value(self):
+        """Value of the overloaded numerical type.
+        """
+        return self._v
+
+    @property
+    def indices(self):
+        """Indices of the inputs the value depends on.
+        """
+        return self._s
+
+    @property
+    def interactions(self):
+        """Shared set of the nonlinear interactions of the inputs.
+        """
+        return self._n
+
+    def _new(self, value, indices):
+        return ADTypeS(value, indices, self._n)
+
+    def _interact(self, a, b):
+        """Records the nonlinear interactions of all indices in `a` with all indices in `b`.
+        """
+        if self._n is not None:
+            self._n.update((i, j) if i <= j else (j, i) for i in a for j in b)
+
+    def __repr__(self):
+        return str(self.value) + '+d' + str(sorted(self.indices))
+
+    def __add__(self, other):
+        try:
+            return self._new(self.value + other.value, self.indices | other.indices)
+        except AttributeError:
+            temp = other.__radd__(self)
+            if temp is NotImplemented:
+                return self._new(self.value + other, self.indices)
+            else:
+                return temp
+
+    def __radd__(self, other):
+        return self._new(other + self.value, self.indices)
 
-def dfdx(f, x_v):
+    def __sub__(self, other):
+        try:
+            return self._new(self.value - other.value, self.indices | other.indices)
+        except AttributeError:
+            temp = other.__rsub__(self)
+            if temp is NotImplemented:
+                return self._new(self.value - other, self.indices)
+            else:
+                return temp
+
+    def __rsub__(self, other):
+        return self._new(other - self.value, self.indices)
+
+    def __mul__(self, other):
+        try:
+            value = self.value*other.value
+            self._interact(self.indices, other.indices)
+            return self._new(value, self.indices | other.indices)
+        except AttributeError:
+            temp = other.__rmul__(self)
+            if temp is NotImplemented:
+                return self._new(self.value*other, self.indices)
+            else:
+                return temp
+
+    def __rmul__(self, other):
+        return self._new(other*self.value, self.indices)
+
+    def __truediv__(self, other):
+        try:
+            value = self.value/other.value
+            self._interact(self.indices, other.indices)
+            self._interact(other.indices, other.indices)
+            return self._new(value, self.indices | other.indices)
+        except AttributeError:
+            temp = other.__rtruediv__(self)
+            if temp is NotImplemented:
+                return self._new(self.value/other, self.indices)
+            else:
+                return temp
+
+    def __rtruediv__(self, other):
+        self._interact(self.indices, self.indices)
+        return self._new(other/self.value, self.indices)
+
+    def __pow__(self, other):
+        try:
+            value = self.value**other.value
+            indices = self.indices | other.indices
+            self._interact(indices, indices)
+            return self._new(value, indices)
+        except AttributeError:
+            temp = other.__rpow__(self)
+            if temp is NotImplemented:
+                if(other != 1 and other != 0):
+                    self._interact(self.indices, self.indices)
+                return self._new(self.value**other, self.indices)
+            else:
+                return temp
+
+    def __rpow__(self, other):
+        self._interact(self.indices, self.indices)
+        return self._new(other**self.value, self.indices)
+
+    ### EQUALITIES AND INEQUALITIES
+    def __lt__(self, other):
+        try:
+            return self.value < other.value
+        except AttributeError:
+            return self.value < other
+
+    def __le__(self, other):
+        try:
+            return self.value <= other.value
+        except AttributeError:
+            return self.value <= other
+    
+    def __eq__(self, other):
+        try:
+            return self.value == other.value
+        except AttributeError:
+            return self.value == other
+
+    def __ne__(self, other):
+        try:
+            return self.value != other.value
+        except AttributeError:
+            return self.value != other
+
+    def __gt__(self, other):
+        try:
+            return self.value > other.value
+        except AttributeError:
+            return self.value > other
+
+    def __ge__(self, other):
+        try:
+            return self.value >= other.value
+        except AttributeError:
+            return self.value >= other
+
+    ### SINGLE INPUT FUNCTIONS
+    def __neg__(self):
+        return self._new(-self.value, self.indices)
+
+    def __pos__(self):
+        return self._new(self.value, self.indices)
+
+    def __abs__(self):
+        return self._new(abs(self.value), self.indices)
+
+    def _nonlinear(self, value):
+        self._interact(self.indices, self.indices)
+        return self._new(value, self.indices)
+
+    def sin(self):
+        return self._nonlinear(sin(self.value))
+
+    def cos(self):
+        return self._nonlinear(cos(self.value))
+
+    def exp(self):
+        return self._nonlinear(exp(self.value))
+
+    def log(self):
+        return self._nonlinear(log(self.value))
+
+    def sqrt(self):
+        return self._nonlinear(sqrt(self.value))
+
+
+def dfdx(f, x_v, chunk_size=None):
     """Tangent Differentiation Driver.
 
     This computes the derivative of `f` with respect to `x` at the position `x_v`.
@@ -263,8 +479,8 @@ def dfdx(f, x_v):
 
         {scalar, list, array} = f({scalar, list, array})
 
-    This function converts the inputs x_v to their respective `ADTypeT` and successively sets their derivative to 1, runs the function `f` and collects the derivative values from the outputs `y = f(x)`.
-    If `x` is scalar only one forward run of `f` is necessary.
+    This function converts the inputs x_v to their respective `ADTypeT`, seeds their derivatives with unit vectors (vector tangent mode), runs the function `f` and collects the derivative vectors from the outputs `y = f(x)`.
+    If `x` has `n` entries, `f` is run ``ceil(n/chunk_size)`` times, each time propagating `chunk_size` tangent directions (strip-mining).
 
     Parameters
     ----------
@@ -272,6 +488,8 @@ def dfdx(f, x_v):
         The function to differentiate.
     x_v : scalar, list, array
         The value where to evaluate the derivative.
+    chunk_size : int, optional
+        Number of tangent directions propagated in one run of `f`. Defaults to all entries of `x`, `1` runs `f` once per entry with scalar derivatives.
 
     See also
     --------
@@ -281,28 +499,41 @@ def dfdx(f, x_v):
         x = np.empty(x_v.shape, dtype=ADTypeT)
         for i in np.ndindex(x_v.shape):
             x[i] = ADTypeT(x_v[i])
+        n = x.size
+        if chunk_size is None:
+            chunk_size = max(n, 1)
         df = None
-        for i in np.ndindex(x.shape):
-            x[i].derivative = 1.
-            y = f(x)
-            if(df is None):
-                if(type(y) is np.ndarray):
-                    df = np.empty(y.shape + x.shape, dtype=type(y.flat[0].derivative))
+        for start in range(0, n, chunk_size):
+            k = min(chunk_size, n - start)
+            seeds = np.eye(k)
+            for r in range(k):
+                if(chunk_size == 1):
+                    x.flat[start + r].derivative = 1.
                 else:
-                    df = np.empty(x.shape, dtype=type(y.derivative))
+                    x.flat[start + r].derivative = seeds[r]
+            with pyADiff_profiling.measure('tangent'):
+                y = f(x)
             if(type(y) is np.ndarray):
-                for j in np.ndindex(y.shape):
-                    df[j+i] = y[j].derivative
+                y_shape = y.shape
+                d = np.array([_derivatives(v, k) for v in y.flat])
             else:
-                df[i] = y.derivative
-            x[i].derivative = 0.
-        return df
+                y_shape = ()
+                d = np.array([_derivatives(y, k)])
+            if(df is None):
+                df = np.empty((d.shape[0], n), dtype=d.dtype)
+            df[:, start:start + k] = d
+            for r in range(k):
+                x.flat[start + r].derivative = 0.
+        if(df is None):
+            return np.empty(x.shape)
+        return df.reshape(y_shape + x.shape)
     elif(type(x_v) is list):
-        return dfdx(f, np.array(x_v))
+        return dfdx(f, np.array(x_v), chunk_size)
     else:
         x = ADTypeT(x_v)
         x.derivative = 1.
-        y = f(x)
+        with pyADiff_profiling.measure('tangent'):
+            y = f(x)
         if(type(y) is np.ndarray):
             df = np.empty(y.shape, dtype=type(y.flat[0].derivative))
             for j in np.ndindex(y.shape):
@@ -310,4 +541,58 @@ def dfdx(f, x_v):
         else:
             df = y.derivative
         x.derivative = 0.
-        return df
\ No newline at end of file
+        return df
+
+def jacobian_product(f, x_v, V):
+    """Jacobian Matrix Product.
+
+    Computes the product of the derivative of `f` at `x_v` with the `k` tangent directions `V` in a single (vector tangent) run of `f`.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x_v : scalar, list, array
+        The value where to evaluate the derivative.
+    V : array
+        Tangent directions of shape ``x.shape + (k,)``.
+
+    Returns
+    -------
+    tuple(scalar or array, array)
+        The value ``y = f(x_v)`` and the product of the derivative with `V` of shape ``y.shape + (k,)``.
+    """
+    x_v = np.asarray(x_v)
+    V = np.asarray(V)
+    k = V.shape[-1]
+    x = np.empty(x_v.shape, dtype=ADTypeT)
+    for i in np.ndindex(x_v.shape):
+        x[i] = ADTypeT(x_v[i], V[i])
+    if(x.ndim == 0):
+        x = x[()]
+    with pyADiff_profiling.measure('tangent'):
+        y = f(x)
+    if(type(y) is np.ndarray):
+        y_v = np.array([_value(v) for v in y.flat]).reshape(y.shape)
+        y_d = np.array([_derivatives(v, k) for v in y.flat]).reshape(y.shape + (k,))
+        return y_v, y_d
+    return _value(y), np.array(_derivatives(y, k))
+
+def _value(y):
+    """Value of the output `y`, which may be a constant.
+    """
+    try:
+        return y.value
+    except AttributeError:
+        return y
+
+def _derivatives(y, k):
+    """Derivative vector of length `k` of the output `y`. Outputs which do not depend on `x` have zero derivative.
+    """
+    try:
+        d = y.derivative
+    except AttributeError:
+        d = 0.
+    if(k == 1 and np.ndim(d) == 0):
+        return [d]
+    return np.broadcast_to(d, (k,))
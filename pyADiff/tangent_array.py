@@ -0,0 +1,606 @@
+"""Module Tangent Array.
+
+Array-level forward mode.
+
+The `DualArray` holds a value array and a tangent array with a trailing direction axis (structure of arrays),
+instead of an object array of `ADTypeT` s (array of structures).
+All operations (element-wise ufuncs with broadcasting, reductions, slicing, reshaping) are evaluated by vectorised numpy operations on both arrays,
+so no python object is created per element.
+
+The `DualArray` hooks into numpy through `__array_ufunc__` and `__array_function__`
+and implements the mathematical functions of `pyADiff.math_functions` as member functions.
+
+The linear algebra functions `matmul` (``@``), `solve`, `inv`, `det`, `slogdet`, `cholesky` and `eigh` (also through `numpy.linalg`) propagate all tangent directions
+in one vectorised step with closed form rules, e.g. ``dX = A^-1 (dB - dA X)`` for a linear solve.
+`cholesky` and `eigh` assume a symmetric input and use the symmetric part of its tangents.
+
+See also
+--------
+pyADiff.tangent: The scalar forward mode.
+pyADiff.adjoint_array: The array-level reverse mode.
+pyADiff.differentiation.derfor_array: Wrapper for the array-level forward mode.
+"""
+import numpy as np
+
+import pyADiff
+import pyADiff.profiling as pyADiff_profiling
+
+
+class DualArray(object):
+    """Array Tangent ADType.
+
+    Holds the `value` array of shape `S` and the `derivative` array of shape ``S + (k,)``, which carries `k` tangent directions.
+
+    Supported are the element-wise ufuncs `add`, `subtract`, `multiply`, `divide`, `power`, `negative`, `positive`, `absolute`, `square`, `sqrt`, `exp`, `log`, `sin`, `cos`, `tan`, `tanh`, `maximum` and `minimum` (with broadcasting),
+    the reductions `sum` and `mean`, indexing, `reshape`, `transpose`, `concatenate`, `stack` and `where`,
+    and the linear algebra functions `matmul`, `dot`, `solve`, `inv`, `det`, `slogdet`, `cholesky` and `eigh`.
+
+    Parameters
+    ----------
+    value : array
+        The value of the array.
+    derivative : array, optional
+        The tangents of shape ``value.shape + (k,)``, defaults to a single zero direction.
+
+    See also
+    --------
+    pyADiff.tangent_array.dfdx : Array-level tangent differentiation driver.
+    """
+    __slots__ = ('_v', '_d')
+
+    def __init__(self, value, derivative=None):
+        self._v = np.asarray(value)
+        if derivative is None:
+            derivative = np.zeros(self._v.shape + (1,))
+        self._d = np.asarray(derivative)
+
+    @property
+    def value(self):
+        """Value of the array.
+        """
+        return self._v
+
+    @property
+    def derivative(self):
+        """Tangents of the array, of shape ``value.shape + (k,)``.
+        """
+        return self._d
+
+    @property
+    def shape(self):
+        return self._v.shape
+
+    @property
+    def ndim(self):
+        return self._v.ndim
+
+    @property
+    def size(self):
+        return self._v.size
+
+    @property
+    def dtype(self):
+        return self._v.dtype
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def __len__(self):
+        return len(self._v)
+
+    def __repr__(self):
+        return 'DualArray(' + repr(self._v) + ', ' + repr(self._d) + ')'
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if(method != '__call__' or len(kwargs) > 0):
+            return NotImplemented
+        values = [_value(a) for a in inputs]
+        if ufunc in _COMPARISONS:
+            return ufunc(*values)
+        if ufunc is np.matmul:
+            return matmul(*inputs)
+        rules = _UFUNCS.get(ufunc)
+        if rules is None:
+            return NotImplemented
+        v = np.asarray(ufunc(*values))
+        d = None
+        for k, a in enumerate(inputs):
+            if(type(a) is DualArray):
+                c = rules[k](a._d, v, *values)
+                d = c if d is None else d + c
+        return DualArray(v, _broadcast(d, v.shape))
+
+    def __array_function__(self, func, types, args, kwargs):
+        function = _FUNCTIONS.get(func)
+        if function is None:
+            return NotImplemented
+        return function(*args, **kwargs)
+
+    def __add__(self, other):
+        return np.add(self, other)
+
+    def __radd__(self, other):
+        return np.add(other, self)
+
+    def __sub__(self, other):
+        return np.subtract(self, other)
+
+    def __rsub__(self, other):
+        return np.subtract(other, self)
+
+    def __mul__(self, other):
+        return np.multiply(self, other)
+
+    def __rmul__(self, other):
+        return np.multiply(other, self)
+
+    def __truediv__(self, other):
+        return np.true_divide(self, other)
+
+    def __rtruediv__(self, other):
+        return np.true_divide(other, self)
+
+    def __pow__(self, other):
+        return np.power(self, other)
+
+    def __matmul__(self, other):
+        return matmul(self, other)
+
+    def __rmatmul__(self, other):
+        return matmul(other, self)
+
+    def __rpow__(self, other):
+        return np.power(other, self)
+
+    def __neg__(self):
+        return np.negative(self)
+
+    def __pos__(self):
+        return np.positive(self)
+
+    def __abs__(self):
+        return np.absolute(self)
+
+    def __lt__(self, other):
+        return np.less(self, other)
+
+    def __le__(self, other):
+        return np.less_equal(self, other)
+
+    def __eq__(self, other):
+        return np.equal(self, other)
+
+    def __ne__(self, other):
+        return np.not_equal(self, other)
+
+    def __gt__(self, other):
+        return np.greater(self, other)
+
+    def __ge__(self, other):
+        return np.greater_equal(self, other)
+
+    __hash__ = None
+
+    def __getitem__(self, key):
+        key = _key(key)
+        if(type(key) is tuple and any(k is Ellipsis for k in key)):
+            tangent_key = key + (slice(None),)
+        else:
+            tangent_key = key
+        return DualArray(self._v[key], self._d[tangent_key])
+
+    def __setitem__(self, key, value):
+        raise TypeError('DualArray does not support item assignment, use where, concatenate or stack instead')
+
+    def sum(self, axis=None, keepdims=False):
+        axes = _axes(axis, self.ndim)
+        return DualArray(self._v.sum(axis=axis, keepdims=keepdims), self._d.sum(axis=axes, keepdims=keepdims))
+
+    def mean(self, axis=None, keepdims=False):
+        count = np.prod([self.shape[a] for a in _axes(axis, self.ndim)], dtype=int)
+        return self.sum(axis=axis, keepdims=keepdims)/float(count)
+
+    def reshape(self, *shape):
+        if(len(shape) == 1 and type(shape[0]) in (tuple, list)):
+            shape = tuple(shape[0])
+        v = self._v.reshape(shape)
+        return DualArray(v, self._d.reshape(v.shape + self._d.shape[-1:]))
+
+    def ravel(self):
+        return self.reshape(-1)
+
+    def transpose(self, *axes):
+        if(len(axes) == 1 and type(axes[0]) in (tuple, list)):
+            axes = tuple(axes[0])
+        if(len(axes) == 0):
+            axes = tuple(range(self.ndim - 1, -1, -1))
+        axes = tuple(a % self.ndim for a in axes)
+        return DualArray(self._v.transpose(axes), self._d.transpose(axes + (self.ndim,)))
+
+    def sin(self):
+        return np.sin(self)
+
+    def cos(self):
+        return np.cos(self)
+
+    def exp(self):
+        return np.exp(self)
+
+    def log(self):
+        return np.log(self)
+
+    def sqrt(self):
+        return np.sqrt(self)
+
+    def matmul(self, other):
+        return matmul(self, other)
+
+    def solve(self, b):
+        return solve(self, b)
+
+    def inv(self):
+        return inv(self)
+
+    def det(self):
+        return det(self)
+
+    def slogdet(self):
+        return slogdet(self)
+
+    def cholesky(self):
+        return cholesky(self)
+
+    def eigh(self):
+        return eigh(self)
+
+def concatenate(arrays, axis=0):
+    """Concatenation of `DualArray` s (and constant arrays) along `axis`.
+    """
+    k = _directions(arrays)
+    if k is None:
+        return np.concatenate(arrays, axis=axis)
+    v = np.concatenate([_value(a) for a in arrays], axis=axis)
+    axis = axis % v.ndim
+    d = np.concatenate([_derivative(a, k) for a in arrays], axis=axis)
+    return DualArray(v, d)
+
+def stack(arrays, axis=0):
+    """Stacks `DualArray` s (and constant arrays) along a new `axis`.
+    """
+    k = _directions(arrays)
+    if k is None:
+        return np.stack(arrays, axis=axis)
+    v = np.stack([_value(a) for a in arrays], axis=axis)
+    axis = axis % v.ndim
+    d = np.stack([_derivative(a, k) for a in arrays], axis=axis)
+    return DualArray(v, d)
+
+def where(condition, a, b):
+    """Element-wise selection of `a` where `condition` holds, else `b`.
+    """
+    condition = _value(condition)
+    k = _directions([a, b])
+    if k is None:
+        return np.where(condition, a, b)
+    v = np.where(condition, _value(a), _value(b))
+    d = np.where(np.asarray(condition)[..., np.newaxis], _derivative(a, k), _derivative(b, k))
+    return DualArray(v, _broadcast(d, v.shape))
+
+def matmul(a, b):
+    """Matrix product of `DualArray` s (and constant arrays), following `numpy.matmul` (vectors and stacks of matrices).
+
+    Tangents: ``dC = dA @ B + A @ dB``.
+    """
+    k = _directions([a, b])
+    A, B = np.asarray(_value(a)), np.asarray(_value(b))
+    if k is None:
+        return np.matmul(A, B)
+    v = np.matmul(A, B)
+    A2 = A[np.newaxis] if A.ndim == 1 else A
+    B2 = B[:, np.newaxis] if B.ndim == 1 else B
+    ndim = max(A2.ndim, B2.ndim)
+    d = 0.
+    if(type(a) is DualArray):
+        dA = a._d[np.newaxis] if A.ndim == 1 else a._d
+        d = d + np.matmul(_front(dA, ndim), B2)
+    if(type(b) is DualArray):
+        dB = b._d[:, np.newaxis] if B.ndim == 1 else b._d
+        d = d + np.matmul(A2, _front(dB, ndim))
+    return DualArray(v, _back(d).reshape(v.shape + (k,)))
+
+def dot(a, b):
+    """Dot product of vectors and matrices, see `matmul`.
+    """
+    if(np.ndim(_value(a)) == 0 or np.ndim(_value(b)) == 0):
+        return np.multiply(a, b)
+    if(np.ndim(_value(a)) > 2 or np.ndim(_value(b)) > 2):
+        raise TypeError('dot of DualArrays supports vectors and matrices only, use matmul for stacks of matrices')
+    return matmul(a, b)
+
+def solve(a, b):
+    """Solution `X` of the linear system ``A @ X = B``, following `numpy.linalg.solve`.
+
+    Tangents: ``dX = A^-1 @ (dB - dA @ X)``.
+    """
+    k = _directions([a, b])
+    A, B = np.asarray(_value(a)), np.asarray(_value(b))
+    if k is None:
+        return np.linalg.solve(A, B)
+    vector = B.ndim == A.ndim - 1
+    B2 = B[..., np.newaxis] if vector else B
+    X2 = np.linalg.solve(A, B2)
+    ndim = X2.ndim
+    rhs = 0.
+    if(type(b) is DualArray):
+        rhs = rhs + _front(b._d[..., np.newaxis, :] if vector else b._d, ndim)
+    if(type(a) is DualArray):
+        rhs = rhs - np.matmul(_front(a._d, ndim), X2)
+    d = _back(np.linalg.solve(A, rhs))
+    if(vector):
+        return DualArray(X2[..., 0], d[..., 0, :])
+    return DualArray(X2, d)
+
+def inv(a):
+    """Inverse `Y` of the (stack of) square matrix `a`.
+
+    Tangents: ``dY = -Y @ dA @ Y``.
+    """
+    if(type(a) is not DualArray):
+        return np.linalg.inv(a)
+    v = np.linalg.inv(a._v)
+    return DualArray(v, _back(-np.matmul(v, np.matmul(_front(a._d, v.ndim), v))))
+
+def det(a):
+    """Determinant `d` of the (stack of) square matrix `a`.
+
+    Tangents: ``dd = d*tr(A^-1 @ dA)``.
+    """
+    if(type(a) is not DualArray):
+        return np.linalg.det(a)
+    v = np.linalg.det(a._v)
+    return DualArray(v, _back(v*_trace_product(a)))
+
+def slogdet(a):
+    """Sign and logarithm of the absolute value of the determinant of the (stack of) square matrix `a`.
+
+    The sign is a constant array. Tangents of the logarithm: ``tr(A^-1 @ dA)``.
+    """
+    if(type(a) is not DualArray):
+        return np.linalg.slogdet(a)
+    sign, v = np.linalg.slogdet(a._v)
+    return sign, DualArray(v, _back(_trace_product(a)))
+
+def cholesky(a):
+    """Lower triangular Cholesky factor `L` of the (stack of) symmetric positive definite matrix `a`.
+
+    Tangents: ``dL = L @ Phi(L^-1 @ sym(dA) @ L^-T)``, where `Phi` takes the lower triangle and halves the diagonal.
+    """
+    if(type(a) is not DualArray):
+        return np.linalg.cholesky(a)
+    v = np.linalg.cholesky(a._v)
+    L_inv = np.linalg.inv(v)
+    dA = _sym(_front(a._d, v.ndim))
+    return DualArray(v, _back(np.matmul(v, _phi(np.matmul(L_inv, np.matmul(dA, _t(L_inv)))))))
+
+def eigh(a):
+    """Eigenvalues `w` (ascending) and eigenvectors `V` of the (stack of) symmetric matrix `a`.
+
+    Tangents: ``dw = diag(M)`` and ``dV = V @ (F * M)`` with ``M = V^T @ sym(dA) @ V``, ``F_ij = 1/(w_j - w_i)`` and ``F_ii = 0``.
+    The eigenvalues have to be distinct for the tangents of the eigenvectors.
+    """
+    if(type(a) is not DualArray):
+        return np.linalg.eigh(a)
+    w, V = np.linalg.eigh(a._v)
+    M = np.matmul(_t(V), np.matmul(_sym(_front(a._d, V.ndim)), V))
+    dw = np.diagonal(M, axis1=-2, axis2=-1)
+    dV = np.matmul(V, _eigengap(w)*M)
+    return DualArray(w, _back(dw)), DualArray(V, _back(dV))
+
+def dfdx(f, x_v, chunk_size=None):
+    """Array-level Tangent Differentiation Driver.
+
+    This computes the derivative of `f` with respect to `x` at the position `x_v`.
+    The signature of `f` is assumed to be::
+
+        {scalar, array} = f(array)
+
+    where `f` uses numpy operations on its input as a whole (no element-wise loops).
+    The input is wrapped into a `DualArray`, whose tangents are seeded with unit vectors (vector tangent mode).
+    If `x` has `n` entries, `f` is run ``ceil(n/chunk_size)`` times, each time propagating `chunk_size` tangent directions.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x_v : scalar, list, array
+        The value where to evaluate the derivative.
+    chunk_size : int, optional
+        Number of tangent directions propagated in one run of `f`. Defaults to all entries of `x`.
+
+    Returns
+    -------
+    scalar or array
+        The derivative of shape ``y.shape + x.shape``.
+
+    See also
+    --------
+    pyADiff.differentiation.derfor_array : Wrapper for the array-level forward mode.
+    """
+    x_v = np.asarray(x_v, dtype=float)
+    n = x_v.size
+    if chunk_size is None:
+        chunk_size = max(n, 1)
+    df = None
+    for start in range(0, n, chunk_size):
+        k = min(chunk_size, n - start)
+        seeds = np.zeros((n, k))
+        seeds[start + np.arange(k), np.arange(k)] = 1.
+        y, d = jacobian_product(f, x_v, seeds.reshape(x_v.shape + (k,)))
+        if(df is None):
+            df = np.empty(np.shape(y) + (n,))
+        df[..., start:start + k] = d
+    if(df is None):
+        df = np.empty(np.shape(f(x_v)) + (0,))
+    df = df.reshape(df.shape[:-1] + x_v.shape)
+    if(df.ndim == 0):
+        return df[()]
+    return df
+
+def jacobian_product(f, x_v, V):
+    """Jacobian Matrix Product.
+
+    Computes the product of the derivative of `f` at `x_v` with the `k` tangent directions `V` in a single run of `f` with a `DualArray` input.
+
+    Parameters
+    ----------
+    f : function_type
+        The function to differentiate.
+    x_v : scalar, list, array
+        The value where to evaluate the derivative.
+    V : array
+        Tangent directions of shape ``x.shape + (k,)``.
+
+    Returns
+    -------
+    tuple(scalar or array, array)
+        The value ``y = f(x_v)`` and the product of the derivative with `V` of shape ``y.shape + (k,)``.
+    """
+    x_v = np.asarray(x_v, dtype=float)
+    V = np.asarray(V, dtype=float)
+    with pyADiff_profiling.measure('tangent'):
+        y = f(DualArray(x_v, V))
+    if(type(y) is DualArray):
+        return y.value, y.derivative
+    return y, np.zeros(np.shape(y) + V.shape[-1:])
+
+def _value(a):
+    """Value of `a`, which may be a `DualArray` or a constant.
+    """
+    if(type(a) is DualArray):
+        return a._v
+    return a
+
+def _derivative(a, k):
+    """Tangents of `a`, zero for constants.
+    """
+    if(type(a) is DualArray):
+        return a._d
+    return np.zeros(np.shape(a) + (k,))
+
+def _directions(arrays):
+    """Number of tangent directions of the `DualArray` s in `arrays`, `None` if there is none.
+    """
+    for a in arrays:
+        if(type(a) is DualArray):
+            return a._d.shape[-1]
+    return None
+
+def _broadcast(d, shape):
+    """Broadcasts the tangents `d` to ``shape + (k,)``.
+    """
+    if(d.shape[:-1] != shape):
+        d = np.broadcast_to(d, shape + d.shape[-1:])
+    return d
+
+def _front(d, ndim):
+    """Moves the direction axis of the tangents `d` to the front and pads singleton axes up to `ndim` (stacked) matrix axes, for broadcasting in `matmul`.
+    """
+    d = np.moveaxis(d, -1, 0)
+    return d.reshape(d.shape[:1] + (1,)*(ndim + 1 - d.ndim) + d.shape[1:])
+
+def _back(d):
+    """Moves the direction axis of the tangents `d` from the front to the end.
+    """
+    return np.moveaxis(d, 0, -1)
+
+def _trace_product(a):
+    """``tr(A^-1 @ dA)`` for all directions of the `DualArray` `a`, with the direction axis in front.
+    """
+    return np.sum(_t(np.linalg.inv(a._v))*_front(a._d, a.ndim), axis=(-2, -1))
+
+def _t(a):
+    """Transposes the (stack of) matrix `a`.
+    """
+    return np.swapaxes(a, -1, -2)
+
+def _sym(a):
+    """Symmetric part of the (stack of) matrix `a`.
+    """
+    return 0.5*(a + _t(a))
+
+def _phi(a):
+    """Lower triangle of the (stack of) matrix `a` with halved diagonal.
+    """
+    return np.tril(a) - 0.5*a*np.eye(a.shape[-1])
+
+def _eigengap(w):
+    """The matrix ``F_ij = 1/(w_j - w_i)`` for ``i != j`` and ``F_ii = 0`` of the eigenvalues `w`.
+    """
+    gap = w[..., np.newaxis, :] - w[..., :, np.newaxis]
+    diagonal = np.eye(w.shape[-1], dtype=bool)
+    with np.errstate(divide='ignore'):
+        return np.where(diagonal, 0., 1./np.where(diagonal, 1., gap))
+
+def _axes(axis, ndim):
+    """Normalized tuple of reduction axes.
+    """
+    if axis is None:
+        return tuple(range(ndim))
+    if(type(axis) is not tuple):
+        axis = (axis,)
+    return tuple(a % ndim for a in axis)
+
+def _key(key):
+    """Replaces `DualArray` s in an index by their values.
+    """
+    if(type(key) is tuple):
+        return tuple(_value(k) for k in key)
+    return _value(key)
+
+def _e(a):
+    """Appends the direction axis to the partial derivative `a`.
+    """
+    return np.asarray(a)[..., np.newaxis]
+
+# Tangent rules of the ufuncs, one per argument: (d, v, a[, b]) -> contribution, where d are the tangents of the argument, v the result and a, b the arguments.
+_UFUNCS = {
+    np.add: (lambda d, v, a, b: d, lambda d, v, a, b: d),
+    np.subtract: (lambda d, v, a, b: d, lambda d, v, a, b: -d),
+    np.multiply: (lambda d, v, a, b: _e(b)*d, lambda d, v, a, b: _e(a)*d),
+    np.true_divide: (lambda d, v, a, b: d/_e(b), lambda d, v, a, b: -_e(v/b)*d),
+    np.power: (lambda d, v, a, b: _e(b*np.power(a, b - 1.))*d, lambda d, v, a, b: _e(v*np.log(a))*d),
+    np.maximum: (lambda d, v, a, b: _e(a >= b)*d, lambda d, v, a, b: _e(a < b)*d),
+    np.minimum: (lambda d, v, a, b: _e(a <= b)*d, lambda d, v, a, b: _e(a > b)*d),
+    np.negative: (lambda d, v, a: -d,),
+    np.positive: (lambda d, v, a: d,),
+    np.absolute: (lambda d, v, a: _e(np.sign(a))*d,),
+    np.square: (lambda d, v, a: _e(2.*a)*d,),
+    np.sqrt: (lambda d, v, a: d*_e(0.5/v),),
+    np.exp: (lambda d, v, a: _e(v)*d,),
+    np.log: (lambda d, v, a: d/_e(a),),
+    np.sin: (lambda d, v, a: _e(np.cos(a))*d,),
+    np.cos: (lambda d, v, a: -_e(np.sin(a))*d,),
+    np.tan: (lambda d, v, a: _e(1. + v**2)*d,),
+    np.tanh: (lambda d, v, a: _e(1. - v**2)*d,),
+}
+
+_COMPARISONS = (np.less, np.less_equal, np.equal, np.not_equal, np.greater, np.greater_equal)
+
+_FUNCTIONS = {
+    np.sum: lambda a, axis=None, keepdims=False: a.sum(axis=axis, keepdims=keepdims),
+    np.mean: lambda a, axis=None, keepdims=False: a.mean(axis=axis, keepdims=keepdims),
+    np.reshape: lambda a, newshape: a.reshape(newshape),
+    np.transpose: lambda a, axes=None: a.transpose() if axes is None else a.transpose(axes),
+    np.ravel: lambda a: a.ravel(),
+    np.concatenate: concatenate,
+    np.stack: stack,
+    np.where: where,
+    np.dot: dot,
+    np.linalg.solve: solve,
+    np.linalg.inv: inv,
+    np.linalg.det: det,
+    np.linalg.slogdet: slogdet,
+    np.linalg.cholesky: cholesky,
+    np.linalg.eigh: lambda a, UPLO='L': eigh(a),
+}
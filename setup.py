@@ -22,6 +22,9 @@ setup(
     packages=find_packages(exclude=('examples', 'tests', 'doc')),
     python_requires='>=3.6',
     install_requires=[
-        'numpy>=1.17'
-    ]
+        'numpy>=1.20'
+    ],
+    extras_require={
+        'sparse': ['scipy']
+    }
     )
\ No newline at end of file
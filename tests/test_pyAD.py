@@ -1,3 +1,5 @@
+import threading
+
 import numpy as np
 
 from context import pyADiff
@@ -6,6 +8,7 @@ sin = pyADiff.sin
 cos = pyADiff.cos
 exp = pyADiff.exp
 log = pyADiff.log
+sqrt = pyADiff.sqrt
 
 def test_derivative_f1():
     def f(x):
@@ -106,4 +109,536 @@ def test_derivative_f4():
 
     x = np.array([-5., 4., 9.])
     assert(np.all(np.isclose(df_analytic(x), df_for(x))))
-    assert(np.all(np.isclose(df_analytic(x), df_rev(x))))
\ No newline at end of file
+    assert(np.all(np.isclose(df_analytic(x), df_rev(x))))
+
+
+def test_derivative_vector_valued():
+    def f(x):
+        return np.array([
+            x[0]*x[1],
+            sin(x[1]) + x[2]**2.,
+            exp(x[0])/x[2],
+            x[0]
+        ])
+    def df_analytic(x):
+        return np.array([
+            [x[1], x[0], 0.],
+            [0., cos(x[1]), 2.*x[2]],
+            [exp(x[0])/x[2], 0., -exp(x[0])/x[2]**2.],
+            [1., 0., 0.]
+        ])
+    x = np.array([0.3, -1.2, 2.5])
+    for chunk_size in [None, 1, 2, 3]:
+        assert(np.all(np.isclose(df_analytic(x), pyADiff.derfor(f, chunk_size)(x))))
+    for chunk_size in [None, 1, 2, 3, 4]:
+        assert(np.all(np.isclose(df_analytic(x), pyADiff.derrev(f, chunk_size)(x))))
+
+    # list outputs are converted to arrays, constant outputs give zero rows
+    assert(np.all(np.isclose(pyADiff.derfor(f)(x), pyADiff.derrev(lambda x: list(f(x)))(x))))
+    assert(np.all(np.isclose(pyADiff.derfor(lambda x: np.array([x*x, x]))(2.), pyADiff.derrev(lambda x: [x*x, x])(2.))))
+    assert(np.all(pyADiff.derrev(lambda x: (x[0]*x[1], 3.))(x)[1] == 0.))
+    # outputs of another recording are not constants
+    try:
+        pyADiff.derrev(lambda x: pyADiff.derrev(lambda z: x)(1.))(2.)
+        assert(False)
+    except TypeError:
+        pass
+
+def test_hessian_chunked():
+    def f(x):
+        return x[0]**2.*x[1] + sin(x[1]*x[2]) - x[2]/x[0]
+    def ddf_analytic(x):
+        return np.array([
+            [2.*x[1] - 2.*x[2]/x[0]**3., 2.*x[0], 1./x[0]**2.],
+            [2.*x[0], -x[2]**2.*sin(x[1]*x[2]), cos(x[1]*x[2]) - x[1]*x[2]*sin(x[1]*x[2])],
+            [1./x[0]**2., cos(x[1]*x[2]) - x[1]*x[2]*sin(x[1]*x[2]), -x[1]**2.*sin(x[1]*x[2])]
+        ])
+    x = np.array([1.5, 0.7, -0.4])
+    assert(np.all(np.isclose(ddf_analytic(x), pyADiff.hessian(f)(x))))
+    for chunk_size in [1, 2]:
+        assert(np.all(np.isclose(ddf_analytic(x), pyADiff.derfor(pyADiff.derrev(f), chunk_size)(x))))
+        assert(np.all(np.isclose(ddf_analytic(x), pyADiff.derfor(pyADiff.derfor(f), chunk_size)(x))))
+
+def test_gradient_replay():
+    calls = []
+    def f(x):
+        calls.append(1)
+        if x[0] > x[1]:
+            return x[0]**2.*x[1]
+        return sin(x[1])/x[0]
+    def df_analytic(x):
+        if x[0] > x[1]:
+            return np.array([2.*x[0]*x[1], x[0]**2.])
+        return np.array([-sin(x[1])/x[0]**2., cos(x[1])/x[0]])
+    df = pyADiff.gradient(f)
+    for x in [[2., 1.], [3., -0.5], [1.5, 1.2], [0.5, 1.], [0.7, 2.], [4., 1.]]:
+        x = np.array(x)
+        assert(np.all(np.isclose(df_analytic(x), df(x))))
+    # traced at the first point and after each of the two branch flips
+    assert(len(calls) == 3)
+    # scalar inputs are cached as well
+    assert(np.isclose(pyADiff.gradient(lambda x: x*x)(3.), 6.))
+    assert(np.all(np.isclose(df(np.array([0.2, 1.])), df_analytic(np.array([0.2, 1.])))))
+    assert(len(calls) == 4)
+
+def test_trace_cache_lru():
+    trace_cache = pyADiff.adjoint.ADTraceCache(lambda x: exp(x[0])*x[-1], max_size=2)
+    for n in [2, 3, 4, 3]:
+        x = np.linspace(0.1, 1., n)
+        df = trace_cache.dfdx(x)
+        assert(np.isclose(df[0], exp(x[0])*x[-1]))
+        assert(np.isclose(df[-1], exp(x[0])))
+    assert(len(trace_cache) == 2)
+
+def test_compile_derivative():
+    def f(x):
+        y = x[0]*x[1] - 2.**x[2]
+        if x[0] < 1.:
+            y = y + sin(x[2])/x[0]
+        return np.array([y, sqrt(x[1])**-2., exp(x[0])*(-3.)])
+    df_rev = pyADiff.derrev(f)
+    x = np.array([0.5, 2., -1.])
+    df_adj = pyADiff.compile_derivative(f, x)
+    df_tan = pyADiff.compile_derivative(f, x, mode='tangent')
+    assert('ADType' not in df_adj.source)
+    for x in [np.array([0.5, 2., -1.]), np.array([0.7, 3., 1.])]:
+        assert(np.all(np.isclose(df_rev(x), df_adj(x))))
+        assert(np.all(np.isclose(df_rev(x), df_tan(x))))
+    try:
+        df_adj(np.array([2., 1., 1.]))
+        assert(False)
+    except pyADiff.exceptions.ControlFlowException:
+        pass
+
+    # outside of the domain the compiled code returns inf and nan like the tape
+    def g(x):
+        return np.array([x[0]**x[1], sqrt(x[2]), log(x[2])])
+    x = np.array([0., 2., 0.])
+    with np.errstate(all='ignore'):
+        assert(np.array_equal(pyADiff.derrev(g)(x), pyADiff.compile_derivative(g, x)(x), equal_nan=True))
+        assert(np.array_equal(pyADiff.derfor(g)(x), pyADiff.compile_derivative(g, x, mode='tangent')(x), equal_nan=True))
+
+def test_sparse_jacobian():
+    def f(x):
+        y = np.empty(x.shape, dtype=object)
+        y[0] = x[0]**2. - x[1]
+        for i in range(1, len(x) - 1):
+            y[i] = x[i-1] - 2.*x[i] + sin(x[i+1])
+        y[-1] = exp(x[-2])*x[-1]
+        return y
+    x = np.linspace(-1., 1., 12)
+    J = pyADiff.derfor(f)(x)
+    assert(pyADiff.sparse.color_columns(J != 0).max() + 1 == 3)
+    for mode in ['auto', 'forward', 'reverse']:
+        J_sparse = pyADiff.sparse_jacobian(f, mode=mode)(x)
+        assert(J_sparse.nnz == 3*len(x) - 2)
+        assert(np.all(np.isclose(J, J_sparse.toarray())))
+        J_sparse = pyADiff.sparse_jacobian(f, pattern=J != 0, mode=mode)(x + 0.5)
+        assert(np.all(np.isclose(pyADiff.derrev(f)(x + 0.5), J_sparse.toarray())))
+
+    # the pattern is detected again, when the control flow of f changes
+    def g(x):
+        if x[0] > 0.:
+            return np.array([x[0]*x[1], x[2]])
+        return np.array([x[0], x[1]*x[2]])
+    for mode in ['forward', 'reverse']:
+        dg = pyADiff.sparse_jacobian(g, mode=mode)
+        for x in [np.array([1., 2., 3.]), np.array([-1., 2., 3.]), np.array([2., 1., 3.])]:
+            assert(np.all(np.isclose(pyADiff.derrev(g)(x), dg(x).toarray())))
+
+def test_sparsity_detection():
+    def f(x):
+        y = x[0]*x[1] + 3.*x[2] - x[3]
+        if x[2] > 0.:
+            y = y + sin(x[3])
+        return y + x[4]/x[2]
+    x = np.array([1., 2., 3., 4., 5.])
+    J = pyADiff.jacobian_sparsity(f)(x).toarray()
+    assert(np.all(J == np.array([[True, True, True, True, True]])))
+    H = pyADiff.hessian_sparsity(f)(x).toarray()
+    H_exact = np.abs(pyADiff.hessian(f)(x)) > 0.
+    assert(np.all(H == H_exact))
+    x[2] = -3.
+    H = pyADiff.hessian_sparsity(f)(x).toarray()
+    assert(not H[3, 3])
+    # the Jacobian pattern of a recording equals the detected pattern
+    def g(x):
+        return np.array([x[0]*x[1], sin(x[2]), x[3] - x[3], 2., x[4]/x[2] + x[0]])
+    for x in [np.array([1., 2., 3., 4., 5.]), np.array([1., 2., -3., 4., 5.])]:
+        for h in [f, g]:
+            pattern = pyADiff.sparse.jacobian_pattern(pyADiff.adjoint.ADTrace(h, x))
+            assert(np.array_equal(pattern.toarray(), pyADiff.jacobian_sparsity(h)(x).toarray()))
+
+def test_checkpoint():
+    def step(x, k):
+        return np.array([x[0] + 0.01*sin(x[1]), x[1] + 0.01*x[0]*x[2], x[2]])
+    n = 50
+    def f(x):
+        for k in range(n):
+            x = step(x, k)
+        return x
+    x0 = np.array([0.3, 0.7, 1.5])
+    w = np.array([1., 2., 0.5])
+    g_exact = pyADiff.derrev(lambda x: np.dot(w, f(x)))(x0)
+    for snaps in [0, 2, 5, 100]:
+        for storage in ['memory', 'disk']:
+            x_n, pullback = pyADiff.checkpoint(step, n, x0, snaps=snaps, storage=storage)
+            assert(np.all(np.isclose(x_n, f(x0))))
+            assert(np.all(np.isclose(pullback(w), g_exact)))
+            assert(np.all(np.isclose(pullback(w), g_exact)))
+    c = pyADiff.checkpointing.Checkpointing(step, n, snaps=3)
+    c.forward(x0)
+    c.reverse(w)
+    assert(c.max_checkpoints <= 3)
+    assert(c.n_adjoint_steps == n)
+    assert(c.n_forward_steps < n*(n + 1)//4)
+
+def test_profile():
+    def f(x):
+        return np.array([x[0]*sin(x[1]), x[1]**2. + x[2]])
+    x = np.array([1., 2., 3.])
+    with pyADiff.profile() as p:
+        df = pyADiff.derrev(f, cache_size=0)(x)
+        pyADiff.derfor(f, chunk_size=1)(x)
+    assert(np.all(np.isclose(df, pyADiff.derfor(f)(x))))
+    stats = p.as_dict()
+    assert(stats['n_traces'] == 1)
+    assert(stats['n_sweeps'] == 1)
+    assert(stats['n_nodes'] == 7)
+    assert(stats['operations'] == {'var': 3, 'mul': 1, 'sin': 1, 'pow_const': 1, 'add': 1})
+    assert(stats['n_dependencies'] == 6)
+    assert(stats['nbytes'] > 0)
+    assert(stats['tangent_passes'] == 3)
+    assert(stats['tangent_allocations'] > 0)
+    n_allocations = stats['tangent_allocations']
+    pyADiff.derfor(f)(x)
+    assert(p.tangent_allocations == n_allocations)
+
+    # forward sweeps are counted separately, other threads are not counted
+    g = lambda x: x[0]*sin(x[1])*x[2]
+    with pyADiff.profile() as p:
+        thread = threading.Thread(target=lambda: pyADiff.derrev(f, cache_size=0)(x))
+        thread.start()
+        thread.join()
+        pyADiff.hessian(g, mode='tape')(x)
+    assert(p.n_traces == 1 and p.n_sweeps == 1 and p.n_forward_sweeps == 1)
+
+def test_derrev_array():
+    def f(x):
+        y = sin(x)*x[0] + exp(x)/(x.T + 2.)
+        z = np.concatenate([y, x**2.], axis=0)
+        w = np.where(x > 0.9, x, -x)[1:, ::2]
+        return z.sum(axis=0).mean() + np.sum(w*w) + sqrt(x).mean() + np.maximum(x, 1.).sum() + x[[0, 0, 1], [1, 1, 2]].sum()
+    def f_scalar(x):
+        y = np.array([[sin(x[i, j])*x[0, j] + exp(x[i, j])/(x[j, i] + 2.) for j in range(3)] for i in range(3)])
+        z = np.concatenate([y, x**2.], axis=0)
+        w = np.array([[x[i, j] if x[i, j] > 0.9 else -x[i, j] for j in range(3)] for i in range(3)])[1:, ::2]
+        m = np.array([[x[i, j] if x[i, j] > 1. else 1. for j in range(3)] for i in range(3)])
+        return z.sum(axis=0).mean() + np.sum(w*w) + np.array([[sqrt(v) for v in r] for r in x]).mean() + m.sum() + x[0, 1] + x[0, 1] + x[1, 2]
+    x = np.array([[0.5, 1.2, 0.8], [1.5, 0.7, 1.1], [0.6, 0.95, 1.3]])
+    assert(np.all(np.isclose(pyADiff.derrev_array(f)(x), pyADiff.derrev(f_scalar)(x))))
+    J = pyADiff.derrev_array(lambda x: sin(x)*x.sum())(x[0])
+    assert(np.all(np.isclose(J, pyADiff.derrev(lambda x: np.array([sin(v) for v in x])*x.sum())(x[0]))))
+    with pyADiff.profile() as p:
+        pyADiff.derrev_array(lambda x: (x*x).sum())(np.ones(10**5))
+    assert(p.n_nodes == 3)
+
+def test_derfor_array():
+    def f(x):
+        y = sin(x)*x[0] + exp(x)/(x.T + 2.)
+        z = np.concatenate([y, x**2.], axis=0)
+        w = np.where(x > 0.9, x, -x)[1:, ::2]
+        return np.stack([z.sum(axis=0), z.mean(axis=0)], axis=-1) + (w*w).sum() + np.maximum(x, 1.)[..., 0][:, None] + sqrt(x)[..., 1:].reshape(3, 2)
+    x = np.array([[0.5, 1.2, 0.8], [1.5, 0.7, 1.1], [0.6, 0.95, 1.3]])
+    J = pyADiff.derrev_array(f)(x)
+    assert(J.shape == (3, 2, 3, 3))
+    assert(np.all(np.isclose(pyADiff.derfor_array(f)(x), J)))
+    assert(np.all(np.isclose(pyADiff.derfor_array(f, chunk_size=4)(x), J)))
+    assert(np.isclose(pyADiff.derfor_array(lambda x: x*x*x)(2.), 12.))
+
+def test_hvp():
+    def f(x):
+        y = 0.
+        for i in range(len(x) - 1):
+            y = y + (1. - x[i])**2. + 100.*(x[i+1] - x[i]**2.)**2.
+        return y + sin(x[0]*x[-1])
+    x = np.linspace(0.1, 1.3, 6)
+    H = pyADiff.hessian(f)(x)
+    v = np.arange(6.)
+    V = np.stack([v, np.ones(6), x], axis=-1)
+    assert(np.all(np.isclose(pyADiff.hvp(f)(x, v), H.dot(v))))
+    assert(np.all(np.isclose(pyADiff.hvp(f)(x, V), H.dot(V))))
+    assert(np.isclose(pyADiff.hvp(lambda x: x**3.)(2., 1.), 12.))
+    with pyADiff.profile() as p:
+        pyADiff.hvp(f)(x, V)
+    assert(p.n_traces == 1 and p.n_sweeps == 1)
+
+def test_sparse_hessian():
+    def f(x):
+        y = x[0]*x[0] + x[1]**x[2] + 2.**x[3] + 3./x[4] + x[0]/x[5] + sin(x[1]*x[3]) + cos(x[2])*exp(x[4]) + log(x[5])*sqrt(x[0])
+        for i in range(5):
+            y = y + (x[i+1] - x[i]**2.)**2.
+        return y
+    x = np.array([0.7, 1.3, 0.9, 1.1, 0.6, 1.4])
+    for cache_size in [0, 8]:
+        d2f = pyADiff.sparse_hessian(f, cache_size=cache_size)
+        for x_v in [x, x + 0.1]:
+            L = d2f(x_v)
+            assert(np.all(L.row >= L.col))
+            assert(np.all(np.isclose(L.toarray() + np.tril(L.toarray(), -1).T, pyADiff.hessian(f)(x_v))))
+    L = pyADiff.sparse_hessian(lambda x: sum(x[i]*x[i+1] for i in range(9)))(np.ones(10))
+    assert(L.nnz == 9)
+
+def test_taylor():
+    def g(x):
+        return exp(sin(x))/sqrt(x) + log(x)*x**2.5 + 2.**x - 1./(1. + x**3.) + x**x
+    d = pyADiff.derfor
+    derivatives = [g(1.3), d(g)(1.3), d(d(g))(1.3), d(d(d(g)))(1.3), d(d(d(d(g))))(1.3)]
+    c = pyADiff.taylor(g, 1.3, 1., 4)
+    assert(np.all(np.isclose(c*np.array([1., 1., 2., 6., 24.]), derivatives)))
+    f = lambda x: np.array([x[0]*x[1]**3., 2.])
+    c = pyADiff.taylor(f, np.array([1., 2.]), np.array([0.5, -1.]), 3)
+    assert(np.all(np.isclose(c, [[8., -8., 0., 2.], [2., 0., 0., 0.]])))
+
+def test_derivative_tensor():
+    def f(x):
+        return np.array([x[0]**2.*x[1]*x[2] + sin(x[0]*x[1]) + exp(x[2])*x[1]**3., x[0]/x[2]])
+    x = np.array([0.3, 0.7, 1.1])
+    d = pyADiff.derfor
+    T = pyADiff.derivative_tensor(f, 3)(x)
+    R = d(d(d(f)))(x)
+    assert(T.data.shape == (2, 10))
+    assert(np.all(np.isclose(T.toarray(), R)))
+    assert(np.all(np.isclose(T[2, 0, 1], R[:, 0, 1, 2])))
+    v = np.array([1., 2., -1.])
+    assert(np.all(np.isclose(T.contract(v), np.einsum('mijk,i,j,k', R, v, v, v))))
+    assert(np.all(np.isclose(T.dot(v).dot(v), np.einsum('mijk,j,k->mi', R, v, v))))
+    H = pyADiff.derivative_tensor(lambda x: f(x)[0], 2)(x)
+    assert(np.all(np.isclose(H.toarray(), pyADiff.hessian(lambda x: f(x)[0])(x))))
+
+def test_jvp_vjp():
+    def f(x):
+        return np.array([x[0]*sin(x[1]), exp(x[2])/x[0], 3.])
+    x = np.array([1.2, 0.4, -0.3])
+    J = pyADiff.derrev(f)(x)
+    v = np.array([1., -2., 0.5])
+    V = np.stack([v, np.ones(3)], axis=-1)
+    y, Jv = pyADiff.jvp(f)(x, v)
+    assert(np.all(np.isclose(y, f(x))))
+    assert(np.all(np.isclose(Jv, J.dot(v))))
+    assert(np.all(np.isclose(pyADiff.jvp(f)(x, V)[1], J.dot(V))))
+    y, pullback = pyADiff.vjp(f)(x)
+    assert(np.all(np.isclose(y, f(x))))
+    w = np.array([0.5, 2., 1.])
+    W = np.stack([w, np.arange(3.)], axis=-1)
+    with pyADiff.profile() as p:
+        assert(np.all(np.isclose(pullback(w), J.T.dot(w))))
+        assert(np.all(np.isclose(pullback(W), J.T.dot(W))))
+    assert(p.n_traces == 0 and p.n_sweeps == 2)
+    y, pullback = pyADiff.vjp(lambda x: x**3.)(2.)
+    assert(np.isclose(pullback(1.), 12.))
+    assert(np.isclose(pyADiff.jvp(lambda x: x**3.)(2., 1.)[1], 12.))
+
+def test_jacobian_operator():
+    def f(x):
+        return np.array([[x[0, 0]*sin(x[1, 1]), exp(x[0, 1])/x[1, 0]], [x[0, 0]**2., 1.], [x[1, 1] - x[0, 1], x[1, 0]*x[0, 0]]])
+    x = np.array([[1.2, 0.4], [-0.3, 0.9]])
+    J = pyADiff.derrev(f)(x).reshape(6, 4)
+    A = pyADiff.jacobian_operator(f, x)
+    assert(A.shape == (6, 4) and A.T.shape == (4, 6))
+    assert(np.all(np.isclose(A.value, f(x))))
+    v = np.array([1., -2., 0.5, 3.])
+    w = np.arange(6.)
+    with pyADiff.profile() as p:
+        assert(np.all(np.isclose(A.matvec(v), J.dot(v))))
+        assert(np.all(np.isclose(A.rmatvec(w), J.T.dot(w))))
+        assert(np.all(np.isclose(A @ np.eye(4)[:, :2], J[:, :2])))
+        assert(np.all(np.isclose(A.T @ w, J.T.dot(w))))
+        assert(np.all(np.isclose(A.columns(2), J[:, 2])))
+        assert(np.all(np.isclose(A.rows([0, 4]), J[[0, 4]])))
+        assert(np.all(np.isclose(A.toarray(), J)))
+    assert(p.n_traces == 0)
+
+def test_jacobian():
+    def f(x):
+        return np.array([x[0]*sin(x[1]), exp(x[1])/x[2], x[0]**2., 1.])
+    x = np.array([1.2, 0.4, -0.3])
+    J = pyADiff.derrev(f)(x)
+    jacobian = pyADiff.jacobian(f)
+    assert(np.all(np.isclose(jacobian(x), J)))
+    assert(jacobian.last_costs[0].time <= jacobian.last_costs[-1].time)
+    assert(set(c.mode for c in jacobian.costs(x)) == {'forward', 'reverse'})
+    for mode in ('forward', 'reverse'):
+        jacobian = pyADiff.jacobian(f, mode=mode, memory_limit=1, cache_size=0)
+        assert(np.all(np.isclose(jacobian(x), J)))
+        assert(all(c.mode == mode for c in jacobian.last_costs))
+    # many inputs, one output -> reverse; one input, many outputs -> forward
+    assert(pyADiff.jacobian(lambda x: np.sum(x**2.)).costs(np.ones(100))[0].mode == 'reverse')
+    assert(pyADiff.jacobian(lambda x: x*np.arange(1., 101.)).costs(np.array([2.]))[0].mode == 'forward')
+    assert(np.isclose(pyADiff.jacobian(lambda x: x**3.)(2.), 12.))
+
+def test_cross_country():
+    def f(x):
+        return np.array([x[0]*sin(x[1]), exp(x[1])/x[2], x[0]**2., 1., x[0]])
+    x = np.array([1.2, 0.4, -0.3])
+    J = pyADiff.derrev(f)(x)
+    for method, order in (('vertex', 'markowitz'), ('vertex', 'forward'), ('vertex', 'reverse'), ('edge', 'markowitz')):
+        e = pyADiff.cross_country(f, method, order)(x)
+        assert(np.all(np.isclose(e.jacobian, J)))
+    # bottleneck: all outputs depend on all inputs through one scalar
+    def g(x):
+        s = np.sum(x**2.)
+        for _ in range(3):
+            s = sin(s)
+        return x*s
+    x = np.linspace(0.1, 1., 20)
+    e = pyADiff.cross_country(g)(x)
+    assert(np.all(np.isclose(e.jacobian, pyADiff.derrev(g)(x))))
+    assert(e.multiplications < e.tangent_multiplications and e.multiplications < e.adjoint_multiplications)
+    assert(e.multiplications <= pyADiff.cross_country(g, order='forward', cache_size=0)(x).multiplications)
+    assert(np.isclose(pyADiff.cross_country(lambda x: x**3.)(2.).jacobian, 12.))
+
+def test_separable_hessian():
+    from concurrent.futures import ThreadPoolExecutor
+    from pyADiff.adjoint import ADTrace
+    from pyADiff.separability import elements
+    def f(x):
+        return np.sum(100.*(x[1:] - x[:-1]**2.)**2. + (1. - x[:-1])**2.) - 3.*sin(x[0]*x[1]) + x[2] - x[3]*x[3]/2. + x[4]**x[5]
+    x = np.linspace(0.5, 1.5, 7)
+    H = pyADiff.hessian(f)(x)
+    lower = pyADiff.separable_hessian(f)(x).toarray()
+    assert(np.all(np.isclose(lower, np.tril(H))))
+    with ThreadPoolExecutor(2) as executor:
+        lower = pyADiff.separable_hessian(f, executor, cache_size=0)(x).toarray()
+    assert(np.all(np.isclose(lower, np.tril(H))))
+    element_list = elements(ADTrace(f, x))
+    assert(max(len(e.indices) for e in element_list) == 2)
+    assert(any(e.weight == -0.5 for e in element_list))
+
+def test_hessian_tape():
+    from pyADiff.adjoint import ADTrace
+    def f(x):
+        return np.sum((x[1:] - x[:-1]**2.)**2.) - 3.*sin(x[0]*x[1]) + x[2]/x[3] + x[3]**x[4] + exp(x[0])*log(x[3]) + sqrt(x[2]) + 3./x[4]
+    x = np.linspace(0.5, 1.5, 5)
+    H = pyADiff.hessian(f)(x)
+    for cache_size in (0, 8):
+        d2f = pyADiff.hessian(f, mode='tape', cache_size=cache_size)
+        assert(np.all(np.isclose(d2f(x), H)))
+        assert(np.all(np.isclose(d2f(x + 0.1), pyADiff.hessian(f)(x + 0.1))))
+    V = np.stack([np.ones(5), np.arange(5.)], axis=-1)
+    g, HV = ADTrace(f, x).hessian_product(V)
+    assert(np.all(np.isclose(g, pyADiff.derrev(f)(x))))
+    assert(np.all(np.isclose(HV, H.dot(V))))
+    assert(np.isclose(pyADiff.hessian(lambda x: x**3., mode='tape')(2.), 12.))
+    X = np.array([[1., 2.], [3., 4.]])
+    assert(pyADiff.hessian(lambda x: x[0, 0]*x[1, 1], mode='tape')(X).shape == (2, 2, 2, 2))
+
+def test_hessian_diagonal():
+    def f(x):
+        return np.sum((x[1:] - x[:-1]**2.)**2.) + np.sum(x**4.) + sin(x[0]*x[-1])
+    x = np.linspace(-1., 1., 30)
+    H = pyADiff.hessian(f)(x)
+    for cache_size in (0, 8):
+        d = pyADiff.hessian_diagonal(f, cache_size=cache_size)
+        assert(np.all(np.isclose(d(x), np.diag(H))))
+        assert(np.all(np.isclose(d(x + 0.5), np.diag(pyADiff.hessian(f)(x + 0.5)))))
+    assert(np.all(np.isclose(pyADiff.hessian_diagonal(f, pattern=np.ones((30, 30)))(x), np.diag(H))))
+    assert(pyADiff.sparse.color_adjacent(pyADiff.hessian_sparsity(f)(x)).max() < 4)
+    estimate = pyADiff.hessian_trace(f, n_probes=2000, seed=0)(x)
+    assert(abs(estimate - np.trace(H)) < 0.05*np.abs(H).sum())
+    estimate = pyADiff.hessian_diag_estimate(f, n_probes=2000, seed=0)(x)
+    assert(np.linalg.norm(estimate - np.diag(H)) < 0.1*np.linalg.norm(H))
+    # exact for diagonal Hessians
+    assert(np.all(np.isclose(pyADiff.hessian_diag_estimate(lambda x: np.sum(x**3.), n_probes=1)(x), 6.*x)))
+    assert(np.isclose(pyADiff.hessian_trace(lambda x: np.sum(x**3.), n_probes=1)(x), np.sum(6.*x)))
+
+def test_jacobian_sketch():
+    # rank 3 Jacobian through a bottleneck of three intermediates
+    A = np.linspace(-1., 1., 60).reshape(3, 20)
+    B = np.linspace(0.5, 2., 45).reshape(15, 3)
+    def f(x):
+        return B.dot(sin(A.dot(x)))
+    x = np.linspace(0., 1., 20)
+    J = pyADiff.derrev(f)(x)
+    U, s, Vt = pyADiff.jacobian_sketch(f, x, rank=3, oversample=2, seed=0)
+    assert(U.shape == (15, 3) and s.shape == (3,) and Vt.shape == (3, 20))
+    assert(np.all(np.isclose((U*s).dot(Vt), J)))
+    assert(np.all(np.isclose(s, np.linalg.svd(J, compute_uv=False)[:3])))
+    U, s, Vt = pyADiff.jacobian_sketch(f, x, rank=1, n_iter=2, seed=1)
+    assert(np.isclose(s[0], np.linalg.norm(J, 2)))
+    X = x.reshape(4, 5)
+    U, s, Vt = pyADiff.jacobian_sketch(lambda X: f(X.ravel()).reshape(3, 5), X, rank=3)
+    assert(np.all(np.isclose((U*s).dot(Vt), J)))
+
+def test_gauss_newton():
+    t = np.linspace(0., 2., 15)
+    data = 2.*exp(-1.5*t) + 0.3
+    def residual(p):
+        return p[0]*exp(-p[1]*t) + p[2] - data
+    # Levenberg-Marquardt iterations with the dense J^T J
+    model = pyADiff.gauss_newton(residual)
+    p = np.array([1., 1., 0.])
+    for _ in range(30):
+        gn = model(p)
+        p = p - np.linalg.solve(gn.toarray(damping=1e-3), gn.gradient)
+    assert(np.all(np.isclose(p, [2., 1.5, 0.3])))
+    gn = model(np.array([1., 1., 0.]))
+    J = pyADiff.derrev(residual)(np.array([1., 1., 0.]))
+    v = np.array([1., -2., 0.5])
+    V = np.stack([v, np.ones(3)], axis=-1)
+    with pyADiff.profile() as prof:
+        assert(np.all(np.isclose(gn.gradient, J.T.dot(gn.residual))))
+        assert(np.all(np.isclose(gn.jvp(v), J.dot(v))))
+        assert(np.all(np.isclose(gn.vjp(np.arange(15.)), J.T.dot(np.arange(15.)))))
+        assert(np.all(np.isclose(gn @ v, J.T.dot(J.dot(v)))))
+        assert(np.all(np.isclose(gn.matmat(V, damping=2.), J.T.dot(J.dot(V)) + 2.*V)))
+    assert(prof.n_traces == 0)
+    assert(np.isclose(gn.cost, 0.5*np.sum(residual(np.array([1., 1., 0.]))**2.)))
+    assert(np.all(np.isclose(pyADiff.gauss_newton(residual, cache_size=0)(p).toarray(), pyADiff.gauss_newton(residual)(p).toarray())))
+    # a model at a trial step does not change the model at the current step
+    a = model(np.array([1., 1., 0.]))
+    g = a.gradient
+    b = model(p)
+    assert(np.isclose(a.cost, 0.5*np.sum(residual(np.array([1., 1., 0.]))**2.)) and not np.isclose(a.cost, b.cost))
+    assert(np.all(np.isclose(a.gradient, g)) and np.all(np.isclose(a.gradient, J.T.dot(a.residual))))
+    assert(np.all(np.isclose(a @ v, J.T.dot(J.dot(v)))))
+
+def test_linear_algebra():
+    def spd(x):
+        M = x.reshape(3, 3)
+        return M @ M.T + 3.*np.eye(3)
+    def fd(f, x, h=1e-6):
+        J = np.zeros(np.shape(f(x)) + x.shape)
+        for i in range(x.size):
+            e = np.zeros(x.size)
+            e[i] = h
+            J[..., i] = (np.asarray(f(x + e)) - np.asarray(f(x - e)))/(2.*h)
+        return J
+    C = np.linspace(-1., 1., 9).reshape(3, 3)
+    b = np.array([1., -2., 0.5])
+    x = np.linspace(-0.8, 1.1, 9)
+    sign = np.sign(np.linalg.eigh(spd(x))[1][0])
+    functions = [
+        lambda x: x.reshape(3, 3) @ C,
+        lambda x: x[:3] @ x.reshape(3, 3),
+        lambda x: pyADiff.matmul(np.stack([x.reshape(3, 3), 2.*C]), x[3:6]),
+        lambda x: np.dot(C, x[:3]),
+        lambda x: pyADiff.solve(x.reshape(3, 3) + 3.*np.eye(3), x[:3]),
+        lambda x: np.linalg.solve(C + 3.*np.eye(3), x.reshape(3, 3)),
+        lambda x: pyADiff.inv(x.reshape(3, 3) + 3.*np.eye(3)),
+        lambda x: pyADiff.det(x.reshape(3, 3)),
+        lambda x: pyADiff.slogdet(spd(x))[1],
+        lambda x: pyADiff.cholesky(spd(x)),
+        lambda x: pyADiff.eigh(spd(x))[0],
+        lambda x: pyADiff.eigh(spd(x))[1]*sign,
+    ]
+    for f in functions:
+        J = fd(f, x)
+        assert(np.all(np.isclose(pyADiff.derfor_array(f)(x), J, atol=1e-6)))
+        assert(np.all(np.isclose(pyADiff.derrev_array(f)(x), J, atol=1e-6)))
+    # one node per matrix operation
+    from pyADiff.adjoint_array import ArrayRecord, ADArray
+    record = ArrayRecord()
+    A = ADArray(np.eye(50) + 0.01, record)
+    pyADiff.solve(A @ A, np.ones(50))
+    assert(record.operation_counts() == {'var': 1, 'matmul': 1, 'solve': 1})